@@ -0,0 +1,121 @@
+"""
+Buffered last_access tracking for served files.
+
+Public reads record the access time in a Redis hash (one field per nickname,
+so repeated reads coalesce) instead of updating the row. The flush_access_times
+task drains the hash periodically and writes it back with bulk updates.
+"""
+
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .models import HostedFile
+from .utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+ACCESS_BUFFER_KEY = "hosting:last-access"
+
+
+def record_access(nickname: str):
+    """
+    Record that a nickname's file has just been served.
+
+    Falls back to a direct database update when Redis is not available.
+
+    Args:
+        nickname: Nickname of the hosted file
+    """
+    client = get_redis_client()
+    if client is not None:
+        try:
+            client.hset(ACCESS_BUFFER_KEY, nickname, time.time())
+            return
+        except RedisError as e:
+            logger.warning(f"Could not buffer access for {nickname}: {e}")
+
+    HostedFile.objects.filter(nickname=nickname).update(last_access=timezone.now())
+
+
+def record_accesses(nicknames: list):
+    """
+    Record that several nicknames' files have just been served, in one write.
+
+    Args:
+        nicknames: Nicknames of the hosted files
+    """
+    if not nicknames:
+        return
+
+    client = get_redis_client()
+    if client is not None:
+        try:
+            now = time.time()
+            client.hset(ACCESS_BUFFER_KEY, mapping={nickname: now for nickname in nicknames})
+            return
+        except RedisError as e:
+            logger.warning(f"Could not buffer accesses for {len(nicknames)} files: {e}")
+
+    HostedFile.objects.filter(nickname__in=nicknames).update(last_access=timezone.now())
+
+
+def drain_access_buffer() -> dict:
+    """
+    Atomically read and clear the buffered access times.
+
+    Returns:
+        dict mapping nickname to an aware datetime
+    """
+    client = get_redis_client()
+    if client is None:
+        return {}
+
+    pipe = client.pipeline(transaction=True)
+    pipe.hgetall(ACCESS_BUFFER_KEY)
+    pipe.delete(ACCESS_BUFFER_KEY)
+    buffered, _ = pipe.execute()
+
+    return {
+        nickname.decode("utf-8"): datetime.fromtimestamp(float(ts), tz=dt_timezone.utc)
+        for nickname, ts in buffered.items()
+    }
+
+
+def apply_access_times(access_times: dict) -> int:
+    """
+    Write access times to the database, one bulk update per batch.
+
+    Existing values are only moved forward, never back.
+
+    Args:
+        access_times: dict mapping nickname to an aware datetime
+
+    Returns:
+        Number of rows updated
+    """
+    nicknames = list(access_times)
+    batch_size = settings.ACCESS_FLUSH_BATCH_SIZE
+    updated = 0
+
+    for start in range(0, len(nicknames), batch_size):
+        batch = nicknames[start:start + batch_size]
+        hosted_files = []
+
+        for hosted_file in HostedFile.objects.filter(nickname__in=batch).only(
+            "id", "nickname", "last_access"
+        ):
+            accessed_at = access_times[hosted_file.nickname]
+            if accessed_at > hosted_file.last_access:
+                hosted_file.last_access = accessed_at
+                hosted_files.append(hosted_file)
+
+        if hosted_files:
+            HostedFile.objects.bulk_update(hosted_files, ["last_access"])
+            updated += len(hosted_files)
+
+    return updated
@@ -0,0 +1,181 @@
+"""
+Authentication of requests carrying a vfile URL.
+
+Upload, delete, redirect and remove-redirect identify the account with the
+`vfile` field; raw uploads (PUT /<nickname>/social.org) send it in the
+Authorization header instead. VFileAuthentication resolves it once per
+request, reading only the primary key and nickname of the account, and
+exposes the result as request.user.
+
+Verified vfiles are cached per process for a short time, so repeated
+requests from the same client skip the database lookup and the HMAC. The
+redirect state is always read from the file cache, which is invalidated in
+every process on change.
+
+Webhook management (/webhooks) is authenticated separately, with the
+operator's WEBHOOK_TOKEN.
+"""
+
+import hmac
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+from .cache import LocalLRUCache, get_file
+from .models import HostedFile
+from .utils import parse_vfile_url, verify_vfile_token
+
+# Each entry is accounted as one unit, so the cache is bounded by entry count
+verified_vfiles = LocalLRUCache(
+    settings.VFILE_AUTH_CACHE_SIZE,
+    settings.VFILE_AUTH_CACHE_TIMEOUT,
+)
+
+
+class VFileAccount:
+    """The account a vfile belongs to."""
+
+    is_authenticated = True
+
+    def __init__(self, id: int, nickname: str, redirect_url: str = None):
+        self.id = id
+        self.nickname = nickname
+        self.redirect_url = redirect_url
+
+    @property
+    def is_redirected(self) -> bool:
+        """Check if the account has an active redirect."""
+        return bool(self.redirect_url)
+
+
+class VFileAuthentication(BaseAuthentication):
+    """
+    Authenticate requests with the `vfile` field of the request body.
+
+    Requests without a vfile are left unauthenticated (request.user is None)
+    so each view can report the missing parameter. Invalid vfiles raise an
+    error rendered with the usual error response: 401, also for tokens no
+    account has (see VFileDeleteAuthentication for the exception).
+    """
+
+    # Whether a well-formed token without an account is reported as 404
+    unknown_account_not_found = False
+
+    def authenticate(self, request):
+        vfile_url = self.get_vfile(request)
+        if not vfile_url:
+            return None
+
+        vfile_data = parse_vfile_url(vfile_url)
+        if not vfile_data or not all(vfile_data.values()):
+            raise _error(exceptions.AuthenticationFailed, "Invalid vfile format")
+
+        token = vfile_data["token"]
+        cache_key = f"{token}:{vfile_data['timestamp']}:{vfile_data['signature']}"
+        account = verified_vfiles.get(cache_key)
+
+        if account is None:
+            account = (
+                HostedFile.objects.filter(vfile_token=token).values("id", "nickname").first()
+            )
+            if account is None:
+                raise self.unknown_account(token)
+
+            if not verify_vfile_token(
+                token,
+                vfile_data["timestamp"],
+                vfile_data["signature"],
+                account["nickname"],
+            ):
+                raise _error(exceptions.AuthenticationFailed, "Invalid vfile signature")
+
+            verified_vfiles.set(cache_key, account, 1)
+
+        # The account may have been deleted (or recreated) since it was cached
+        meta = get_file(account["nickname"])
+        if meta is None or meta["id"] != account["id"]:
+            verified_vfiles.delete(cache_key)
+            raise self.unknown_account(token)
+
+        return VFileAccount(account["id"], account["nickname"], meta["redirect_url"]), token
+
+    def unknown_account(self, token: str):
+        """
+        Build the error for a vfile token no account has.
+
+        Args:
+            token: The token of the vfile
+
+        Returns:
+            The exception to raise
+        """
+        # A well-formed token is likely a valid token for a deleted account;
+        # anything else is an invalid or forged token
+        well_formed = len(token) == 64 and all(c in "0123456789abcdef" for c in token.lower())
+        if self.unknown_account_not_found and well_formed:
+            return _error(exceptions.NotFound, "File not found")
+        return _error(exceptions.AuthenticationFailed, "Invalid vfile token")
+
+    def get_vfile(self, request) -> str:
+        """Return the vfile URL sent with the request, or None."""
+        return request.data.get("vfile")
+
+    def authenticate_header(self, request):
+        # Keeps authentication failures as 401 instead of 403
+        return "VFile"
+
+
+class VFileDeleteAuthentication(VFileAuthentication):
+    """
+    Authenticate account deletions with the `vfile` field of the request body.
+
+    Deleting an account that no longer exists answers 404 instead of 401
+    when the token is well formed, as the delete endpoint always has.
+    """
+
+    unknown_account_not_found = True
+
+
+class VFileHeaderAuthentication(VFileAuthentication):
+    """
+    Authenticate requests with an `Authorization: VFile <vfile URL>` header.
+
+    The request body is never read, so views can stream it.
+    """
+
+    def get_vfile(self, request) -> str:
+        scheme, _, vfile_url = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if scheme.lower() != "vfile":
+            return None
+        return vfile_url.strip()
+
+
+class WebhookTokenAuthentication(BaseAuthentication):
+    """
+    Authenticate requests with an `Authorization: Bearer <WEBHOOK_TOKEN>` header.
+
+    Webhooks make the host send requests to the URLs they register, so only
+    holders of the token may manage them. Without a configured token the
+    endpoints answer 404.
+    """
+
+    def authenticate(self, request):
+        if not settings.WEBHOOK_TOKEN:
+            raise _error(exceptions.NotFound, "Webhooks are not enabled on this host")
+
+        scheme, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(
+            token.strip().encode(), settings.WEBHOOK_TOKEN.encode()
+        ):
+            raise _error(exceptions.AuthenticationFailed, "Invalid webhook token")
+        return None, token
+
+    def authenticate_header(self, request):
+        # Keeps authentication failures as 401 instead of 403
+        return "Bearer"
+
+
+def _error(exception_class, message: str):
+    """Build an API exception rendered as an error response."""
+    return exception_class({"type": "Error", "errors": [message], "data": {}})
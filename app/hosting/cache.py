@@ -0,0 +1,465 @@
+"""
+Two-tier read-through cache for served social.org files.
+
+Entries are kept in a per-process LRU (bounded by bytes) in front of the
+shared Redis cache. Two kinds of entries are cached:
+
+- File metadata, keyed by nickname and a generation token. Every mutation
+  calls invalidate_file(), which replaces the generation (so a reader that
+  loaded the row before the change cannot store it where later readers
+  look) and publishes the nickname so other worker processes evict their
+  local copy as well.
+- File content (and its precompressed variants), keyed by content hash.
+  Content entries never go stale, so they are only ever evicted.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+from .models import CompressedVariant, HostedFile
+from .utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+META_KEY_PREFIX = "hosting:file:"
+GENERATION_KEY_PREFIX = "hosting:file-generation:"
+CONTENT_KEY_PREFIX = "hosting:content:"
+INVALIDATION_CHANNEL = "hosting:file-invalidations"
+
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int, timeout: int):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """Total size in bytes of the cached values."""
+        return self._size
+
+    def get(self, key):
+        """Return the value for key, or None if missing or expired."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+
+            value, size, expires_at = item
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size: int):
+        """Store value under key, evicting least recently used entries if needed."""
+        # Values larger than the whole cache are never stored
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, time.monotonic() + self.timeout)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def delete(self, key):
+        """Remove key if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+
+local_cache = LocalLRUCache(
+    settings.FILE_CACHE_LOCAL_MAX_BYTES,
+    settings.FILE_CACHE_LOCAL_TIMEOUT,
+)
+
+# Approximate size accounted for each metadata entry in the local LRU
+META_ENTRY_SIZE = 256
+
+_listener_started = False
+_listener_lock = threading.Lock()
+
+# Local evictions so far; a load that overlapped one is not kept locally
+_local_evictions = 0
+
+
+def get_file(nickname: str) -> dict:
+    """
+    Return the metadata needed to serve a nickname, loading it on a cache miss.
+
+    Args:
+        nickname: Nickname of the hosted file
+
+    Returns:
+        dict with 'id', 'redirect_url', 'content_hash', 'content_size',
+        'header_size', 'artifacts_hash', 'updated_at' and 'encodings'
+        (encoding name to compressed size),
+        or None if the nickname does not exist
+    """
+    _ensure_listener()
+
+    local_key = _meta_key(nickname)
+    meta = local_cache.get(local_key)
+    if meta is not None:
+        return meta
+
+    evictions = _local_evictions
+    # Read before the row: a change committed meanwhile moves to a new key
+    key = _shared_meta_key(nickname, _get_generations([nickname])[nickname])
+    meta = cache.get(key)
+    if meta is None:
+        meta = _load_meta(nickname)
+        if meta is None:
+            return None
+        cache.set(key, meta, settings.FILE_CACHE_TIMEOUT)
+
+    if evictions == _local_evictions:
+        local_cache.set(local_key, meta, META_ENTRY_SIZE)
+    return meta
+
+
+def get_files(nicknames: list) -> dict:
+    """
+    Return the metadata of several nicknames, like get_file() but batched.
+
+    Misses of the local tier are read from the shared cache with one
+    multi-get, and the remaining ones from the database with one query
+    (plus one for their compressed variants).
+
+    Args:
+        nicknames: Nicknames of the hosted files
+
+    Returns:
+        dict mapping each existing nickname to its metadata
+    """
+    _ensure_listener()
+
+    metas = {}
+    missing = []
+    for nickname in dict.fromkeys(nicknames):
+        meta = local_cache.get(_meta_key(nickname))
+        if meta is not None:
+            metas[nickname] = meta
+        else:
+            missing.append(nickname)
+
+    if missing:
+        evictions = _local_evictions
+        keys = {
+            nickname: _shared_meta_key(nickname, generation)
+            for nickname, generation in _get_generations(missing).items()
+        }
+        shared = cache.get_many(list(keys.values()))
+        loaded = _load_metas([nickname for nickname in missing if keys[nickname] not in shared])
+        if loaded:
+            cache.set_many(
+                {keys[nickname]: meta for nickname, meta in loaded.items()},
+                settings.FILE_CACHE_TIMEOUT,
+            )
+
+        for nickname in missing:
+            meta = shared.get(keys[nickname]) or loaded.get(nickname)
+            if meta is not None:
+                if evictions == _local_evictions:
+                    local_cache.set(_meta_key(nickname), meta, META_ENTRY_SIZE)
+                metas[nickname] = meta
+    return metas
+
+
+def get_files_content(files: dict) -> dict:
+    """
+    Return the raw content of several files, like get_file_content() but batched.
+
+    Args:
+        files: dict mapping each nickname to the content hash of its metadata
+
+    Returns:
+        dict mapping each nickname still existing to (content_hash, content bytes)
+    """
+    contents = {}
+    missing = {}
+    for nickname, content_hash in files.items():
+        content = local_cache.get(_content_key(content_hash))
+        if content is not None:
+            contents[nickname] = (content_hash, content)
+        else:
+            missing[nickname] = content_hash
+
+    if missing:
+        shared = cache.get_many(
+            [CONTENT_KEY_PREFIX + _content_key(content_hash) for content_hash in missing.values()]
+        )
+        unloaded = []
+        for nickname, content_hash in missing.items():
+            content = shared.get(CONTENT_KEY_PREFIX + _content_key(content_hash))
+            if content is not None:
+                contents[nickname] = (content_hash, content)
+            else:
+                unloaded.append(nickname)
+
+        loaded = {}
+        for nickname, content_hash, file_content in HostedFile.objects.filter(
+            nickname__in=unloaded
+        ).values_list("nickname", "content_hash", "file_content"):
+            # The current content, even if the file changed after its metadata was read
+            contents[nickname] = (content_hash, file_content.encode("utf-8"))
+            loaded[CONTENT_KEY_PREFIX + _content_key(content_hash)] = contents[nickname][1]
+        if loaded:
+            cache.set_many(loaded, settings.FILE_CACHE_TIMEOUT)
+
+        for nickname in missing:
+            if nickname in contents:
+                content_hash, content = contents[nickname]
+                local_cache.set(_content_key(content_hash), content, len(content))
+    return contents
+
+
+def get_file_content(nickname: str, content_hash: str, encoding: str = None) -> tuple[str, bytes]:
+    """
+    Return the content of a hosted file, loading it on a cache miss.
+
+    If the file changed after its metadata was read, the current content is
+    returned along with its own hash.
+
+    Args:
+        nickname: Nickname of the hosted file
+        content_hash: Content hash from the file metadata
+        encoding: Precompressed variant to return, or None for the raw content
+
+    Returns:
+        Tuple of (content_hash, content bytes), or None if the nickname (or
+        the requested variant) no longer exists
+    """
+    local_key = _content_key(content_hash, encoding)
+    content = local_cache.get(local_key)
+    if content is not None:
+        return content_hash, content
+
+    content = cache.get(CONTENT_KEY_PREFIX + local_key)
+    if content is None:
+        row = _load_content(nickname, encoding)
+        if row is None:
+            return None
+
+        content_hash, content = row
+        local_key = _content_key(content_hash, encoding)
+        cache.set(CONTENT_KEY_PREFIX + local_key, content, settings.FILE_CACHE_TIMEOUT)
+
+    local_cache.set(local_key, content, len(content))
+    return content_hash, content
+
+
+def invalidate_file(nickname: str):
+    """
+    Drop a nickname's metadata from both cache tiers in every worker process.
+
+    Args:
+        nickname: Nickname of the hosted file
+    """
+    _evict_local(nickname)
+    # Entries of the previous generation are never read again and expire
+    cache.set(GENERATION_KEY_PREFIX + nickname, uuid.uuid4().hex, None)
+
+    client = get_redis_client()
+    if client is None:
+        return
+
+    try:
+        client.publish(INVALIDATION_CHANNEL, nickname)
+    except RedisError as e:
+        logger.warning(f"Could not publish cache invalidation for {nickname}: {e}")
+
+
+def _get_generations(nicknames: list) -> dict:
+    """Return the current generation token of each nickname, creating missing ones."""
+    keys = {GENERATION_KEY_PREFIX + nickname: nickname for nickname in nicknames}
+    generations = {
+        keys[key]: generation for key, generation in cache.get_many(list(keys)).items()
+    }
+    for key, nickname in keys.items():
+        if nickname not in generations:
+            # A new token (not a counter), so a lost key never revives old entries
+            generation = uuid.uuid4().hex
+            if not cache.add(key, generation, None):
+                generation = cache.get(key, generation)
+            generations[nickname] = generation
+    return generations
+
+
+def _shared_meta_key(nickname: str, generation: str) -> str:
+    return f"{META_KEY_PREFIX}{nickname}:{generation}"
+
+
+def _evict_local(nickname: str):
+    """Drop a nickname's metadata from the local tier."""
+    global _local_evictions
+
+    _local_evictions += 1
+    local_cache.delete(_meta_key(nickname))
+
+
+def _load_meta(nickname: str) -> dict:
+    """Build file metadata from the database, without reading the content."""
+    meta = (
+        HostedFile.objects.filter(nickname=nickname)
+        .values(
+            "id",
+            "redirect_url",
+            "content_hash",
+            "content_size",
+            "header_size",
+            "artifacts_hash",
+            "updated_at",
+        )
+        .first()
+    )
+    if meta is None:
+        return None
+
+    meta["encodings"] = dict(
+        CompressedVariant.objects.filter(
+            hosted_file_id=meta["id"],
+            content_hash=meta["content_hash"],
+        ).values_list("encoding", "size")
+    )
+    return meta
+
+
+def _load_metas(nicknames: list) -> dict:
+    """Build the metadata of several files from the database, in two queries."""
+    if not nicknames:
+        return {}
+
+    metas = {
+        meta["nickname"]: meta
+        for meta in HostedFile.objects.filter(nickname__in=nicknames).values(
+            "nickname",
+            "id",
+            "redirect_url",
+            "content_hash",
+            "content_size",
+            "header_size",
+            "artifacts_hash",
+            "updated_at",
+        )
+    }
+    by_id = {}
+    for nickname, meta in metas.items():
+        del meta["nickname"]
+        meta["encodings"] = {}
+        by_id[meta["id"]] = meta
+
+    for hosted_file_id, content_hash, encoding, size in CompressedVariant.objects.filter(
+        hosted_file_id__in=by_id
+    ).values_list("hosted_file_id", "content_hash", "encoding", "size"):
+        meta = by_id[hosted_file_id]
+        if content_hash == meta["content_hash"]:
+            meta["encodings"][encoding] = size
+    return metas
+
+
+def _load_content(nickname: str, encoding: str) -> tuple[str, bytes]:
+    """Read the raw content or a precompressed variant from the database."""
+    if encoding is None:
+        row = (
+            HostedFile.objects.filter(nickname=nickname)
+            .values_list("content_hash", "file_content")
+            .first()
+        )
+        if row is None:
+            return None
+        return row[0], row[1].encode("utf-8")
+
+    row = (
+        CompressedVariant.objects.filter(hosted_file__nickname=nickname, encoding=encoding)
+        .values_list("content_hash", "data")
+        .first()
+    )
+    if row is None:
+        return None
+    return row[0], bytes(row[1])
+
+
+def _meta_key(nickname: str) -> str:
+    return f"meta:{nickname}"
+
+
+def _content_key(content_hash: str, encoding: str = None) -> str:
+    if encoding is None:
+        return content_hash
+    return f"{content_hash}.{encoding}"
+
+
+def _ensure_listener():
+    """Start the invalidation listener thread once per process."""
+    global _listener_started
+
+    if _listener_started:
+        return
+
+    with _listener_lock:
+        if _listener_started:
+            return
+
+        client = get_redis_client()
+        if client is not None:
+            thread = threading.Thread(
+                target=_listen_for_invalidations,
+                args=(client,),
+                name="file-cache-invalidations",
+                daemon=True,
+            )
+            thread.start()
+
+        _listener_started = True
+
+
+def _listen_for_invalidations(client):
+    """Evict local entries published by other processes, reconnecting on errors."""
+    while True:
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+
+            # Messages published while we were not subscribed are lost
+            local_cache.clear()
+
+            for message in pubsub.listen():
+                _evict_local(message["data"].decode("utf-8"))
+        except RedisError as e:
+            logger.warning(f"File cache invalidation listener disconnected: {e}")
+            local_cache.clear()
+            time.sleep(1)
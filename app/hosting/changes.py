@@ -0,0 +1,163 @@
+"""
+Append-only change log of hosted files, for mirrors and relays (/changes).
+
+Every change to which files exist and what they contain appends an entry
+with a sequence number that only increases: signup, upload (with the new
+content hash), redirect, remove-redirect, delete and cleanup. A mirror
+remembers the last sequence number it applied and asks for the entries
+after it, catching up in O(changes) instead of re-reading every file.
+
+Entries are appended in the transaction of the change they describe, as
+its last write. On PostgreSQL the log is locked for the append, so entries
+become visible in sequence order and a reader never skips an entry that
+commits late (SQLite already serializes writers).
+
+Each committed entry also schedules the deliveries of the registered
+webhooks (webhooks.py).
+
+Compaction (tasks.compact_change_log) deletes the entries older than
+CHANGES_RETENTION_DAYS that have a later entry for the same nickname: a
+mirror resuming from any point still gets the latest state of every file.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Change
+
+SIGNUP = "signup"
+UPLOAD = "upload"
+REDIRECT = "redirect"
+REMOVE_REDIRECT = "remove-redirect"
+DELETE = "delete"
+CLEANUP = "cleanup"
+
+
+def record_change(event: str, nickname: str, content_hash: str = "", redirect_url: str = ""):
+    """
+    Append a change to the log.
+
+    Call inside the transaction of the change, after its other writes.
+
+    Args:
+        event: One of the event names of this module
+        nickname: Nickname of the hosted file
+        content_hash: New content hash (upload)
+        redirect_url: New URL (redirect)
+    """
+    record_changes(
+        [
+            Change(
+                event=event,
+                nickname=nickname,
+                content_hash=content_hash,
+                redirect_url=redirect_url,
+            )
+        ]
+    )
+
+
+def record_changes(changes: list):
+    """Append several changes to the log, in order (see record_change)."""
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # Held until commit: later sequence numbers commit later
+            with connection.cursor() as cursor:
+                cursor.execute("LOCK TABLE changes IN SHARE ROW EXCLUSIVE MODE")
+        Change.objects.bulk_create(changes)
+        transaction.on_commit(_schedule_webhook_deliveries)
+
+
+def _schedule_webhook_deliveries():
+    # Imported here: tasks imports this module
+    from .tasks import schedule_webhook_deliveries
+
+    schedule_webhook_deliveries()
+
+
+def get_changes(after: int, limit: int) -> list:
+    """
+    Return the changes after a sequence number, oldest first.
+
+    Args:
+        after: Sequence number of the last change already read (0 for all)
+        limit: Maximum number of changes
+
+    Returns:
+        List of dicts with 'seq', 'nickname', 'event', 'content_hash',
+        'redirect_url' and 'created_at'
+    """
+    return list(
+        Change.objects.filter(seq__gt=after)
+        .order_by("seq")
+        .values("seq", "nickname", "event", "content_hash", "redirect_url", "created_at")[
+            :limit
+        ]
+    )
+
+
+def get_last_seq() -> int:
+    """Return the sequence number of the latest change (0 if the log is empty)."""
+    return Change.objects.order_by("-seq").values_list("seq", flat=True).first() or 0
+
+
+def serialize_change(change: dict) -> dict:
+    """JSON representation of a change loaded by get_changes."""
+    entry = {
+        "seq": change["seq"],
+        "nick": change["nickname"],
+        "event": change["event"],
+        "timestamp": change["created_at"].isoformat(),
+    }
+    if change["event"] == UPLOAD:
+        entry["hash"] = change["content_hash"]
+    elif change["event"] == REDIRECT:
+        entry["url"] = change["redirect_url"]
+    return entry
+
+
+def compact_changes(cutoff, batch_size: int) -> dict:
+    """
+    Delete the changes older than cutoff that are superseded by a later
+    change of the same nickname.
+
+    The old changes are walked in batches of sequence numbers, so each
+    DELETE is bounded.
+
+    Args:
+        cutoff: Changes created before this moment can be compacted
+        batch_size: Changes looked at per DELETE
+
+    Returns:
+        dict with 'deleted' and 'batches'
+    """
+    metrics = {"deleted": 0, "batches": 0}
+    last_seq = (
+        Change.objects.filter(created_at__lt=cutoff)
+        .order_by("-created_at", "-seq")
+        .values_list("seq", flat=True)
+        .first()
+    )
+    if last_seq is None:
+        return metrics
+
+    superseded = Change.objects.filter(nickname=OuterRef("nickname"), seq__gt=OuterRef("seq"))
+    after = 0
+    while True:
+        seqs = list(
+            Change.objects.filter(seq__gt=after, seq__lte=last_seq)
+            .order_by("seq")
+            .values_list("seq", flat=True)[:batch_size]
+        )
+        if not seqs:
+            break
+
+        deleted, _ = (
+            Change.objects.filter(seq__gte=seqs[0], seq__lte=seqs[-1], created_at__lt=cutoff)
+            .filter(Exists(superseded))
+            .delete()
+        )
+        metrics["deleted"] += deleted
+        metrics["batches"] += 1
+        after = seqs[-1]
+    return metrics
@@ -0,0 +1,143 @@
+"""
+Precompressed representations of hosted files.
+
+Variants are generated once when a file is written and served as-is to
+clients that accept them, instead of compressing on every response.
+"""
+
+import gzip
+
+import brotli
+import zstandard
+
+from .models import CompressedVariant
+
+# Server preference when the client accepts several encodings equally
+ENCODINGS = ["zstd", "br", "gzip"]
+
+COMPRESSORS = {
+    "zstd": lambda content: zstandard.ZstdCompressor(level=12).compress(content),
+    "br": lambda content: brotli.compress(content, quality=9),
+    "gzip": lambda content: gzip.compress(content, compresslevel=9, mtime=0),
+}
+
+
+def compress_content(content: bytes) -> dict:
+    """
+    Compress content with every supported encoding.
+
+    Encodings that do not make the content smaller are left out.
+
+    Args:
+        content: File content encoded as UTF-8
+
+    Returns:
+        dict mapping encoding name to compressed bytes
+    """
+    variants = {}
+    for encoding in ENCODINGS:
+        compressed = COMPRESSORS[encoding](content)
+        if len(compressed) < len(content):
+            variants[encoding] = compressed
+    return variants
+
+
+def store_compressed_variants(hosted_file, variants: dict = None) -> dict:
+    """
+    Replace the stored compressed variants of a hosted file.
+
+    Args:
+        hosted_file: Saved HostedFile instance
+        variants: Output of compress_content for the current content, to
+            skip compressing it here
+
+    Returns:
+        dict mapping encoding name to compressed bytes
+    """
+    if variants is None:
+        variants = compress_content(hosted_file.file_content.encode("utf-8"))
+
+    CompressedVariant.objects.filter(hosted_file=hosted_file).delete()
+    CompressedVariant.objects.bulk_create(
+        [
+            CompressedVariant(
+                hosted_file=hosted_file,
+                encoding=encoding,
+                content_hash=hosted_file.content_hash,
+                size=len(data),
+                data=data,
+            )
+            for encoding, data in variants.items()
+        ]
+    )
+    return variants
+
+
+def get_stored_variant(hosted_file, encoding: str) -> bytes:
+    """
+    Return a stored variant of the current content of a hosted file.
+
+    Args:
+        hosted_file: HostedFile instance
+        encoding: Encoding name
+
+    Returns:
+        Compressed bytes, or None if there is no up-to-date variant
+    """
+    data = (
+        CompressedVariant.objects.filter(
+            hosted_file=hosted_file,
+            encoding=encoding,
+            content_hash=hosted_file.content_hash,
+        )
+        .values_list("data", flat=True)
+        .first()
+    )
+    if data is None:
+        return None
+    return bytes(data)
+
+
+def negotiate_encoding(accept_encoding: str, available) -> str:
+    """
+    Pick the best available encoding for an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Value of the Accept-Encoding request header
+        available: Encodings the file has been precompressed with
+
+    Returns:
+        Encoding name, or None to serve the uncompressed content
+    """
+    if not accept_encoding or not available:
+        return None
+
+    # Parse "br;q=1.0, gzip;q=0.8, *;q=0.1" into {coding: q}
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+
+    best_encoding = None
+    best_quality = 0.0
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best_encoding = encoding
+            best_quality = quality
+
+    return best_encoding
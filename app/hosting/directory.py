@@ -0,0 +1,104 @@
+"""
+Directory of public files listed by /public-routes.
+
+The listing is versioned: any change to which files are public (signup,
+upload of a first or empty file, delete, redirect, remove-redirect, cleanup)
+calls invalidate_directory(), which replaces the version. Responses use the
+version as their ETag, and full listings are cached per version.
+"""
+
+import base64
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import HostedFile
+
+VERSION_KEY = "hosting:directory-version"
+SNAPSHOT_KEY_PREFIX = "hosting:public-routes:"
+
+
+def get_directory_version() -> str:
+    """Return the current version of the public directory."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Lost (or never set): start a new version, keeping a concurrent one
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_directory():
+    """Start a new version of the public directory."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_snapshot(version: str, scheme: str) -> bytes:
+    """Return the cached full listing for a directory version, or None."""
+    return cache.get(f"{SNAPSHOT_KEY_PREFIX}{version}:{scheme}")
+
+
+def set_snapshot(version: str, scheme: str, snapshot: bytes):
+    """Cache the full listing for a directory version."""
+    cache.set(
+        f"{SNAPSHOT_KEY_PREFIX}{version}:{scheme}",
+        snapshot,
+        settings.PUBLIC_ROUTES_SNAPSHOT_TIMEOUT,
+    )
+
+
+def public_nicknames():
+    """Return a queryset of the nicknames of public files, in nickname order."""
+    return (
+        HostedFile.objects.filter(redirect_url__isnull=True, has_content=True)
+        .order_by("nickname")
+        .values_list("nickname", flat=True)
+    )
+
+
+def get_page(after: str, limit: int) -> tuple[list, str]:
+    """
+    Return one page of public nicknames using keyset pagination.
+
+    Args:
+        after: Last nickname of the previous page, or None for the first page
+        limit: Maximum number of nicknames to return
+
+    Returns:
+        Tuple of (nicknames, next cursor or None on the last page)
+    """
+    nicknames = public_nicknames()
+    if after:
+        nicknames = nicknames.filter(nickname__gt=after)
+
+    page = list(nicknames[: limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1])
+    return page, None
+
+
+def encode_cursor(nickname: str) -> str:
+    """Encode a nickname as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(nickname.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Decode a pagination cursor.
+
+    Returns:
+        The nickname the cursor points after, or None if the cursor is invalid
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        nickname = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+    # The decoder silently skips invalid characters
+    if not nickname or encode_cursor(nickname) != cursor:
+        return None
+    return nickname
@@ -0,0 +1,177 @@
+"""
+Change notifications for hosted files, pushed to clients with Server-Sent Events.
+
+Writers publish a message for every change to a file on a Redis channel:
+
+- update: new content is indexed ('etag' and the ids of the new or
+  changed 'posts'), published by the artifacts pipeline once readers
+  already see the change, and on remove-redirect
+- redirect: the file moved ('location')
+- delete: the file was deleted or cleaned up
+
+Each ASGI process keeps one subscription to the channel and fans the
+messages out to the /events streams of that process through per-stream
+asyncio queues, so idle streams cost a queue and a suspended coroutine,
+not a thread. Without Redis (development, tests) messages are handed to
+the broker of the current process directly.
+"""
+
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = "hosting:file-changes"
+
+
+def publish_change(event: str, nickname: str, **data):
+    """
+    Publish a change to a hosted file. Call after the change is committed.
+
+    Args:
+        event: 'update', 'redirect' or 'delete'
+        nickname: Nickname of the hosted file
+        **data: Fields of the event ('etag' and 'posts', or 'location')
+    """
+    message = {"event": event, "nick": nickname, **data}
+
+    client = get_redis_client()
+    if client is None:
+        broker.dispatch_threadsafe(message)
+        return
+
+    try:
+        client.publish(CHANGES_CHANNEL, json.dumps(message))
+    except RedisError as e:
+        logger.warning(f"Could not publish {event} event for {nickname}: {e}")
+
+
+class Subscription:
+    """The pending messages of one /events stream."""
+
+    def __init__(self, nicknames: list, max_pending: int):
+        self.nicknames = nicknames
+        self._queue = asyncio.Queue(max_pending)
+
+    def deliver(self, message: dict):
+        """Queue a message; a stream too slow to keep up is ended instead."""
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # The client reconnects and re-reads the files it follows
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> dict:
+        """
+        Wait for the next message.
+
+        Returns:
+            The message, or None if the stream must end
+
+        Raises:
+            asyncio.TimeoutError: If nothing arrived within timeout seconds
+        """
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class ChangeBroker:
+    """Fans out change messages to the subscriptions of this process."""
+
+    def __init__(self):
+        self._subscriptions = {}  # nickname -> set of Subscription
+        self._loop = None
+        self._listener = None
+
+    def __len__(self):
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def subscribe(self, nicknames: list) -> Subscription:
+        """Start receiving the changes of some nicknames. Call from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        if (self._listener is None or self._listener.done()) and get_redis_client() is not None:
+            self._listener = self._loop.create_task(self._listen())
+
+        subscription = Subscription(nicknames, settings.EVENTS_QUEUE_SIZE)
+        for nickname in nicknames:
+            self._subscriptions.setdefault(nickname, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop receiving changes."""
+        for nickname in subscription.nicknames:
+            subscriptions = self._subscriptions.get(nickname)
+            if subscriptions is None:
+                continue
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[nickname]
+
+    def dispatch(self, message: dict):
+        """Deliver a message to the subscriptions of its nickname. Call from the event loop."""
+        for subscription in list(self._subscriptions.get(message["nick"], ())):
+            subscription.deliver(message)
+
+    def dispatch_threadsafe(self, message: dict):
+        """Deliver a message from another thread (no-op if nothing ever subscribed)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.dispatch, message)
+
+    async def _listen(self):
+        """Dispatch the messages of the Redis channel, reconnecting on errors."""
+        import redis.asyncio
+
+        while True:
+            client = redis.asyncio.from_url(settings.CACHES["default"]["LOCATION"])
+            try:
+                async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(CHANGES_CHANNEL)
+                    async for message in pubsub.listen():
+                        try:
+                            self.dispatch(json.loads(message["data"]))
+                        except (ValueError, KeyError, TypeError) as e:
+                            logger.warning(f"Ignoring malformed change message: {e}")
+            except RedisError as e:
+                # Messages published while disconnected are lost; clients
+                # re-read their files when their stream is re-established
+                logger.warning(f"Change listener disconnected: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+broker = ChangeBroker()
+
+
+def format_event(message: dict) -> bytes:
+    """Encode a change message as a Server-Sent Event."""
+    data = {name: value for name, value in message.items() if name != "event"}
+    return f"event: {message['event']}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def stream_events(subscription: Subscription):
+    """Yield the Server-Sent Events of a subscription until the client goes away."""
+    try:
+        # Reconnection delay for clients (milliseconds)
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n".encode("ascii")
+        while True:
+            try:
+                message = await subscription.get(settings.EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing idle streams
+                yield b": keepalive\n\n"
+                continue
+            if message is None:
+                return
+            yield format_event(message)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,166 @@
+"""
+JSON listings of indexed posts.
+
+Posts are listed newest first from the Post rows built when a file is
+written (see posts.py), so files are never read or parsed to answer.
+Pages use keyset pagination on (published_at, id): the cursor is the
+position of the last post of the previous page, so any page costs one
+index range scan, however deep it is. Posts whose id is not a timestamp
+have no publication date and are not listed.
+
+Tagged posts, mentions of a file and replies to a post are listed from
+the tag, mention and reply rows of the index, restricted to the posts of
+public files like the timeline.
+
+The instance-wide timeline is versioned like the public directory: any
+change to the indexed posts or to which files are public calls
+invalidate_timeline(), which replaces the version used in its ETags.
+"""
+
+import base64
+import binascii
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Post
+from .posts import link_target, parse_timestamp
+
+TIMELINE_VERSION_KEY = "hosting:timeline-version"
+
+# Post columns needed to serialize a post
+POST_FIELDS = ("id", "post_id", "published_at", "text", "tags", "properties")
+
+# Timeline posts also need their author
+TIMELINE_FIELDS = (*POST_FIELDS, "hosted_file__nickname")
+
+
+def timeline_posts():
+    """Return a queryset of the posts of every public (not redirected) file."""
+    return Post.objects.filter(hosted_file__redirect_url__isnull=True)
+
+
+def mentioning_posts(url: str):
+    """Return a queryset of the public posts that mention a file."""
+    return timeline_posts().filter(mention_rows__target=link_target(url))
+
+
+def replying_posts(url: str, post_id: str):
+    """Return a queryset of the public posts that reply to a post of a file."""
+    return timeline_posts().filter(
+        reply_rows__target=link_target(url), reply_rows__target_post_id=post_id
+    )
+
+
+def get_timeline_version() -> str:
+    """Return the current version of the timeline."""
+    version = cache.get(TIMELINE_VERSION_KEY)
+    if version is None:
+        # Lost (or never set): start a new version, keeping a concurrent one
+        cache.add(TIMELINE_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(TIMELINE_VERSION_KEY)
+    return version
+
+
+def invalidate_timeline():
+    """Start a new version of the timeline."""
+    cache.set(TIMELINE_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def filter_posts(posts, since=None, until=None, tag: str = None):
+    """
+    Restrict a Post queryset to a date range and a tag.
+
+    Args:
+        posts: Post queryset
+        since: Only posts published after this moment
+        until: Only posts published at or before this moment
+        tag: Only posts with this tag (case-insensitive)
+
+    Returns:
+        Filtered queryset
+    """
+    if since is not None:
+        posts = posts.filter(published_at__gt=since)
+    if until is not None:
+        posts = posts.filter(published_at__lte=until)
+    if tag:
+        posts = posts.filter(tag_rows__tag=tag.lower())
+    return posts
+
+
+def get_posts_page(posts, after, limit: int, fields=POST_FIELDS) -> tuple[list, str]:
+    """
+    Return one page of posts, newest first, using keyset pagination.
+
+    Args:
+        posts: Post queryset
+        after: (published_at, id) of the last post of the previous page,
+            or None for the first page
+        limit: Maximum number of posts to return
+        fields: Post columns to load
+
+    Returns:
+        Tuple of (posts as dicts, next cursor or None on the last page)
+    """
+    posts = posts.filter(published_at__isnull=False)
+    if after is not None:
+        published_at, post_pk = after
+        posts = posts.filter(
+            Q(published_at__lt=published_at) | Q(published_at=published_at, id__lt=post_pk)
+        )
+
+    page = list(posts.order_by("-published_at", "-id").values(*fields)[: limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_post_cursor(page[-1]["published_at"], page[-1]["id"])
+    return page, None
+
+
+def serialize_post(post: dict) -> dict:
+    """
+    Return the JSON representation of a post.
+
+    Args:
+        post: Post row as loaded by get_posts_page()
+    """
+    properties = post["properties"]
+    return {
+        "id": post["post_id"],
+        "timestamp": post["published_at"].isoformat(),
+        "text": post["text"],
+        "tags": post["tags"],
+        "lang": properties.get("LANG"),
+        "reply-to": properties.get("REPLY_TO"),
+        "mood": properties.get("MOOD"),
+        "properties": properties,
+    }
+
+
+def encode_post_cursor(published_at, post_pk: int) -> str:
+    """Encode the position of a post as an opaque pagination cursor."""
+    position = f"{published_at.isoformat()}|{post_pk}"
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_post_cursor(cursor: str) -> tuple:
+    """
+    Decode a pagination cursor.
+
+    Returns:
+        (published_at, id) of the post the cursor points after, or None if
+        the cursor is invalid
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        published_at, _, post_pk = position.rpartition("|")
+        post_pk = int(post_pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+    published_at = parse_timestamp(published_at)
+    if published_at is None:
+        return None
+    return published_at, post_pk
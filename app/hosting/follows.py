@@ -0,0 +1,120 @@
+"""
+Follow graph of hosted files.
+
+Follow edges are built from the #+FOLLOW lines of each file's header when
+it is indexed (see posts.index_follows), so who follows whom is answered
+from the follows table without reading any file:
+
+- followers of a file: hosted files (not redirected) with an edge to its
+  public URL, in nickname order
+- following of a file: its edges, in URL order
+
+Both listings are versioned like the public directory: any change to the
+edges calls invalidate_follows(), which replaces the version used in
+their ETags.
+"""
+
+import uuid
+
+from django.core.cache import cache
+
+from .models import Follow, ProfileHeader
+from .posts import index_follows, link_target
+from .utils import build_public_url
+
+VERSION_KEY = "hosting:follows-version"
+
+
+def get_follows_version() -> str:
+    """Return the current version of the follow graph."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Lost (or never set): start a new version, keeping a concurrent one
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_follows():
+    """Start a new version of the follow graph."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def remove_follows(hosted_file_id: int) -> int:
+    """
+    Remove the follow edges of a file that was redirected.
+
+    Returns:
+        Number of edges deleted
+    """
+    deleted, _ = Follow.objects.filter(hosted_file_id=hosted_file_id).delete()
+    return deleted
+
+
+def restore_follows(hosted_file) -> int:
+    """
+    Rebuild the follow edges of a file from its stored header, after a redirect is removed.
+
+    Returns:
+        Number of edges created, updated or deleted
+    """
+    keywords = (
+        ProfileHeader.objects.filter(hosted_file=hosted_file)
+        .values_list("keywords", flat=True)
+        .first()
+    ) or {}
+    return index_follows(hosted_file, keywords.get("FOLLOW", []))
+
+
+def get_followers_page(nickname: str, after: str, limit: int) -> tuple[list, str]:
+    """
+    Return one page of the local followers of a file, by nickname.
+
+    Args:
+        nickname: Nickname of the followed file
+        after: Last nickname of the previous page, or None for the first page
+        limit: Maximum number of nicknames to return
+
+    Returns:
+        Tuple of (nicknames, last nickname of the page or None on the last page)
+    """
+    followers = Follow.objects.filter(
+        target=link_target(build_public_url(nickname)),
+        hosted_file__redirect_url__isnull=True,
+    )
+    if after:
+        followers = followers.filter(hosted_file__nickname__gt=after)
+
+    page = list(
+        followers.order_by("hosted_file__nickname").values_list(
+            "hosted_file__nickname", flat=True
+        )[: limit + 1]
+    )
+    if len(page) > limit:
+        page = page[:limit]
+        return page, page[-1]
+    return page, None
+
+
+def get_following_page(hosted_file_id: int, after: str, limit: int) -> tuple[list, str]:
+    """
+    Return one page of the files a hosted file follows, by normalized URL.
+
+    Args:
+        hosted_file_id: Primary key of the following file
+        after: Last target of the previous page, or None for the first page
+        limit: Maximum number of edges to return
+
+    Returns:
+        Tuple of (edges as dicts with 'target', 'url' and 'name', last
+        target of the page or None on the last page)
+    """
+    follows = Follow.objects.filter(hosted_file_id=hosted_file_id)
+    if after:
+        follows = follows.filter(target__gt=after)
+
+    page = list(follows.order_by("target").values("target", "url", "name")[: limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, page[-1]["target"]
+    return page, None
@@ -0,0 +1,93 @@
+"""
+Benchmark POST /bulk-fetch against one GET /<nickname>/social.org per file.
+
+Requests go through the Django test client, so the per-request network
+overhead a real client pays for every GET is not included. Everything
+runs in a transaction that is rolled back.
+"""
+
+import json
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from app.hosting.cache import CONTENT_KEY_PREFIX, invalidate_file, local_cache
+from app.hosting.models import HostedFile
+
+
+class Command(BaseCommand):
+    help = "Benchmark POST /bulk-fetch against one GET per file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--files", type=int, default=200, help="Files fetched")
+        parser.add_argument("--size", type=int, default=20000, help="Bytes per file")
+
+    def handle(self, *args, **options):
+        self.client = Client(HTTP_HOST="localhost")
+
+        with transaction.atomic():
+            nicknames = []
+            for number in range(options["files"]):
+                nickname = f"benchmark-bulk-{number}"
+                HostedFile.objects.create(
+                    nickname=nickname,
+                    vfile_token=nickname,
+                    vfile_timestamp=0,
+                    vfile_signature="",
+                    file_content=f"#+TITLE: {nickname}\n" + "x" * options["size"],
+                )
+                nicknames.append(nickname)
+            hashes = dict(
+                HostedFile.objects.filter(nickname__in=nicknames).values_list(
+                    "nickname", "content_hash"
+                )
+            )
+            self.stdout.write(f"{len(nicknames)} files of {options['size']} bytes\n")
+
+            self.clear_cache(hashes)
+            self.run("GET each (cold cache)", lambda: self.get_each(nicknames))
+            self.clear_cache(hashes)
+            self.run("bulk-fetch (cold cache)", lambda: self.bulk_fetch(nicknames))
+            self.run("GET each (warm cache)", lambda: self.get_each(nicknames))
+            self.run("bulk-fetch (warm cache)", lambda: self.bulk_fetch(nicknames))
+
+            etags = {nickname: f'"{content_hash}"' for nickname, content_hash in hashes.items()}
+            self.run("conditional GET each", lambda: self.get_each(nicknames, etags))
+            self.run("bulk-fetch with ETags", lambda: self.bulk_fetch(nicknames, etags))
+
+            transaction.set_rollback(True)
+
+    def clear_cache(self, hashes: dict):
+        """Drop the benchmark files from both cache tiers."""
+        local_cache.clear()
+        for nickname in hashes:
+            invalidate_file(nickname)
+        cache.delete_many([CONTENT_KEY_PREFIX + content_hash for content_hash in hashes.values()])
+
+    def get_each(self, nicknames: list, etags: dict = None) -> int:
+        received = 0
+        for nickname in nicknames:
+            headers = {"HTTP_IF_NONE_MATCH": etags[nickname]} if etags else {}
+            response = self.client.get(f"/{nickname}/social.org", **headers)
+            received += len(response.content)
+        return received
+
+    def bulk_fetch(self, nicknames: list, etags: dict = None) -> int:
+        files = [{"nick": nickname, "etag": (etags or {}).get(nickname)} for nickname in nicknames]
+        response = self.client.post(
+            "/bulk-fetch", json.dumps({"files": files}), content_type="application/json"
+        )
+        return len(b"".join(response.streaming_content))
+
+    def run(self, label: str, fetch):
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            received = fetch()
+            elapsed = (time.perf_counter() - started_at) * 1000
+        self.stdout.write(
+            f"{label:<26} {elapsed:9.1f} ms  {len(queries):5d} queries  {received:9d} bytes"
+        )
@@ -0,0 +1,90 @@
+"""
+Benchmark post indexing on a synthetic file: a full index versus the
+incremental re-index of typical edits.
+
+Everything runs in a transaction that is rolled back.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from app.hosting.models import HostedFile, Post
+from app.hosting.posts import index_posts
+
+HEADER = "#+TITLE: Benchmark\n#+NICK: benchmark\n\n* Posts\n"
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def make_post(number: int, body: str = "Lorem ipsum dolor sit amet") -> str:
+    post_id = (START + timedelta(minutes=number)).isoformat()
+    return (
+        f"**\n:PROPERTIES:\n:ID: {post_id}\n:TAGS: benchmark tag{number % 10}\n:END:\n\n"
+        f"{body} {number}\n\n"
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark full versus incremental post indexing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=10000, help="Posts in the file")
+
+    def handle(self, *args, **options):
+        count = options["posts"]
+        posts = [make_post(number) for number in range(count)]
+
+        with transaction.atomic():
+            hosted_file = HostedFile.objects.create(
+                nickname="benchmark-indexing",
+                vfile_token="benchmark-indexing",
+                vfile_timestamp=0,
+                vfile_signature="",
+                file_content=HEADER + "".join(posts),
+            )
+            size = hosted_file.content_size
+            self.stdout.write(f"File: {count} posts, {size} bytes\n")
+
+            self.run("full index", hosted_file, None)
+
+            posts.append(make_post(count))
+            self.run("append 1 post", hosted_file, posts)
+
+            posts.extend(make_post(count + 1 + n) for n in range(10))
+            self.run("append 10 posts", hosted_file, posts)
+
+            posts[-5] = make_post(count + 6, body="Edited")
+            self.run("edit a recent post", hosted_file, posts)
+
+            posts[count // 2] = make_post(count // 2, body="Edited")
+            self.run("edit a post in the middle", hosted_file, posts)
+
+            posts.pop()
+            self.run("delete the last post", hosted_file, posts)
+
+            self.run("no change", hosted_file, posts)
+
+            # Full index of the final content, for comparison
+            Post.objects.filter(hosted_file=hosted_file).delete()
+            self.run("full index (final content)", hosted_file, None)
+
+            transaction.set_rollback(True)
+
+    def run(self, label, hosted_file, posts):
+        if posts is not None:
+            hosted_file.file_content = HEADER + "".join(posts)
+            hosted_file.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            result = index_posts(hosted_file)
+            elapsed = (time.perf_counter() - started_at) * 1000
+
+        self.stdout.write(
+            f"{label:<28} {elapsed:9.1f} ms  {len(queries):4d} queries  "
+            f"parsed={result['parsed']} created={result['created']} "
+            f"updated={result['updated']} moved={result['moved']} deleted={result['deleted']}"
+        )
@@ -0,0 +1,100 @@
+"""
+Benchmark full-text search on a synthetic corpus.
+
+Posts are inserted straight into the post index (no files are written),
+with words drawn from a Zipf-like distribution so some terms are very
+common and most are rare. Everything runs in a transaction that is
+rolled back.
+"""
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.hosting.models import HostedFile, Post
+from app.hosting.search import search_posts
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Benchmark full-text search on a synthetic corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1000000, help="Posts in the corpus")
+        parser.add_argument("--files", type=int, default=1000, help="Files the posts belong to")
+        parser.add_argument("--words", type=int, default=20, help="Words per post")
+        parser.add_argument("--vocabulary", type=int, default=20000, help="Distinct words")
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        vocabulary = [f"w{number}" for number in range(options["vocabulary"])]
+        # Zipf-like: the n-th word is about n times less frequent than the first
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+        with transaction.atomic():
+            files = HostedFile.objects.bulk_create(
+                HostedFile(
+                    nickname=f"benchmark-search-{number}",
+                    vfile_token=f"benchmark-search-{number}",
+                    vfile_timestamp=0,
+                    vfile_signature="",
+                )
+                for number in range(options["files"])
+            )
+
+            started_at = time.perf_counter()
+            for first in range(0, options["posts"], BATCH_SIZE):
+                count = min(BATCH_SIZE, options["posts"] - first)
+                words = rng.choices(vocabulary, weights, k=count * options["words"])
+                Post.objects.bulk_create(
+                    Post(
+                        hosted_file=files[number % len(files)],
+                        post_id=str(number),
+                        published_at=START + timedelta(seconds=number),
+                        text=" ".join(words[n * options["words"] : (n + 1) * options["words"]]),
+                        start=0,
+                        end=0,
+                    )
+                    for n, number in enumerate(range(first, first + count))
+                )
+            elapsed = time.perf_counter() - started_at
+            self.stdout.write(
+                f"Indexed {options['posts']} posts in {elapsed:.1f}s "
+                f"({options['posts'] / elapsed:.0f} posts/s)"
+            )
+
+            queries = [
+                ("common word", "w0"),
+                ("mid-frequency word", "w100"),
+                ("rare word", f"w{len(vocabulary) - 1}"),
+                ("two words", "w1 w2"),
+                ("prefix", "w1234"),
+                ("no match", "nothing"),
+            ]
+            for label, query in queries:
+                self.run(label, query, 0)
+            self.run("common word, offset 500", "w0", 500)
+
+            # Incremental update of one post, as done by index_posts
+            post = Post.objects.order_by("-id").first()
+            started_at = time.perf_counter()
+            Post.objects.filter(id=post.id).update(text="edited benchmark post")
+            elapsed = (time.perf_counter() - started_at) * 1000
+            self.stdout.write(f"{'update one post':<28} {elapsed:9.1f} ms")
+            self.run("edited post", "edited benchmark", 0)
+
+            transaction.set_rollback(True)
+
+    def run(self, label, query, offset):
+        started_at = time.perf_counter()
+        results, has_more = search_posts(query, offset, 20)
+        elapsed = (time.perf_counter() - started_at) * 1000
+        self.stdout.write(
+            f"{label:<28} {elapsed:9.1f} ms  {len(results)} results"
+            f"{' (more)' if has_more else ''}"
+        )
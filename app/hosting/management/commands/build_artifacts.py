@@ -0,0 +1,27 @@
+"""
+Queue the build of the derived artifacts of hosted files that lack them.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from app.hosting.models import HostedFile
+from app.hosting.tasks import enqueue_artifacts
+
+
+class Command(BaseCommand):
+    help = "Queue the build of the derived artifacts of hosted files that lack them"
+
+    def handle(self, *args, **options):
+        nicknames = (
+            HostedFile.objects.filter(has_content=True)
+            .exclude(artifacts_hash=F("content_hash"))
+            .values_list("nickname", flat=True)
+        )
+
+        queued = 0
+        for nickname in nicknames.iterator(chunk_size=500):
+            if enqueue_artifacts(nickname):
+                queued += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} files."))
@@ -0,0 +1,42 @@
+"""
+Run the stale file cleanup immediately.
+"""
+
+from django.core.management.base import BaseCommand
+
+from app.hosting.tasks import cleanup_stale_files
+
+
+class Command(BaseCommand):
+    help = "Delete files that haven't been accessed within FILE_TTL_DAYS"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many files would be deleted",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Files deleted per batch (default: CLEANUP_BATCH_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        metrics = cleanup_stale_files.call_local(
+            dry_run=options["dry_run"],
+            batch_size=options["batch_size"],
+        )
+        if metrics is None:
+            self.stdout.write(self.style.WARNING("Automatic cleanup is disabled (ENABLE_CLEANUP)."))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {metrics['scanned']} stale files in {metrics['batches']} batches, "
+                f"deleted {metrics['deleted']} ({metrics['failed']} failed) "
+                f"in {metrics['elapsed']}s"
+                f"{' (dry run)' if metrics['dry_run'] else ''}."
+            )
+        )
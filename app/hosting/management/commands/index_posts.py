@@ -0,0 +1,36 @@
+"""
+Queue the post index build of hosted files that do not have one yet.
+"""
+
+from django.core.management.base import BaseCommand
+
+from app.hosting.models import HostedFile
+from app.hosting.tasks import enqueue_artifacts
+
+
+class Command(BaseCommand):
+    help = "Queue the post index build of hosted files that do not have one yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild the index of every file, not only unindexed ones",
+        )
+
+    def handle(self, *args, **options):
+        hosted_files = HostedFile.objects.all()
+        if not options["all"]:
+            hosted_files = hosted_files.filter(header_size__isnull=True)
+
+        # The index is built by the artifacts pipeline, which holds the row
+        # and is never run twice at once for a nickname
+        nicknames = hosted_files.values_list("nickname", flat=True)
+
+        queued = 0
+        for nickname in nicknames.iterator(chunk_size=500):
+            HostedFile.objects.filter(nickname=nickname).update(artifacts_hash="")
+            if enqueue_artifacts(nickname):
+                queued += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} files."))
@@ -0,0 +1,77 @@
+"""
+Rebuild the STORAGE_PATH mirror of hosted files from the database.
+"""
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.hosting.compression import get_stored_variant
+from app.hosting.models import HostedFile
+from app.hosting.storage import list_nicknames, remove_directory, sync_file
+from app.hosting.tasks import PIPELINE_KEY_PREFIX
+
+
+class Command(BaseCommand):
+    help = "Rebuild the STORAGE_PATH mirror of hosted files from the database"
+
+    def handle(self, *args, **options):
+        # Write every active file
+        nicknames = HostedFile.objects.filter(
+            redirect_url__isnull=True, has_content=True
+        ).values_list("nickname", flat=True)
+
+        active_nicknames = set()
+        written = 0
+        for nickname in nicknames.iterator(chunk_size=500):
+            active_nicknames.add(nickname)
+            if self.sync(nickname):
+                written += 1
+
+        # Remove everything else
+        removed = 0
+        for nickname in list_nicknames() - active_nicknames:
+            if self.sync(nickname):
+                removed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {written} files, removed {removed} stale directories."
+            )
+        )
+
+    def sync(self, nickname: str) -> bool:
+        """
+        Mirror one file as it is now, like the artifacts pipeline does.
+
+        Active files with a pipeline queued, or whose artifacts are out of
+        date, are left to the pipeline. Otherwise the row is locked while the
+        mirror is written, so uploads and pipelines running meanwhile wait.
+
+        Args:
+            nickname: Nickname of the hosted file or storage directory
+
+        Returns:
+            True if the mirror was written or removed
+        """
+        with transaction.atomic():
+            hosted_file = (
+                HostedFile.objects.select_for_update()
+                .only(
+                    "id",
+                    "nickname",
+                    "file_content",
+                    "content_hash",
+                    "artifacts_hash",
+                    "redirect_url",
+                )
+                .filter(nickname=nickname)
+                .first()
+            )
+            if hosted_file is None or hosted_file.is_redirected or not hosted_file.file_content:
+                remove_directory(nickname)
+                return True
+            if cache.get(PIPELINE_KEY_PREFIX + nickname) or not hosted_file.artifacts_ready:
+                return False
+            sync_file(hosted_file, get_stored_variant(hosted_file, "gzip"))
+        return True
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:50
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_content_metadata(apps, schema_editor):
+    # The derived artifacts (compressed variants, post index, mirror) are left
+    # unbuilt (empty artifacts_hash): `manage.py build_artifacts` queues them
+    HostedFile = apps.get_model('hosting', 'HostedFile')
+    batch = []
+    for hosted_file in HostedFile.objects.only('id', 'file_content').iterator(chunk_size=100):
+        encoded = hosted_file.file_content.encode('utf-8')
+        hosted_file.content_hash = hashlib.sha256(encoded).hexdigest()
+        hosted_file.content_size = len(encoded)
+        hosted_file.has_content = bool(encoded)
+        batch.append(hosted_file)
+        if len(batch) == 100:
+            HostedFile.objects.bulk_update(batch, ['content_hash', 'content_size', 'has_content'])
+            batch = []
+    if batch:
+        HostedFile.objects.bulk_update(batch, ['content_hash', 'content_size', 'has_content'])
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ('hosting', '0003_hostedfile_content_hash'),
+        ('hosting', '0004_compressedvariant'),
+        ('hosting', '0005_hostedfile_has_content'),
+        ('hosting', '0006_hostedfile_last_access_idx'),
+        ('hosting', '0010_hostedfile_artifacts_hash'),
+        ('hosting', '0019_hostedfile_artifacts_pending'),
+    ]
+
+    dependencies = [
+        ('hosting', '0002_remove_hostedfile_file_path_hostedfile_file_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hostedfile',
+            name='content_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='hostedfile',
+            name='content_size',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hostedfile',
+            name='has_content',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='hostedfile',
+            name='artifacts_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(backfill_content_metadata, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='hostedfile',
+            index=models.Index(condition=models.Q(('has_content', True), ('redirect_url__isnull', True)), fields=['nickname'], name='hosted_files_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hostedfile',
+            index=models.Index(fields=['last_access', 'id'], name='hosted_files_last_access_idx'),
+        ),
+        migrations.CreateModel(
+            name='CompressedVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('encoding', models.CharField(max_length=10)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('size', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('hosted_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compressed_variants', to='hosting.hostedfile')),
+            ],
+            options={
+                'db_table': 'compressed_variants',
+                'constraints': [models.UniqueConstraint(fields=('hosted_file', 'encoding'), name='unique_compressed_variant_encoding')],
+            },
+        ),
+    ]
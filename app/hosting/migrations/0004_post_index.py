@@ -0,0 +1,120 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Existing files are indexed by `manage.py index_posts` (header_size is null)
+
+    replaces = [
+        ('hosting', '0007_post_index'),
+        ('hosting', '0008_post_properties_profile_header'),
+        ('hosting', '0009_post_block_hash'),
+        ('hosting', '0011_post_text_tags'),
+        ('hosting', '0012_post_published_idx'),
+        ('hosting', '0014_post_mentions_replies'),
+        ('hosting', '0015_follows'),
+        ('hosting', '0018_post_link_indexes'),
+    ]
+
+    dependencies = [
+        ('hosting', '0003_hostedfile_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hostedfile',
+            name='header_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Post',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.CharField(max_length=100)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('properties', models.JSONField(default=dict)),
+                ('tags', models.JSONField(default=list)),
+                ('text', models.TextField(blank=True, default='')),
+                ('block_hash', models.CharField(default='', max_length=64)),
+                ('start', models.PositiveIntegerField()),
+                ('end', models.PositiveIntegerField()),
+                ('hosted_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posts', to='hosting.hostedfile')),
+            ],
+            options={
+                'db_table': 'posts',
+                'ordering': ['hosted_file', 'start'],
+                'indexes': [models.Index(fields=['hosted_file', 'start'], name='posts_file_start_idx'), models.Index(fields=['hosted_file', 'published_at'], name='posts_file_published_idx'), models.Index(fields=['published_at', 'id'], name='posts_published_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hosted_file', 'post_id'), name='unique_post_id')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileHeader',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('nick', models.CharField(blank=True, default='', max_length=100)),
+                ('description', models.TextField(blank=True, default='')),
+                ('avatar', models.CharField(blank=True, default='', max_length=500)),
+                ('keywords', models.JSONField(default=dict)),
+                ('header_hash', models.CharField(default='', max_length=64)),
+                ('hosted_file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile_header', to='hosting.hostedfile')),
+            ],
+            options={
+                'db_table': 'profile_headers',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=100)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_rows', to='hosting.post')),
+            ],
+            options={
+                'db_table': 'post_tags',
+                'indexes': [models.Index(fields=['tag', 'post'], name='post_tags_tag_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostMention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(max_length=500)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mention_rows', to='hosting.post')),
+            ],
+            options={
+                'db_table': 'post_mentions',
+                'indexes': [models.Index(fields=['target', 'post'], name='post_mentions_target_post_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostReply',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(max_length=500)),
+                ('target_post_id', models.CharField(max_length=100)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reply_rows', to='hosting.post')),
+            ],
+            options={
+                'db_table': 'post_replies',
+                'indexes': [models.Index(fields=['target', 'target_post_id', 'post'], name='post_replies_target_post_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Follow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(max_length=500)),
+                ('url', models.CharField(max_length=500)),
+                ('name', models.CharField(blank=True, default='', max_length=100)),
+                ('hosted_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follows', to='hosting.hostedfile')),
+            ],
+            options={
+                'db_table': 'follows',
+                'indexes': [models.Index(fields=['target'], name='follows_target_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hosted_file', 'target'), name='unique_follow_target')],
+            },
+        ),
+    ]
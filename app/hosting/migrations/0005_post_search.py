@@ -0,0 +1,80 @@
+# Full-text index of posts (see search.py)
+
+from django.db import migrations
+
+SQLITE_CREATE = [
+    # External content table: the text lives in posts, FTS5 only keeps the index
+    """
+    CREATE VIRTUAL TABLE post_search USING fts5(
+        text, tags, content='posts', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_search_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO post_search(rowid, text, tags) VALUES (new.id, new.text, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_search_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO post_search(post_search, rowid, text, tags)
+        VALUES ('delete', old.id, old.text, old.tags);
+    END
+    """,
+    # Offset-only updates (posts moved by an edit) do not touch the index
+    """
+    CREATE TRIGGER posts_search_update AFTER UPDATE OF text, tags ON posts BEGIN
+        INSERT INTO post_search(post_search, rowid, text, tags)
+        VALUES ('delete', old.id, old.text, old.tags);
+        INSERT INTO post_search(rowid, text, tags) VALUES (new.id, new.text, new.tags);
+    END
+    """,
+    "INSERT INTO post_search(post_search) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS posts_search_update",
+    "DROP TRIGGER IF EXISTS posts_search_delete",
+    "DROP TRIGGER IF EXISTS posts_search_insert",
+    "DROP TABLE IF EXISTS post_search",
+]
+
+POSTGRES_CREATE = [
+    """
+    ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(text, '') || ' ' || coalesce(tags::text, ''))
+    ) STORED
+    """,
+    "CREATE INDEX posts_search_idx ON posts USING GIN (search_vector)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS posts_search_idx",
+    "ALTER TABLE posts DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ('hosting', '0013_post_search'),
+    ]
+
+    dependencies = [
+        ('hosting', '0004_post_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
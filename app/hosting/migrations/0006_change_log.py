@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ('hosting', '0016_change_log'),
+    ]
+
+    dependencies = [
+        ('hosting', '0005_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('nickname', models.CharField(max_length=100)),
+                ('event', models.CharField(max_length=20)),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('redirect_url', models.CharField(blank=True, default='', max_length=500)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'changes',
+                'indexes': [models.Index(fields=['nickname', 'seq'], name='changes_nickname_seq_idx'), models.Index(fields=['created_at'], name='changes_created_idx')],
+            },
+        ),
+    ]
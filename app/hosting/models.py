@@ -5,6 +5,8 @@ Models for Org Social Host application.
 from django.db import models
 from django.utils import timezone
 
+from .utils import build_public_url, compute_content_hash
+
 
 class HostedFile(models.Model):
     """Model to store hosted social.org files."""
@@ -19,6 +21,14 @@ class HostedFile(models.Model):
 
     # File storage
     file_content = models.TextField(default="")  # Content of the social.org file
+    content_hash = models.CharField(max_length=64, default="")  # SHA-256 of file_content
+    content_size = models.PositiveIntegerField(default=0)  # Size in bytes (UTF-8)
+    has_content = models.BooleanField(default=False)  # content_size > 0
+    # Bytes before the first post (see posts.py), None until indexed
+    header_size = models.PositiveIntegerField(null=True, blank=True)
+    # content_hash the derived artifacts (compressed variants, post index,
+    # storage mirror) were last built for; differs while they are being built
+    artifacts_hash = models.CharField(max_length=64, blank=True, default="")
 
     # Redirection (for migration)
     redirect_url = models.URLField(max_length=500, null=True, blank=True)
@@ -31,10 +41,60 @@ class HostedFile(models.Model):
     class Meta:
         db_table = "hosted_files"
         ordering = ["-created_at"]
+        indexes = [
+            # Public files listed by /public-routes
+            models.Index(
+                fields=["nickname"],
+                condition=models.Q(redirect_url__isnull=True, has_content=True),
+                name="hosted_files_public_idx",
+            ),
+            # Stale files removed by cleanup_stale_files
+            models.Index(
+                fields=["last_access", "id"],
+                name="hosted_files_last_access_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the content metadata in sync whenever file_content is written
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "file_content" in update_fields:
+            if not getattr(self, "_content_metadata_set", False):
+                encoded = self.file_content.encode("utf-8")
+                self.content_hash = compute_content_hash(encoded)
+                self.content_size = len(encoded)
+            self.has_content = self.content_size > 0
+            self._content_metadata_set = False
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "content_hash",
+                    "content_size",
+                    "has_content",
+                }
+
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.nickname} ({self.vfile_token[:20]}...)"
 
+    def set_content(self, file_content: str, content_hash: str, content_size: int):
+        """
+        Set file_content with metadata already computed by the caller.
+
+        Used when the content was hashed while it was received, so save()
+        does not encode and hash it again.
+
+        Args:
+            file_content: New content of the file
+            content_hash: SHA-256 hex digest of the content encoded as UTF-8
+            content_size: Size in bytes of the content encoded as UTF-8
+        """
+        self.file_content = file_content
+        self.content_hash = content_hash
+        self.content_size = content_size
+        self._content_metadata_set = True
+
     def get_public_url(self, request=None):
         """
         Return the public URL for this file.
@@ -45,20 +105,7 @@ class HostedFile(models.Model):
         Returns:
             Public URL with correct scheme (http/https)
         """
-        from django.conf import settings
-
-        # Detect scheme:
-        # 1. If request is secure (X-Forwarded-Proto: https), use https
-        # 2. If SITE_DOMAIN is not localhost, assume https (production)
-        # 3. Otherwise use http (development)
-        if request and request.is_secure():
-            scheme = "https"
-        elif not settings.SITE_DOMAIN.startswith("localhost"):
-            scheme = "https"
-        else:
-            scheme = "http"
-
-        return f"{scheme}://{settings.SITE_DOMAIN}/{self.nickname}/social.org"
+        return build_public_url(self.nickname, request)
 
     @property
     def public_url(self):
@@ -73,7 +120,228 @@ class HostedFile(models.Model):
         """Check if this file is currently redirected."""
         return bool(self.redirect_url)
 
+    @property
+    def artifacts_ready(self):
+        """Check if the derived artifacts match the current content."""
+        return self.artifacts_hash == self.content_hash
+
+    @property
+    def etag(self):
+        """Strong ETag of the current file content."""
+        return f'"{self.content_hash}"'
+
     def touch(self):
-        """Update last_access timestamp."""
-        self.last_access = timezone.now()
-        self.save(update_fields=["last_access"])
+        """Record an access; last_access is updated by the next buffer flush."""
+        from .access import record_access
+
+        record_access(self.nickname)
+
+
+class CompressedVariant(models.Model):
+    """Precompressed representation of a hosted file, generated when it is written."""
+
+    hosted_file = models.ForeignKey(
+        HostedFile,
+        on_delete=models.CASCADE,
+        related_name="compressed_variants",
+    )
+    encoding = models.CharField(max_length=10)  # Content-Encoding token (gzip, br, zstd)
+    content_hash = models.CharField(max_length=64)  # Hash of the content it was generated from
+    size = models.PositiveIntegerField()  # Size of data in bytes
+    data = models.BinaryField()
+
+    class Meta:
+        db_table = "compressed_variants"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hosted_file", "encoding"],
+                name="unique_compressed_variant_encoding",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hosted_file_id} ({self.encoding})"
+
+
+class Post(models.Model):
+    """
+    A post of a hosted file, located by its byte offsets in the content.
+
+    The full-text index (see search.py) is kept outside the ORM: on SQLite,
+    triggers on this table feed an FTS5 table, created with raw SQL by the
+    post_search migration. SQLite rebuilds the table on AlterField and
+    RemoveField, which silently drops those triggers, so a migration that
+    changes this model must create them again (SearchTest checks they exist).
+    """
+
+    hosted_file = models.ForeignKey(
+        HostedFile,
+        on_delete=models.CASCADE,
+        related_name="posts",
+    )
+    post_id = models.CharField(max_length=100)  # :ID: property, an RFC 3339 timestamp
+    published_at = models.DateTimeField(null=True, blank=True)  # Parsed post_id
+    properties = models.JSONField(default=dict)  # :PROPERTIES: drawer (LANG, REPLY_TO, ...)
+    tags = models.JSONField(default=list)  # :TAGS: property and heading tags
+    text = models.TextField(blank=True, default="")  # Body, after the properties drawer
+    block_hash = models.CharField(max_length=64, default="")  # SHA-256 of the post's bytes
+    start = models.PositiveIntegerField()  # Byte offset of the heading
+    end = models.PositiveIntegerField()  # Byte offset after the last line
+
+    class Meta:
+        db_table = "posts"
+        ordering = ["hosted_file", "start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hosted_file", "post_id"],
+                name="unique_post_id",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["hosted_file", "start"], name="posts_file_start_idx"),
+            models.Index(fields=["hosted_file", "published_at"], name="posts_file_published_idx"),
+            # /timeline, newest first across every file
+            models.Index(fields=["published_at", "id"], name="posts_published_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.hosted_file_id}#{self.post_id}"
+
+
+class PostTag(models.Model):
+    """A tag of an indexed post, lower-cased, for filtering posts by tag."""
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="tag_rows")
+    tag = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = "post_tags"
+        indexes = [
+            models.Index(fields=["tag", "post"], name="post_tags_tag_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} #{self.tag}"
+
+
+class PostMention(models.Model):
+    """A file mentioned by an indexed post with an [[org-social:URL][name]] link."""
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="mention_rows")
+    target = models.CharField(max_length=500)  # Mentioned URL, see posts.link_target()
+
+    class Meta:
+        db_table = "post_mentions"
+        indexes = [
+            models.Index(fields=["target", "post"], name="post_mentions_target_post_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} @{self.target}"
+
+
+class PostReply(models.Model):
+    """The post an indexed post replies to (:REPLY_TO: URL#ID)."""
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="reply_rows")
+    target = models.CharField(max_length=500)  # URL of the file, see posts.link_target()
+    target_post_id = models.CharField(max_length=100)  # ID of the post replied to
+
+    class Meta:
+        db_table = "post_replies"
+        indexes = [
+            models.Index(
+                fields=["target", "target_post_id", "post"],
+                name="post_replies_target_post_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.target}#{self.target_post_id}"
+
+
+class Follow(models.Model):
+    """A #+FOLLOW line of a hosted file: an edge from the file to the one it follows."""
+
+    hosted_file = models.ForeignKey(
+        HostedFile,
+        on_delete=models.CASCADE,
+        related_name="follows",
+    )
+    target = models.CharField(max_length=500)  # Followed URL, see posts.link_target()
+    url = models.CharField(max_length=500)  # Followed URL as written
+    name = models.CharField(max_length=100, blank=True, default="")  # Optional name before the URL
+
+    class Meta:
+        db_table = "follows"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hosted_file", "target"],
+                name="unique_follow_target",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["target"], name="follows_target_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.hosted_file_id} -> {self.target}"
+
+
+class ProfileHeader(models.Model):
+    """The #+ keywords at the top of a hosted file."""
+
+    hosted_file = models.OneToOneField(
+        HostedFile,
+        on_delete=models.CASCADE,
+        related_name="profile_header",
+    )
+    title = models.CharField(max_length=255, blank=True, default="")  # #+TITLE
+    nick = models.CharField(max_length=100, blank=True, default="")  # #+NICK
+    description = models.TextField(blank=True, default="")  # #+DESCRIPTION
+    avatar = models.CharField(max_length=500, blank=True, default="")  # #+AVATAR
+    keywords = models.JSONField(default=dict)  # Every keyword, to its list of values
+    header_hash = models.CharField(max_length=64, default="")  # SHA-256 of the header bytes
+
+    class Meta:
+        db_table = "profile_headers"
+
+    def __str__(self):
+        return f"{self.hosted_file_id} ({self.nick or self.title})"
+
+
+class Change(models.Model):
+    """An entry of the append-only change log read by mirrors (/changes)."""
+
+    seq = models.BigAutoField(primary_key=True)  # Increases with every change
+    nickname = models.CharField(max_length=100)
+    event = models.CharField(max_length=20)  # signup, upload, redirect, remove-redirect, delete, cleanup
+    content_hash = models.CharField(max_length=64, blank=True, default="")  # upload only
+    redirect_url = models.CharField(max_length=500, blank=True, default="")  # redirect only
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "changes"
+        indexes = [
+            # Compaction looks for later changes of the same nickname
+            models.Index(fields=["nickname", "seq"], name="changes_nickname_seq_idx"),
+            models.Index(fields=["created_at"], name="changes_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.seq} {self.event} {self.nickname}"
+
+
+class Webhook(models.Model):
+    """A URL the change log entries are POSTed to (/webhooks)."""
+
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64)  # Signs deliveries (HMAC-SHA256)
+    window = models.PositiveIntegerField()  # Seconds changes are batched for
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "webhooks"
+
+    def __str__(self):
+        return self.url
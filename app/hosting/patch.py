@@ -0,0 +1,136 @@
+"""
+Application of unified diffs to hosted files.
+
+Hunks are applied strictly: every context and removed line must match the
+stored file at the position given by the hunk header. There is no fuzz or
+offset search, so a diff made against another version of the file is
+rejected instead of being applied somewhere else.
+"""
+
+import re
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# Lines as diff sees them: only "\n" ends a line (str.splitlines also splits
+# on form feeds and other separators, which Org files may contain)
+LINE = re.compile(r"[^\n]*\n|[^\n]+\Z")
+
+
+class PatchError(ValueError):
+    """The diff is malformed or does not apply to the file."""
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    """
+    Apply a unified diff (as produced by `diff -u` or `git diff`) to a text.
+
+    Args:
+        original: Current content of the file
+        diff: Unified diff of a single file
+
+    Returns:
+        The patched content
+
+    Raises:
+        PatchError: If the diff is malformed or does not match the original
+    """
+    hunks = _parse_hunks(diff)
+    if not hunks:
+        raise PatchError("Diff contains no hunks")
+
+    lines = LINE.findall(original)
+    result = []
+    position = 0
+
+    for number, (old_start, old_count, operations) in enumerate(hunks, start=1):
+        # "-N,0" inserts after line N; otherwise the hunk starts at line N
+        start = old_start if old_count == 0 else old_start - 1
+        if start < position or start > len(lines):
+            raise PatchError(f"Hunk #{number} does not apply at line {old_start}")
+
+        result.extend(lines[position:start])
+        position = start
+
+        for kind, text in operations:
+            if kind in (" ", "-"):
+                if position >= len(lines) or lines[position] != text:
+                    raise PatchError(f"Hunk #{number} does not apply at line {position + 1}")
+                position += 1
+            if kind in (" ", "+"):
+                result.append(text)
+
+    result.extend(lines[position:])
+    return "".join(result)
+
+
+def _parse_hunks(diff: str) -> list:
+    """
+    Parse the hunks of a unified diff.
+
+    Returns:
+        List of (old_start, old_count, operations), where operations is a
+        list of (kind, line) with kind one of " ", "-" and "+"
+    """
+    hunks = []
+    lines = LINE.findall(diff)
+    index = 0
+
+    while index < len(lines):
+        match = HUNK_HEADER.match(lines[index])
+        index += 1
+        if match is None:
+            # File headers (---, +++, diff --git, index ...) and trailing noise
+            continue
+
+        old_start = int(match.group(1))
+        old_count = int(match.group(2) if match.group(2) is not None else 1)
+        new_count = int(match.group(4) if match.group(4) is not None else 1)
+        old_left, new_left = old_count, new_count
+        operations = []
+
+        while old_left > 0 or new_left > 0:
+            if index >= len(lines):
+                raise PatchError("Diff ends in the middle of a hunk")
+
+            line = lines[index]
+            index += 1
+            if line.startswith("\\"):
+                # "\ No newline at end of file" applies to the previous line
+                _strip_newline(operations)
+                continue
+
+            # Some tools drop the leading space of empty context lines
+            kind, text = (" ", line) if line in ("\n", "\r\n") else (line[0], line[1:])
+            if kind == " ":
+                old_left -= 1
+                new_left -= 1
+            elif kind == "-":
+                old_left -= 1
+            elif kind == "+":
+                new_left -= 1
+            else:
+                raise PatchError(f"Unexpected line in hunk: {line.rstrip()!r}")
+
+            if old_left < 0 or new_left < 0:
+                raise PatchError("Hunk is longer than its header says")
+            operations.append((kind, text))
+
+        # The marker may follow the last line of the hunk
+        if index < len(lines) and lines[index].startswith("\\"):
+            _strip_newline(operations)
+            index += 1
+
+        hunks.append((old_start, old_count, operations))
+
+    return hunks
+
+
+def _strip_newline(operations: list):
+    if not operations:
+        raise PatchError("Misplaced end-of-file marker")
+    kind, text = operations[-1]
+    if text.endswith("\r\n"):
+        text = text[:-2]
+    elif text.endswith("\n"):
+        text = text[:-1]
+    operations[-1] = (kind, text)
@@ -0,0 +1,615 @@
+"""
+Index of the posts of hosted files.
+
+A social.org file is a header (#+TITLE, #+NICK, #+FOLLOW, ...) followed by
+a "* Posts" section whose level 2 headings are the posts:
+
+    * Posts
+    **
+    :PROPERTIES:
+    :ID: 2025-01-01T12:00:00+0100
+    :END:
+
+    Post body
+
+When a file is written, its posts are stored as Post rows (id, properties,
+tags and byte offsets) and its #+ keywords as a ProfileHeader, so reads
+query indexed rows or slice the content instead of parsing it again. The
+tags, mentions ([[org-social:URL][name]]) and replies (:REPLY_TO: URL#ID)
+of each post, and the #+FOLLOW lines of the header, also get rows of
+their own, for reverse lookups.
+
+org-python (used to render org) builds a tree without source positions,
+so the file is split here with a line scanner that keeps byte offsets.
+"""
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Follow, HostedFile, Post, PostMention, PostReply, PostTag, ProfileHeader
+from .utils import compute_content_hash
+
+# Rows per query in bulk writes
+BULK_BATCH_SIZE = 500
+
+# Post fields written when the content of a post changes
+UPDATED_FIELDS = ["published_at", "properties", "tags", "text", "block_hash", "start", "end"]
+
+# Added to offsets while posts are being shifted; larger than any file
+OFFSET_PARKING = 1 << 30
+
+# "#+KEYWORD: value" lines of the header
+KEYWORD_LINE = re.compile(rb"^#\+([A-Za-z_]+):(.*)$")
+
+# Headings of level 1 (sections) and 2 (posts)
+HEADING_LINE = re.compile(rb"^(\*\*?)(?:[ \t][^\n]*?)?\r?$", re.MULTILINE)
+
+# ":tag1:tag2:" at the end of a heading
+HEADING_TAGS = re.compile(r"\s(:[^\s:]+(?::[^\s:]+)*:)\s*$")
+
+# [[org-social:URL][name]] (or [[org-social:URL]]) links in a post
+MENTION_LINK = re.compile(r"\[\[org-social:([^\]\s]+)\](?:\[[^\]]*\])?\]")
+
+
+def split_blocks(content: bytes) -> tuple[int, list]:
+    """
+    Find the header and the post blocks of a social.org file, without parsing the posts.
+
+    The header is everything before the first post. A post runs from its
+    heading to the next heading of level 1 or 2 (or the end of the file).
+
+    Args:
+        content: File content encoded as UTF-8
+
+    Returns:
+        Tuple of (header size in bytes, list of (start, end) byte offsets)
+    """
+    in_posts = False
+    header_size = None
+    blocks = []
+    current = None
+
+    for match in HEADING_LINE.finditer(content):
+        start = match.start()
+
+        # A heading of level 1 or 2 closes the current post
+        if current is not None:
+            blocks.append((current, start))
+            current = None
+
+        if len(match.group(1)) == 1:
+            in_posts = match.group(0)[1:].strip().lower() == b"posts"
+        elif in_posts:
+            if header_size is None:
+                header_size = start
+            current = start
+
+    if current is not None:
+        blocks.append((current, len(content)))
+
+    if header_size is None:
+        header_size = len(content)
+    return header_size, blocks
+
+
+def split_posts(content: bytes) -> tuple[int, list]:
+    """
+    Find and parse the header and the posts of a social.org file.
+
+    Args:
+        content: File content encoded as UTF-8
+
+    Returns:
+        Tuple of (header size in bytes, posts), where each post is a dict
+        with 'post_id', 'published_at', 'properties', 'tags', 'text',
+        'start' and 'end' (byte offsets)
+    """
+    header_size, blocks = split_blocks(content)
+    posts = [
+        {**parse_post(content[start:end]), "start": start, "end": end}
+        for start, end in blocks
+    ]
+    return header_size, posts
+
+
+def parse_post(block: bytes) -> dict:
+    """
+    Extract the id, properties and tags of a post.
+
+    Args:
+        block: Bytes of the post, from its heading to its end
+
+    Returns:
+        dict with 'post_id', 'published_at', 'properties', 'tags' and
+        'text' (the body, after the properties drawer)
+    """
+    lines = [line for _, line in _iter_lines(block)] or [b""]
+    heading = lines[0].lstrip(b"*").strip().decode("utf-8", "replace")
+    properties, body_start = _read_properties(lines)
+
+    # Heading tags (":emacs:org:") and the TAGS property (space separated)
+    tags = []
+    match = HEADING_TAGS.search(f" {heading}")
+    if match is not None:
+        tags.extend(match.group(1).strip(":").split(":"))
+        heading = heading[: -len(match.group(1))].strip()
+    tags.extend(properties.get("TAGS", "").split())
+
+    post_id = properties.get("ID")
+    if not post_id:
+        # Older files put the timestamp in the heading
+        post_id = heading
+
+    post_id = post_id[: Post._meta.get_field("post_id").max_length]
+    return {
+        "post_id": post_id,
+        "published_at": parse_timestamp(post_id) if post_id else None,
+        "properties": properties,
+        "tags": list(dict.fromkeys(tags)),
+        "text": b"\n".join(lines[body_start:]).strip().decode("utf-8", "replace"),
+    }
+
+
+def parse_header(header: bytes) -> dict:
+    """
+    Read the #+ keywords of a file header.
+
+    Args:
+        header: Bytes before the first post
+
+    Returns:
+        dict mapping each keyword (upper case) to the list of its values,
+        in file order (FOLLOW and CONTACT usually appear several times)
+    """
+    keywords = {}
+    for _, line in _iter_lines(header):
+        match = KEYWORD_LINE.match(line.strip())
+        if match is None:
+            continue
+        name = match.group(1).decode("ascii").upper()
+        value = match.group(2).strip().decode("utf-8", "replace")
+        keywords.setdefault(name, []).append(value)
+    return keywords
+
+
+def index_posts(hosted_file) -> dict:
+    """
+    Bring the post index and profile header of a hosted file up to date.
+
+    The file is split into post blocks and each block is hashed. Blocks
+    whose hash is already stored are not parsed again; only new and
+    changed posts are parsed and written, posts that moved only get their
+    offsets updated, and removed posts are deleted, all in bulk.
+
+    Must run in the transaction that saved the content, so the index never
+    describes another version of the file. Posts without an id, and
+    repeated ids after their first occurrence, are not indexed.
+
+    Args:
+        hosted_file: Saved HostedFile instance (with file_content loaded)
+
+    Returns:
+        dict with the number of posts 'parsed', 'created', 'updated',
+        'moved' and 'deleted', of follow edges changed ('follows'), and
+        the ids of the created and updated posts in file order ('changed')
+    """
+    content = hosted_file.file_content.encode("utf-8")
+    header_size, blocks = split_blocks(content)
+
+    # post_id -> (id, block_hash, start); plain tuples are much cheaper
+    # than model instances for files with thousands of posts
+    existing = {
+        post_id: (row_id, block_hash, start)
+        for row_id, post_id, block_hash, start in Post.objects.filter(
+            hosted_file=hosted_file
+        ).values_list("id", "post_id", "block_hash", "start")
+    }
+    known_blocks = {row[1]: post_id for post_id, row in existing.items() if row[1]}
+
+    # Identify every block, parsing only the ones not seen before
+    posts = []
+    parsed = 0
+    for start, end in blocks:
+        block_hash = compute_content_hash(content[start:end])
+        post_id = known_blocks.get(block_hash)
+        if post_id is not None:
+            # Unchanged post: only its offsets may have moved
+            post = {"post_id": post_id}
+        else:
+            post = parse_post(content[start:end])
+            parsed += 1
+        post.update(start=start, end=end, block_hash=block_hash)
+        posts.append(post)
+
+    to_create, to_update, shifts = [], [], []
+    changed = []
+    kept = set()
+    for post in unique_posts(posts):
+        kept.add(post["post_id"])
+        row = existing.get(post["post_id"])
+
+        if row is None:
+            to_create.append(_build_post(hosted_file, post))
+            changed.append(post["post_id"])
+        elif row[1] != post["block_hash"]:
+            # Same post, new content
+            to_update.append(Post(id=row[0], **_post_fields(post)))
+            changed.append(post["post_id"])
+        else:
+            # Same content, possibly shifted by an edit before it
+            shifts.append((row[2], post["start"] - row[2]))
+
+    to_delete = [row[0] for post_id, row in existing.items() if post_id not in kept]
+    moved = sum(1 for _, delta in shifts if delta)
+
+    with transaction.atomic():
+        if to_delete:
+            Post.objects.filter(id__in=to_delete).delete()
+        if moved:
+            _shift_posts(hosted_file, shifts)
+        if to_update:
+            # After the shifts, which may have moved these rows too
+            Post.objects.bulk_update(to_update, UPDATED_FIELDS, batch_size=BULK_BATCH_SIZE)
+            updated_ids = [post.id for post in to_update]
+            for model in (PostTag, PostMention, PostReply):
+                model.objects.filter(post__in=updated_ids).delete()
+        if to_create:
+            Post.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        _index_links(to_update + to_create)
+
+        follows = _index_header(hosted_file, content[:header_size])
+
+        if hosted_file.header_size != header_size:
+            hosted_file.header_size = header_size
+            HostedFile.objects.filter(id=hosted_file.id).update(header_size=header_size)
+
+    return {
+        "parsed": parsed,
+        "created": len(to_create),
+        "updated": len(to_update),
+        "moved": moved,
+        "deleted": len(to_delete),
+        "follows": follows,
+        "changed": changed,
+    }
+
+
+def _shift_posts(hosted_file, shifts: list):
+    """
+    Move the offsets of unchanged posts.
+
+    An edit shifts every post after it by the same number of bytes, so
+    posts are grouped in runs (consecutive in the file) with the same
+    shift and each run is moved with a single UPDATE, instead of writing
+    every row.
+
+    Args:
+        hosted_file: HostedFile the posts belong to
+        shifts: (old start, shift in bytes) of every unchanged post
+    """
+    runs = []
+    for start, delta in sorted(shifts):
+        if runs and runs[-1][2] == delta:
+            runs[-1][1] = start
+        else:
+            runs.append([start, start, delta])
+    runs = [run for run in runs if run[2]]
+
+    # With several runs, a moved run could land in the range of a run not
+    # moved yet, so runs are first moved past any real offset and then back
+    parking = OFFSET_PARKING if len(runs) > 1 else 0
+    posts = Post.objects.filter(hosted_file=hosted_file)
+    for first, last, delta in runs:
+        posts.filter(start__gte=first, start__lte=last).update(
+            start=F("start") + delta + parking,
+            end=F("end") + delta + parking,
+        )
+    if parking:
+        posts.filter(start__gte=parking).update(
+            start=F("start") - parking,
+            end=F("end") - parking,
+        )
+
+
+def _index_links(posts: list):
+    """Create the tag, mention and reply rows of new and changed posts (saved, with their ids)."""
+    tags, mentions, replies = [], [], []
+    for post in posts:
+        for tag in dict.fromkeys(tag.lower()[:100] for tag in post.tags):
+            tags.append(PostTag(post_id=post.id, tag=tag))
+        for target in parse_mentions(post.text):
+            mentions.append(PostMention(post_id=post.id, target=target))
+        reply_to = parse_reply_to(post.properties.get("REPLY_TO", ""))
+        if reply_to is not None:
+            replies.append(
+                PostReply(post_id=post.id, target=reply_to[0], target_post_id=reply_to[1])
+            )
+
+    PostTag.objects.bulk_create(tags, batch_size=BULK_BATCH_SIZE)
+    PostMention.objects.bulk_create(mentions, batch_size=BULK_BATCH_SIZE)
+    PostReply.objects.bulk_create(replies, batch_size=BULK_BATCH_SIZE)
+
+
+def _index_header(hosted_file, header: bytes) -> int:
+    """
+    Store the profile header and its follow edges, unless it has not changed.
+
+    Returns:
+        Number of follow edges created, updated or deleted
+    """
+    header_hash = compute_content_hash(header)
+    stored_hash = (
+        ProfileHeader.objects.filter(hosted_file=hosted_file)
+        .values_list("header_hash", flat=True)
+        .first()
+    )
+    if stored_hash == header_hash:
+        return 0
+
+    keywords = parse_header(header)
+    ProfileHeader.objects.update_or_create(
+        hosted_file=hosted_file,
+        defaults={**header_fields(keywords), "header_hash": header_hash},
+    )
+    return index_follows(hosted_file, keywords.get("FOLLOW", []))
+
+
+def index_follows(hosted_file, values: list) -> int:
+    """
+    Bring the follow edges of a hosted file up to date with its #+FOLLOW lines.
+
+    Only the difference with the stored edges is written. A redirected
+    file follows no one here: its header lives elsewhere.
+
+    Args:
+        hosted_file: HostedFile instance
+        values: Values of the file's #+FOLLOW keywords
+
+    Returns:
+        Number of edges created, updated or deleted
+    """
+    wanted = {}
+    if not hosted_file.redirect_url:
+        for value in values:
+            follow = parse_follow(value)
+            if follow is not None:
+                wanted.setdefault(follow["target"], follow)
+
+    existing = {
+        target: (row_id, url, name)
+        for row_id, target, url, name in Follow.objects.filter(
+            hosted_file=hosted_file
+        ).values_list("id", "target", "url", "name")
+    }
+    to_delete = [row[0] for target, row in existing.items() if target not in wanted]
+    to_create = [
+        Follow(hosted_file_id=hosted_file.id, **follow)
+        for target, follow in wanted.items()
+        if target not in existing
+    ]
+    to_update = [
+        Follow(id=existing[target][0], **follow)
+        for target, follow in wanted.items()
+        if target in existing and existing[target][1:] != (follow["url"], follow["name"])
+    ]
+
+    if to_delete:
+        Follow.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        Follow.objects.bulk_update(to_update, ["url", "name"], batch_size=BULK_BATCH_SIZE)
+    if to_create:
+        Follow.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    return len(to_delete) + len(to_update) + len(to_create)
+
+
+def parse_follow(value: str) -> dict:
+    """
+    Parse a #+FOLLOW value: a URL, optionally preceded by a name ("bob https://...").
+
+    Returns:
+        dict with 'target', 'url' and 'name', or None if there is no http(s) URL
+    """
+    name, _, url = value.strip().rpartition(" ")
+    if not url.startswith(("http://", "https://")):
+        return None
+    return {
+        "target": link_target(url),
+        "url": url[: Follow._meta.get_field("url").max_length],
+        "name": name.strip()[: Follow._meta.get_field("name").max_length],
+    }
+
+
+def link_target(url: str) -> str:
+    """
+    Normalize the URL of a social.org file for lookups.
+
+    The scheme is dropped (a file may be linked over http or https) and
+    the host lower-cased, so "https://Host/alice/social.org" and
+    "http://host/alice/social.org" give the same "host/alice/social.org".
+    """
+    _, separator, location = url.strip().partition("://")
+    if not separator:
+        location = url.strip()
+    host, slash, path = location.partition("/")
+    return f"{host.lower()}{slash}{path}"[: PostMention._meta.get_field("target").max_length]
+
+
+def parse_mentions(text: str) -> list:
+    """Return the normalized targets of the mention links of a post, without repeats."""
+    return list(dict.fromkeys(link_target(url) for url in MENTION_LINK.findall(text)))
+
+
+def parse_reply_to(value: str) -> tuple:
+    """
+    Split a :REPLY_TO: property.
+
+    Returns:
+        Tuple of (normalized target, post id), or None if the value is not URL#ID
+    """
+    url, _, post_id = value.strip().rpartition("#")
+    if not url or not post_id:
+        return None
+    return link_target(url), post_id[: PostReply._meta.get_field("target_post_id").max_length]
+
+
+def unique_posts(posts: list) -> list:
+    """Return the posts that can be indexed: with an id, first occurrence only."""
+    seen = set()
+    result = []
+    for post in posts:
+        if not post["post_id"] or post["post_id"] in seen:
+            continue
+        seen.add(post["post_id"])
+        result.append(post)
+    return result
+
+
+def header_fields(keywords: dict) -> dict:
+    """Return the ProfileHeader fields for the keywords of a header."""
+
+    def first(name, max_length=None):
+        value = keywords.get(name, [""])[0]
+        return value[:max_length] if max_length else value
+
+    return {
+        "title": first("TITLE", 255),
+        "nick": first("NICK", 100),
+        "description": first("DESCRIPTION"),
+        "avatar": first("AVATAR", 500),
+        "keywords": keywords,
+    }
+
+
+def _build_post(hosted_file, post: dict) -> Post:
+    return Post(hosted_file=hosted_file, post_id=post["post_id"], **_post_fields(post))
+
+
+def _post_fields(post: dict) -> dict:
+    return {field: post[field] for field in UPDATED_FIELDS}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse an org-social timestamp (RFC 3339, with or without colon in the offset).
+
+    Timestamps without an offset are taken as UTC.
+
+    Returns:
+        Aware datetime, or None if the value is not a timestamp
+    """
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+def resolve_since(hosted_file_id: int, value: str) -> datetime:
+    """
+    Resolve the since parameter of a partial read.
+
+    Args:
+        hosted_file_id: Primary key of the hosted file
+        value: RFC 3339 timestamp, or the id of one of the file's posts
+
+    Returns:
+        Aware datetime, or None if the value is neither
+    """
+    since = parse_timestamp(value)
+    if since is not None:
+        return since
+
+    # Post ids are normally timestamps, but older files may use other ids
+    return (
+        Post.objects.filter(hosted_file_id=hosted_file_id, post_id=value)
+        .values_list("published_at", flat=True)
+        .first()
+    )
+
+
+def posts_since(meta: dict, content: bytes, since: datetime) -> tuple[int, list]:
+    """
+    Return the header size and the (start, end) offsets of the posts
+    published after since, in file order.
+
+    Uses the stored index when it matches the content, and splits the
+    content otherwise (file not indexed yet, index still being built, or
+    file changed meanwhile).
+
+    Args:
+        meta: File metadata from cache.get_file()
+        content: File content the offsets apply to
+        since: Only posts published after this moment are returned
+    """
+    header_size = meta.get("header_size")
+    if header_size is not None and meta.get("artifacts_hash") == meta["content_hash"]:
+        offsets = list(
+            Post.objects.filter(hosted_file_id=meta["id"], published_at__gt=since)
+            .order_by("start")
+            .values_list("start", "end")
+        )
+        if _offsets_match(content, header_size, offsets):
+            return header_size, offsets
+
+    header_size, posts = split_posts(content)
+    offsets = [
+        (post["start"], post["end"])
+        for post in posts
+        if post["published_at"] is not None and post["published_at"] > since
+    ]
+    return header_size, offsets
+
+
+def _iter_lines(content: bytes):
+    """Yield (offset, line) for each line of content, without the newline."""
+    start = 0
+    length = len(content)
+    while start < length:
+        end = content.find(b"\n", start)
+        if end == -1:
+            end = length
+        yield start, content[start:end].rstrip(b"\r")
+        start = end + 1
+
+
+def _read_properties(lines: list) -> tuple[dict, int]:
+    """
+    Read the :PROPERTIES: drawer that follows a heading.
+
+    Args:
+        lines: Lines of the post, starting with its heading
+
+    Returns:
+        Tuple of (properties, index of the first line after the drawer)
+    """
+    properties = {}
+    if len(lines) < 2 or lines[1].strip().upper() != b":PROPERTIES:":
+        return properties, 1
+
+    for index in range(2, len(lines)):
+        line = lines[index].strip()
+        if line.upper() == b":END:":
+            return properties, index + 1
+        if not line.startswith(b":"):
+            continue
+        name, _, value = line[1:].partition(b":")
+        properties[name.decode("utf-8", "replace").upper()] = value.strip().decode(
+            "utf-8", "replace"
+        )
+    return properties, len(lines)
+
+
+def _offsets_match(content: bytes, header_size: int, offsets: list) -> bool:
+    """Check that stored offsets point at post headings of content."""
+    if header_size > len(content):
+        return False
+    for start, end in offsets:
+        if end > len(content) or content[start : start + 2] != b"**":
+            return False
+    return True
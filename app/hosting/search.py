@@ -0,0 +1,175 @@
+"""
+Full-text search over indexed posts.
+
+The inverted index is kept by the database itself, so it follows every
+change to the post index (upload, PATCH, delete, cleanup) in the same
+transaction, and posts that only moved are not re-indexed:
+
+- SQLite: an FTS5 table (post_search) with posts as external content,
+  maintained by triggers on posts (migration 0013). Ranked by bm25.
+- PostgreSQL: a generated tsvector column (posts.search_vector) with a
+  GIN index. Ranked by ts_rank.
+
+The backend is picked from the database vendor, or set with
+SEARCH_BACKEND (dotted path of a SearchBackend subclass).
+
+Snippets are returned as HTML: the post text is escaped and matched
+terms are wrapped in <mark>.
+"""
+
+import html
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .feeds import TIMELINE_FIELDS
+from .models import Post
+
+# Marks matched terms in snippets until the text is escaped
+START_MARK = "\x02"
+END_MARK = "\x03"
+
+# Words of a query; any FTS syntax in it is ignored
+QUERY_TERM = re.compile(r"\w+", re.UNICODE)
+
+# Terms used from a query at most
+MAX_QUERY_TERMS = 16
+
+
+class SearchBackend:
+    """Runs a search over the posts of public (not redirected) files."""
+
+    def search(self, terms: list, offset: int, limit: int) -> list:
+        """
+        Return one page of posts matching every term, best first.
+
+        Args:
+            terms: Words to search for (the last one also matches as a prefix)
+            offset: Results to skip
+            limit: Maximum number of results
+
+        Returns:
+            List of (post id, snippet), where the snippet is an excerpt of
+            the text with the matches between START_MARK and END_MARK
+        """
+        raise NotImplementedError
+
+    def fetch(self, sql: str, params: list) -> list:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 full-text search."""
+
+    def search(self, terms, offset, limit):
+        # Quoted terms are matched literally; "term"* is a prefix query
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        return self.fetch(
+            """
+            SELECT p.id, snippet(post_search, 0, %s, %s, '…', %s)
+            FROM post_search
+            JOIN posts p ON p.id = post_search.rowid
+            JOIN hosted_files h ON h.id = p.hosted_file_id
+            WHERE post_search MATCH %s AND h.redirect_url IS NULL
+              AND p.published_at IS NOT NULL
+            ORDER BY post_search.rank, p.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [START_MARK, END_MARK, settings.SEARCH_SNIPPET_WORDS, match, limit, offset],
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector full-text search."""
+
+    def search(self, terms, offset, limit):
+        query = " & ".join(terms) + ":*"
+        headline = (
+            f"StartSel={START_MARK}, StopSel={END_MARK}, "
+            f"MaxWords={settings.SEARCH_SNIPPET_WORDS}, MinWords=1, MaxFragments=1"
+        )
+        return self.fetch(
+            """
+            SELECT p.id, ts_headline('simple', p.text, q.query, %s)
+            FROM posts p
+            JOIN hosted_files h ON h.id = p.hosted_file_id
+            CROSS JOIN to_tsquery('simple', %s) AS q(query)
+            WHERE p.search_vector @@ q.query AND h.redirect_url IS NULL
+              AND p.published_at IS NOT NULL
+            ORDER BY ts_rank(p.search_vector, q.query) DESC, p.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [headline, query, limit, offset],
+        )
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_backend() -> SearchBackend:
+    """Return the search backend for the configured database."""
+    if settings.SEARCH_BACKEND:
+        return import_string(settings.SEARCH_BACKEND)()
+    return BACKENDS[connection.vendor]()
+
+
+def query_terms(query: str) -> list:
+    """
+    Extract the words of a search query.
+
+    Returns:
+        Lower-cased words, without repeats, at most MAX_QUERY_TERMS
+    """
+    terms = dict.fromkeys(term.lower() for term in QUERY_TERM.findall(query))
+    return list(terms)[:MAX_QUERY_TERMS]
+
+
+def search_posts(query: str, offset: int, limit: int) -> tuple[list, bool]:
+    """
+    Search the posts of public files.
+
+    Args:
+        query: Words to search for, all required
+        offset: Results to skip
+        limit: Maximum number of results
+
+    Returns:
+        Tuple of (results, whether there are more). Results are dicts with
+        the TIMELINE_FIELDS of feeds.py and 'snippet' (HTML), best first.
+        A query without words has no results.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+
+    matches = get_backend().search(terms, offset, limit + 1)
+    has_more = len(matches) > limit
+    matches = matches[:limit]
+
+    posts = {
+        post["id"]: post
+        for post in Post.objects.filter(id__in=[post_pk for post_pk, _ in matches]).values(
+            *TIMELINE_FIELDS
+        )
+    }
+    results = [
+        {**posts[post_pk], "snippet": highlight(snippet)}
+        for post_pk, snippet in matches
+        # Deleted since the search ran
+        if post_pk in posts
+    ]
+    return results, has_more
+
+
+def highlight(snippet: str) -> str:
+    """Escape a snippet as HTML, wrapping the matched terms in <mark>."""
+    return (
+        html.escape(snippet).replace(START_MARK, "<mark>").replace(END_MARK, "</mark>")
+    )
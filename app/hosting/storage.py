@@ -0,0 +1,221 @@
+"""
+Mirror of hosted files in STORAGE_PATH, sent by nginx.
+
+Each active file is written to STORAGE_PATH/<nickname>/social.org (plus a
+social.org.gz with its gzip variant). Django answers reads and hands the
+body of mirrored files to nginx (X-Accel-Redirect). Redirected, empty and
+deleted files are removed, and files that are not mirrored are sent by
+Django.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FILE_NAME = "social.org"
+GZIP_FILE_NAME = "social.org.gz"
+
+
+def get_file_path(nickname: str) -> Path:
+    """
+    Return the path where a nickname's file is mirrored.
+
+    Args:
+        nickname: Nickname of the hosted file
+
+    Returns:
+        Path to STORAGE_PATH/<nickname>/social.org
+    """
+    return Path(settings.STORAGE_PATH) / nickname / FILE_NAME
+
+
+def write_file(nickname: str, content: bytes, gzip_content: bytes = None):
+    """
+    Atomically write a file (and optionally its gzip variant) to storage.
+
+    Args:
+        nickname: Nickname of the hosted file
+        content: File content encoded as UTF-8
+        gzip_content: Precompressed gzip variant, or None to remove it
+    """
+    directory = get_file_path(nickname).parent
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # Write the variant first so it is never older than the file it belongs to
+    if gzip_content is not None:
+        _write_atomic(directory / GZIP_FILE_NAME, gzip_content)
+    else:
+        _unlink(directory / GZIP_FILE_NAME)
+
+    _write_atomic(directory / FILE_NAME, content)
+
+
+def remove_file(nickname: str):
+    """
+    Remove a nickname's mirrored file, if any. Errors are logged.
+
+    Args:
+        nickname: Nickname of the hosted file
+    """
+    try:
+        _remove_file(nickname)
+    except OSError as e:
+        logger.error(f"Error removing file {nickname} from storage: {e}")
+
+
+def sync_file(hosted_file, gzip_content: bytes = None):
+    """
+    Bring the mirrored copy of a hosted file in line with the database.
+
+    Errors are logged rather than raised. If the file cannot be written, the
+    old copy is removed so Django sends the file instead of nginx serving
+    stale content.
+
+    Args:
+        hosted_file: HostedFile instance
+        gzip_content: Precompressed gzip variant of the current content
+    """
+    nickname = hosted_file.nickname
+
+    if hosted_file.is_redirected or not hosted_file.file_content:
+        remove_file(nickname)
+        return
+
+    try:
+        write_file(nickname, hosted_file.file_content.encode("utf-8"), gzip_content)
+    except OSError as e:
+        logger.error(f"Error mirroring file {nickname} to storage: {e}")
+        remove_file(nickname)
+
+
+class PendingFile:
+    """
+    A file streamed into storage while it is being received.
+
+    Chunks are written to a temporary file next to the final path and renamed
+    into place by commit(). Errors are logged rather than raised: once one
+    occurs, writes are ignored and commit() removes the mirrored copy so
+    Django sends the file instead.
+    """
+
+    def __init__(self, nickname: str):
+        self.nickname = nickname
+        self.path = get_file_path(nickname)
+        self._file = None
+        self._temp_path = None
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{FILE_NAME}.")
+            self._temp_path = Path(temp_path)
+            self._file = os.fdopen(fd, "wb")
+        except OSError as e:
+            self._fail(e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.discard()
+
+    def write(self, data: bytes):
+        """Append a chunk of the file."""
+        if self._file is None:
+            return
+        try:
+            self._file.write(data)
+        except OSError as e:
+            self._fail(e)
+
+    def commit(self, gzip_content: bytes = None):
+        """
+        Move the received file (and optionally its gzip variant) into place.
+
+        Args:
+            gzip_content: Precompressed gzip variant, or None to remove it
+        """
+        if self._file is None:
+            remove_file(self.nickname)
+            return
+
+        try:
+            self._file.close()
+            self._file = None
+            os.chmod(self._temp_path, 0o644)
+
+            # Write the variant first so it is never older than the file it belongs to
+            if gzip_content is not None:
+                _write_atomic(self.path.parent / GZIP_FILE_NAME, gzip_content)
+            else:
+                _unlink(self.path.parent / GZIP_FILE_NAME)
+
+            os.replace(self._temp_path, self.path)
+            self._temp_path = None
+        except OSError as e:
+            self._fail(e)
+            remove_file(self.nickname)
+
+    def discard(self):
+        """Remove the temporary file if it was not committed."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temp_path is not None:
+            _unlink(self._temp_path)
+            self._temp_path = None
+
+    def _fail(self, error: OSError):
+        logger.error(f"Error mirroring file {self.nickname} to storage: {error}")
+        self.discard()
+
+
+def list_nicknames() -> set:
+    """Return the nicknames that currently have a directory in storage."""
+    root = Path(settings.STORAGE_PATH)
+    if not root.is_dir():
+        return set()
+    return {entry.name for entry in root.iterdir() if entry.is_dir()}
+
+
+def remove_directory(nickname: str):
+    """Remove a nickname's directory from storage, including unexpected files."""
+    shutil.rmtree(get_file_path(nickname).parent, ignore_errors=True)
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write data to a temporary file next to path, then rename it into place."""
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # nginx runs as a different user
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        _unlink(Path(temp_path))
+        raise
+
+
+def _remove_file(nickname: str):
+    directory = get_file_path(nickname).parent
+    _unlink(directory / FILE_NAME)
+    _unlink(directory / GZIP_FILE_NAME)
+
+    try:
+        directory.rmdir()
+    except OSError:
+        # Missing, or not empty
+        pass
+
+
+def _unlink(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
@@ -3,52 +3,316 @@ Background tasks for Org Social Host.
 """
 
 import logging
+import time
 from datetime import timedelta
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from huey import crontab
-from huey.contrib.djhuey import db_periodic_task
+from huey.contrib.djhuey import db_periodic_task, db_task, enqueue
 
-from .models import HostedFile
+from .access import apply_access_times, drain_access_buffer
+from .cache import get_file, get_file_content, invalidate_file
+from .changes import CLEANUP, compact_changes, record_changes
+from .compression import compress_content, store_compressed_variants
+from .directory import invalidate_directory
+from .events import publish_change
+from .feeds import invalidate_timeline
+from .follows import invalidate_follows
+from .models import Change, HostedFile
+from .posts import index_posts
+from .storage import remove_file, sync_file
+from .webhooks import SCHEDULED_KEY_PREFIX, deliver, get_webhooks
 
 logger = logging.getLogger(__name__)
 
+CLEANUP_CHECKPOINT_KEY = "hosting:cleanup-checkpoint"
+
+# Marks a nickname whose artifacts pipeline is queued but not started yet
+PIPELINE_KEY_PREFIX = "hosting:artifacts-pipeline:"
+
+# Task priorities (PriorityRedisHuey runs higher values first)
+HIGH_PRIORITY = 10
+LOW_PRIORITY = 0
+
+
+def enqueue_artifacts(nickname: str) -> bool:
+    """
+    Queue the pipeline that builds the derived artifacts of a file.
+
+    Call after the new content has been committed. The pipeline always
+    works on the content current when it starts, so while one is queued
+    for the nickname, later uploads reuse it instead of queueing another:
+    only the latest upload is processed.
+
+    Args:
+        nickname: Nickname of the hosted file
+
+    Returns:
+        True if a pipeline was queued, False if one was already pending
+    """
+    if not cache.add(
+        PIPELINE_KEY_PREFIX + nickname, 1, settings.ARTIFACTS_PIPELINE_DEDUPE_TIMEOUT
+    ):
+        return False
+
+    enqueue(build_artifacts.s(nickname).then(warm_file_cache))
+    return True
+
+
+@db_task(priority=HIGH_PRIORITY)
+def build_artifacts(nickname):
+    """
+    Build the compressed variants, post index and storage mirror of a file.
+
+    The content is compressed first, without locks. The row is then locked
+    while the artifacts are stored, so an upload committed meanwhile waits
+    and the mirror is never older than the database. Uploads during the
+    build queue a new pipeline.
+
+    Returns:
+        Nickname to warm the cache for, or None if there was nothing to build
+    """
+    # From here on, a new upload needs a new pipeline
+    cache.delete(PIPELINE_KEY_PREFIX + nickname)
+
+    current = (
+        HostedFile.objects.only("id", "file_content", "content_hash", "artifacts_hash")
+        .filter(nickname=nickname)
+        .first()
+    )
+    if current is None or current.artifacts_ready:
+        return None
+    variants = compress_content(current.file_content.encode("utf-8"))
+
+    with transaction.atomic():
+        hosted_file = HostedFile.objects.select_for_update().filter(nickname=nickname).first()
+        if hosted_file is None or hosted_file.artifacts_ready:
+            return None
+
+        if hosted_file.content_hash != current.content_hash:
+            # Uploaded while compressing: store the current content
+            variants = None
+        variants = store_compressed_variants(hosted_file, variants)
+        indexed = index_posts(hosted_file)
+        hosted_file.artifacts_hash = hosted_file.content_hash
+        HostedFile.objects.filter(id=hosted_file.id).update(
+            artifacts_hash=hosted_file.artifacts_hash
+        )
+        sync_file(hosted_file, variants.get("gzip"))
+
+    # Readers pick up the new variants and index
+    invalidate_file(nickname)
+    if indexed["created"] or indexed["updated"] or indexed["deleted"]:
+        invalidate_timeline()
+    if indexed["follows"]:
+        invalidate_follows()
+    publish_change("update", nickname, etag=hosted_file.etag, posts=indexed["changed"])
+    return nickname
+
+
+@db_task(priority=LOW_PRIORITY)
+def warm_file_cache(nickname):
+    """Load the metadata and every representation of a file into the shared cache."""
+    if nickname is None:
+        return
+
+    meta = get_file(nickname)
+    if meta is None:
+        return
+
+    get_file_content(nickname, meta["content_hash"])
+    for encoding in meta["encodings"]:
+        get_file_content(nickname, meta["content_hash"], encoding)
+
+
+def schedule_webhook_deliveries():
+    """
+    Schedule a delivery to every webhook after its batching window.
+
+    Called once a change is committed. While a delivery is scheduled for a
+    webhook, later changes join its batch instead of scheduling another.
+    """
+    for webhook in get_webhooks():
+        # Expires on its own if the delivery is lost (deliver clears it first)
+        if cache.add(
+            SCHEDULED_KEY_PREFIX + str(webhook["id"]),
+            1,
+            webhook["window"] + settings.WEBHOOK_TIMEOUT * 2,
+        ):
+            deliver_webhook.schedule((webhook["id"],), delay=webhook["window"])
+
+
+@db_task(priority=LOW_PRIORITY)
+def deliver_webhook(webhook_id):
+    """Deliver the pending changes of a webhook, rescheduling while some remain or it failed."""
+    delay = deliver(webhook_id)
+    if delay is not None:
+        deliver_webhook.schedule((webhook_id,), delay=delay)
+
+
+@db_periodic_task(crontab(minute="*"))
+def flush_access_times():
+    """
+    Write buffered last_access timestamps to the database.
+    Runs every minute.
+    """
+    access_times = drain_access_buffer()
+    if not access_times:
+        return 0
+
+    updated = apply_access_times(access_times)
+    logger.info(f"Flushed {len(access_times)} buffered accesses ({updated} rows updated).")
+    return updated
+
 
 @db_periodic_task(crontab(hour="0", minute="0"))
-def cleanup_stale_files():
+def cleanup_stale_files(dry_run=False, batch_size=None):
     """
-    Clean up files that haven't been updated within the TTL period.
+    Clean up files that haven't been accessed within the TTL period.
     Runs daily at midnight UTC.
+
+    Stale files are walked in (last_access, id) order and deleted in batches.
+    After each batch a checkpoint is stored in the cache, so an interrupted
+    run resumes where it stopped. A batch that fails is counted in 'failed'
+    and the checkpoint stays before it, so a resumed run retries it.
+
+    Args:
+        dry_run: Only count the files that would be deleted
+        batch_size: Files per batch (defaults to CLEANUP_BATCH_SIZE)
+
+    Returns:
+        dict with 'scanned', 'deleted', 'failed', 'batches', 'elapsed'
+        (seconds), 'dry_run' and 'resumed', or None if cleanup is disabled
     """
     # Check if cleanup is enabled
     if not settings.ENABLE_CLEANUP:
         logger.info("Automatic cleanup is disabled. Skipping cleanup task.")
-        return
+        return None
 
-    logger.info("Starting cleanup of stale files...")
+    logger.info(f"Starting cleanup of stale files{' (dry run)' if dry_run else ''}...")
+    started_at = time.monotonic()
+    batch_size = batch_size or settings.CLEANUP_BATCH_SIZE
+
+    # Apply pending accesses so recently read files are not considered stale
+    # (also on dry runs: flushing deletes nothing)
+    flush_access_times.call_local()
 
     # Calculate cutoff date
     cutoff_date = timezone.now() - timedelta(days=settings.FILE_TTL_DAYS)
 
-    # Find stale files
-    stale_files = HostedFile.objects.filter(last_access__lt=cutoff_date)
-    count = stale_files.count()
+    # Resume an interrupted run
+    checkpoint = None if dry_run else cache.get(CLEANUP_CHECKPOINT_KEY)
+    metrics = {
+        "scanned": 0,
+        "deleted": 0,
+        "failed": 0,
+        "batches": 0,
+        "elapsed": 0.0,
+        "dry_run": dry_run,
+        "resumed": checkpoint is not None,
+    }
 
-    if count == 0:
-        logger.info("No stale files found.")
-        return
+    while True:
+        # Next batch of stale files (served by the last_access index)
+        stale_files = HostedFile.objects.filter(last_access__lt=cutoff_date)
+        if checkpoint is not None:
+            stale_files = stale_files.filter(
+                Q(last_access__gt=checkpoint["last_access"])
+                | Q(last_access=checkpoint["last_access"], id__gt=checkpoint["id"])
+            )
+        stale_files = stale_files.order_by("last_access", "id").values("id", "last_access")
+        batch = list(stale_files[:batch_size])
+        if not batch:
+            break
+
+        metrics["scanned"] += len(batch)
+        metrics["batches"] += 1
+        checkpoint = {"last_access": batch[-1]["last_access"], "id": batch[-1]["id"]}
+
+        if not dry_run:
+            try:
+                metrics["deleted"] += _delete_stale_batch(batch, cutoff_date)
+            except Exception as e:
+                metrics["failed"] += len(batch)
+                logger.error(f"Error deleting batch ending at id {checkpoint['id']}: {e}")
+            # Later batches still run, but the checkpoint never moves past a
+            # failed one
+            if not metrics["failed"]:
+                cache.set(
+                    CLEANUP_CHECKPOINT_KEY, checkpoint, settings.CLEANUP_CHECKPOINT_TIMEOUT
+                )
 
-    logger.info(f"Found {count} stale files to delete.")
+    if not dry_run:
+        cache.delete(CLEANUP_CHECKPOINT_KEY)
+        if metrics["deleted"]:
+            invalidate_directory()
+            invalidate_timeline()
+            invalidate_follows()
 
-    # Delete database records
-    for hosted_file in stale_files:
-        try:
-            nickname = hosted_file.nickname
-            hosted_file.delete()
-            logger.info(f"Deleted hosted file record: {nickname}")
+    metrics["elapsed"] = round(time.monotonic() - started_at, 3)
+    logger.info(
+        f"Cleanup completed{' (dry run)' if dry_run else ''}. "
+        f"Scanned {metrics['scanned']} stale files in {metrics['batches']} batches, "
+        f"deleted {metrics['deleted']} ({metrics['failed']} failed) in {metrics['elapsed']}s."
+    )
+    return metrics
 
-        except Exception as e:
-            logger.error(f"Error deleting file {hosted_file.nickname}: {e}")
 
-    logger.info(f"Cleanup completed. Deleted {count} stale files.")
+def _delete_stale_batch(batch, cutoff_date) -> int:
+    """
+    Delete one batch of stale files and their derived artifacts.
+
+    Files accessed since the batch was read are kept.
+
+    Returns:
+        Number of files deleted
+    """
+    ids = [row["id"] for row in batch]
+
+    with transaction.atomic():
+        stale_files = HostedFile.objects.select_for_update().filter(
+            id__in=ids,
+            last_access__lt=cutoff_date,
+        )
+        nicknames = list(stale_files.values_list("nickname", flat=True))
+
+        # Only the primary keys are loaded; related rows are deleted in bulk
+        stale_files.only("id").delete()
+        record_changes([Change(event=CLEANUP, nickname=nickname) for nickname in nicknames])
+
+    for nickname in nicknames:
+        remove_file(nickname)
+        invalidate_file(nickname)
+        publish_change("delete", nickname)
+        logger.info(f"Deleted hosted file record: {nickname}")
+
+    return len(nicknames)
+
+
+@db_periodic_task(crontab(hour="1", minute="0"))
+def compact_change_log(batch_size=None):
+    """
+    Drop the change log entries superseded by a later entry of the same
+    nickname, once they are older than CHANGES_RETENTION_DAYS.
+    Runs daily at 01:00 UTC.
+
+    Args:
+        batch_size: Entries looked at per DELETE (defaults to CHANGES_COMPACT_BATCH_SIZE)
+
+    Returns:
+        dict with 'deleted', 'batches' and 'elapsed' (seconds)
+    """
+    started_at = time.monotonic()
+    cutoff = timezone.now() - timedelta(days=settings.CHANGES_RETENTION_DAYS)
+    metrics = compact_changes(cutoff, batch_size or settings.CHANGES_COMPACT_BATCH_SIZE)
+
+    metrics["elapsed"] = round(time.monotonic() - started_at, 3)
+    logger.info(
+        f"Change log compaction completed. Deleted {metrics['deleted']} entries "
+        f"in {metrics['batches']} batches in {metrics['elapsed']}s."
+    )
+    return metrics
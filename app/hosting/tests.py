@@ -3,13 +3,159 @@ Tests for Org Social Host application.
 Following the Given/When/Then pattern from org-social-relay.
 """
 
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import queue
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from pathlib import Path
+
+import brotli
+from asgiref.sync import sync_to_async
+
 from django.conf import settings
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from huey.contrib.djhuey import HUEY
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from .models import HostedFile
-from .utils import generate_vfile_token, build_vfile_url, validate_nickname
+from .access import ACCESS_BUFFER_KEY, apply_access_times, drain_access_buffer, record_accesses
+from .authentication import verified_vfiles
+from .changes import SIGNUP, UPLOAD, get_last_seq, record_change
+from .compression import negotiate_encoding
+from . import access as access_module
+from . import cache as cache_module
+from . import events as events_module
+from . import tasks as tasks_module
+from . import views as views_module
+from .cache import (
+    CONTENT_KEY_PREFIX,
+    INVALIDATION_CHANNEL,
+    LocalLRUCache,
+    get_file,
+    invalidate_file,
+    local_cache,
+)
+from .events import CHANGES_CHANNEL, ChangeBroker, broker, publish_change, stream_events
+from .models import (
+    Change,
+    CompressedVariant,
+    Follow,
+    HostedFile,
+    Post,
+    PostTag,
+    ProfileHeader,
+    Webhook,
+)
+from .patch import PatchError, apply_unified_diff
+from .posts import index_posts, split_posts
+from .storage import PendingFile
+from .tasks import (
+    CLEANUP_CHECKPOINT_KEY,
+    PIPELINE_KEY_PREFIX,
+    build_artifacts,
+    cleanup_stale_files,
+    compact_change_log,
+    deliver_webhook,
+    flush_access_times,
+)
+from .uploads import FileTooLarge, read_upload
+from .utils import (
+    build_vfile_url,
+    compute_content_hash,
+    generate_vfile_token,
+    sign_vfile,
+    validate_nickname,
+    verify_vfile_token,
+)
+from .webhooks import (
+    BUSY_DELAY,
+    LOCK_KEY_PREFIX,
+    SLOT_KEY_PREFIX,
+    STATE_KEY_PREFIX,
+    delete_webhook,
+    deliver,
+    get_state,
+    get_webhooks,
+    set_state,
+)
+
+
+def org_post(day: int, text: str, properties: dict = None) -> str:
+    """Return an Org Social post whose id is 10:00 (+01:00) on a day of January 2025."""
+    lines = "".join(f":{name}: {value}\n" for name, value in (properties or {}).items())
+    return f"**\n:PROPERTIES:\n:ID: 2025-01-{day:02d}T10:00:00+0100\n{lines}:END:\n\n{text}\n\n"
+
+
+class HostingTestCase(TestCase):
+    """Base for tests that sign accounts up and upload their files through the API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        local_cache.clear()
+        verified_vfiles.clear()
+        self.vfiles = {}
+
+    def sign_up(self, nickname: str) -> HostedFile:
+        """Sign a nickname up, keeping its vfile URL in self.vfiles."""
+        self.client.post("/signup", {"nick": nickname}, format="json")
+        hosted_file = HostedFile.objects.get(nickname=nickname)
+        self.vfiles[nickname] = build_vfile_url(
+            hosted_file.vfile_token,
+            hosted_file.vfile_timestamp,
+            hosted_file.vfile_signature,
+        )
+        return hosted_file
+
+    def put_file(self, nickname: str, content: str):
+        """Replace the file of a nickname with PUT."""
+        return self.client.put(
+            f"/{nickname}/social.org",
+            content.encode("utf-8"),
+            content_type="text/plain",
+            HTTP_AUTHORIZATION=f"VFile {self.vfiles[nickname]}",
+        )
+
+    def upload_posts(self, nickname: str, posts=(), follows=()):
+        """
+        Upload a file made of a title, #+FOLLOW lines and posts.
+
+        Args:
+            nickname: Nickname of the file
+            posts: (day, text) or (day, text, properties) of each post, see org_post()
+            follows: Values of the #+FOLLOW lines
+        """
+        content = (
+            "#+TITLE: Test\n"
+            + "".join(f"#+FOLLOW: {follow}\n" for follow in follows)
+            + "\n* Posts\n"
+            + "".join(org_post(*post) for post in posts)
+        )
+        return self.put_file(nickname, content)
+
+    def use_temp_storage(self) -> Path:
+        """Point STORAGE_PATH at a temporary directory for the test."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        settings_override = override_settings(STORAGE_PATH=temp_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return Path(temp_dir.name)
 
 
 class RootViewTest(TestCase):
@@ -53,6 +199,14 @@ class RootViewTest(TestCase):
             "delete",
             "redirect",
             "remove-redirect",
+            "public-routes",
+            "timeline",
+            "search",
+            "tags",
+            "changes",
+            "events",
+            "bulk-fetch",
+            "webhooks",
         ]
 
         for link_name in expected_links:
@@ -202,6 +356,9 @@ class UploadViewTest(TestCase):
     """Test cases for the upload endpoint."""
 
     def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        verified_vfiles.clear()
         self.client = APIClient()
         self.upload_url = "/upload"
 
@@ -326,6 +483,9 @@ class DeleteViewTest(TestCase):
     """Test cases for the delete endpoint."""
 
     def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        verified_vfiles.clear()
         self.client = APIClient()
         self.delete_url = "/delete"
 
@@ -416,6 +576,9 @@ class RedirectViewTest(TestCase):
     """Test cases for the redirect endpoint."""
 
     def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        verified_vfiles.clear()
         self.client = APIClient()
         self.redirect_url = "/redirect"
 
@@ -494,6 +657,9 @@ class RemoveRedirectViewTest(TestCase):
     """Test cases for the remove-redirect endpoint."""
 
     def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        verified_vfiles.clear()
         self.client = APIClient()
         self.remove_redirect_url = "/remove-redirect"
 
@@ -555,11 +721,148 @@ class RemoveRedirectViewTest(TestCase):
         self.assertIn("no redirect", response.json()["errors"][0].lower())
 
 
+class PublicRoutesViewTest(TestCase):
+    """Test cases for the public-routes endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.public_routes_url = "/public-routes"
+        cache.clear()
+
+        # Create users: two active, one empty, one redirected
+        for nickname, content, redirect_url in [
+            ("bob", "#+TITLE: Bob\n", None),
+            ("alice", "#+TITLE: Alice\n", None),
+            ("empty", "", None),
+            ("moved", "#+TITLE: Moved\n", "https://other-domain.org/social.org"),
+        ]:
+            token_data = generate_vfile_token(nickname)
+            HostedFile.objects.create(
+                nickname=nickname,
+                vfile_token=token_data["token"],
+                vfile_timestamp=token_data["timestamp"],
+                vfile_signature=token_data["signature"],
+                file_content=content,
+                redirect_url=redirect_url,
+            )
+
+    def test_public_routes_lists_active_files(self):
+        """Test GET /public-routes lists active files with content."""
+        # When: We request the public routes
+        response = self.client.get(self.public_routes_url)
+
+        # Then: Only active files with content are listed
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.read_json(response)["data"],
+            [
+                "http://localhost:8080/alice/social.org",
+                "http://localhost:8080/bob/social.org",
+            ],
+        )
+
+    def test_public_routes_does_not_read_file_content(self):
+        """Test GET /public-routes only reads nicknames in a single query."""
+        # When: We request the public routes
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.public_routes_url)
+            self.read_json(response)
+
+        # Then: One query that does not touch file bodies
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("file_content", queries[0]["sql"])
+
+    def test_has_content_follows_file_content(self):
+        """Test has_content is maintained when the file content changes."""
+        # Given: A file with content
+        hosted_file = HostedFile.objects.get(nickname="alice")
+        self.assertTrue(hosted_file.has_content)
+
+        # When: Its content is emptied
+        hosted_file.file_content = ""
+        hosted_file.save()
+
+        # Then: It is no longer flagged as having content
+        hosted_file.refresh_from_db()
+        self.assertFalse(hosted_file.has_content)
+        self.assertEqual(hosted_file.content_size, 0)
+
+    def test_public_routes_snapshot_and_etag(self):
+        """Test the full listing is cached and revalidated with its ETag."""
+        # Given: The listing has been fetched once
+        response = self.client.get(self.public_routes_url)
+        first = self.read_json(response)
+        etag = response["ETag"]
+
+        # When: We fetch it again
+        # Then: It is served from the snapshot without queries
+        with self.assertNumQueries(0):
+            response = self.client.get(self.public_routes_url)
+        self.assertEqual(self.read_json(response), first)
+
+        # When: We revalidate with the ETag
+        response = self.client.get(self.public_routes_url, HTTP_IF_NONE_MATCH=etag)
+
+        # Then: We get 304
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_public_routes_invalidated_on_signup(self):
+        """Test a new signup changes the listing and its ETag."""
+        # Given: The listing has been fetched once
+        etag = self.client.get(self.public_routes_url)["ETag"]
+
+        # When: A new user signs up
+        self.client.post("/signup", {"nick": "carol"}, format="json")
+
+        # Then: The old ETag no longer matches and the user is listed
+        response = self.client.get(self.public_routes_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(
+            "http://localhost:8080/carol/social.org",
+            self.read_json(response)["data"],
+        )
+
+    def test_public_routes_pagination(self):
+        """Test pages follow the next link until the listing is exhausted."""
+        # When: We request the first page with one entry per page
+        response = self.client.get(self.public_routes_url, {"limit": 1})
+
+        # Then: We get alice and a link to the next page
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"], ["http://localhost:8080/alice/social.org"])
+        next_link = response.json()["_links"]["next"]["href"]
+
+        # When: We follow the next link
+        response = self.client.get(next_link)
+
+        # Then: We get bob and no further pages
+        self.assertEqual(response.json()["data"], ["http://localhost:8080/bob/social.org"])
+        self.assertNotIn("next", response.json()["_links"])
+
+    def test_public_routes_pagination_invalid_parameters(self):
+        """Test invalid limits and cursors are rejected."""
+        # When/Then: Out of range limit
+        response = self.client.get(self.public_routes_url, {"limit": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # When/Then: Malformed cursor
+        response = self.client.get(self.public_routes_url, {"cursor": "%%%"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def read_json(self, response):
+        """Read a possibly streamed JSON response."""
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return response.json()
+
+
 class ServeFileViewTest(TestCase):
     """Test cases for the serve file endpoint."""
 
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
+        local_cache.clear()
 
         # Create a test user
         self.nickname = "test_user"
@@ -616,61 +919,3385 @@ class ServeFileViewTest(TestCase):
         self.assertEqual(response["Location"], redirect_url)
 
 
-class UtilsTest(TestCase):
-    """Test cases for utility functions."""
+class FileCacheTest(TestCase):
+    """Test cases for the served file read-through cache."""
 
-    def test_generate_vfile_token(self):
-        """Test generate_vfile_token creates valid token."""
-        # Given: A nickname
-        nickname = "test_user"
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        local_cache.clear()
 
-        # When: We generate a token
-        token_data = generate_vfile_token(nickname)
+        # Create a test user with content
+        self.nickname = "test_user"
+        token_data = generate_vfile_token(self.nickname)
+        self.vfile = build_vfile_url(
+            token_data["token"],
+            token_data["timestamp"],
+            token_data["signature"],
+        )
+        self.hosted_file = HostedFile.objects.create(
+            nickname=self.nickname,
+            vfile_token=token_data["token"],
+            vfile_timestamp=token_data["timestamp"],
+            vfile_signature=token_data["signature"],
+            file_content="#+TITLE: Old\n",
+        )
+        self.serve_url = f"/{self.nickname}/social.org"
+
+    def test_serve_file_cached_after_first_read(self):
+        """Test repeated reads do not load the file from the database."""
+        # Given: The file has been served once
+        self.client.get(self.serve_url)
+
+        # When: We request it again
+        # Then: Only the last_access update hits the database
+        with self.assertNumQueries(1):
+            response = self.client.get(self.serve_url)
+        self.assertEqual(response.content.decode("utf-8"), "#+TITLE: Old\n")
+
+    def test_upload_invalidates_cache(self):
+        """Test uploading a new file replaces the cached content."""
+        # Given: The old content is cached
+        self.client.get(self.serve_url)
+
+        # When: We upload new content
+        file = BytesIO(b"#+TITLE: New\n")
+        file.name = "social.org"
+        self.client.post(
+            "/upload",
+            {"vfile": self.vfile, "file": file},
+            format="multipart",
+        )
 
-        # Then: Token should have required fields
-        self.assertIn("token", token_data)
-        self.assertIn("timestamp", token_data)
-        self.assertIn("signature", token_data)
+        # Then: The new content is served
+        response = self.client.get(self.serve_url)
+        self.assertEqual(response.content.decode("utf-8"), "#+TITLE: New\n")
+
+    def test_fill_racing_a_write_is_not_served(self):
+        """Test metadata loaded before a write is not cached after its invalidation."""
+        load_meta = cache_module._load_meta
+
+        def load_then_write(nickname):
+            # A reader loads the row, then a write commits and invalidates
+            meta = load_meta(nickname)
+            self.hosted_file.file_content = "#+TITLE: New\n"
+            self.hosted_file.save()
+            invalidate_file(nickname)
+            return meta
+
+        # Given: A read whose fill races a write
+        with mock.patch.object(cache_module, "_load_meta", load_then_write):
+            stale = get_file(self.nickname)
+
+        # When: The file is read again
+        meta = get_file(self.nickname)
+
+        # Then: The new metadata is returned, not the one filled by the racing read
+        self.assertNotEqual(meta["content_hash"], stale["content_hash"])
+        self.assertEqual(meta["content_hash"], compute_content_hash(b"#+TITLE: New\n"))
+
+    def test_redirect_invalidates_cache(self):
+        """Test configuring a redirect is visible on the next read."""
+        # Given: The content is cached
+        self.client.get(self.serve_url)
+
+        # When: We configure a redirect
+        new_url = "https://new-domain.org/social.org"
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfile, "new-url": new_url},
+            format="json",
+        )
 
-        # Then: Token should be 64 hex characters (256 bits)
-        self.assertEqual(len(token_data["token"]), 64)
+        # Then: The redirect is served
+        response = self.client.get(self.serve_url, follow=False)
+        self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
+        self.assertEqual(response["Location"], new_url)
+
+    def test_cleanup_invalidates_cache(self):
+        """Test stale files removed by cleanup are no longer served."""
+        # Given: A cached file that has not been accessed within the TTL
+        self.client.get(self.serve_url)
+        HostedFile.objects.filter(pk=self.hosted_file.pk).update(
+            last_access=timezone.now() - timedelta(days=settings.FILE_TTL_DAYS + 1)
+        )
 
-        # Then: Timestamp should be an integer
-        self.assertIsInstance(token_data["timestamp"], int)
+        # When: The cleanup task runs
+        cleanup_stale_files.call_local()
 
-        # Then: Signature should be a hex string
-        self.assertTrue(all(c in "0123456789abcdef" for c in token_data["signature"]))
+        # Then: The file is gone
+        response = self.client.get(self.serve_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
-    def test_validate_nickname_valid(self):
-        """Test validate_nickname accepts valid nicknames."""
-        # Given: Valid nicknames
-        valid_nicknames = [
-            "user123",
-            "test_user",
-            "user-name",
-            "ABC",
-            "a_b_c",
-        ]
+    def test_local_lru_evicts_by_size(self):
+        """Test the local LRU stays within its byte budget."""
+        # Given: A cache that holds 10 bytes
+        lru = LocalLRUCache(max_bytes=10, timeout=60)
 
-        # When/Then: All should be valid
-        for nickname in valid_nicknames:
-            is_valid, error = validate_nickname(nickname)
-            self.assertTrue(is_valid, f"{nickname} should be valid: {error}")
-            self.assertEqual(error, "")
+        # When: We store 12 bytes, reading the first key in between
+        lru.set("a", b"aaaa", 4)
+        lru.set("b", b"bbbb", 4)
+        lru.get("a")
+        lru.set("c", b"cccc", 4)
 
-    def test_validate_nickname_invalid(self):
-        """Test validate_nickname rejects invalid nicknames."""
-        # Given: Invalid nicknames
-        invalid_cases = [
-            ("", "Nickname is required"),
-            ("ab", "at least 3 characters"),
-            ("a" * 51, "at most 50 characters"),
-            ("user@name", "letters, numbers"),
-            ("user name", "letters, numbers"),
+        # Then: The least recently used entry is evicted
+        self.assertEqual(lru.get("a"), b"aaaa")
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("c"), b"cccc")
+        self.assertEqual(lru.size, 8)
+
+
+class ConditionalRequestTest(TestCase):
+    """Test cases for ETag / Last-Modified handling when serving files."""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        local_cache.clear()
+
+        self.nickname = "test_user"
+        token_data = generate_vfile_token(self.nickname)
+        self.file_content = "#+TITLE: Test\n\n* Posts\n** Test post\n"
+        self.hosted_file = HostedFile.objects.create(
+            nickname=self.nickname,
+            vfile_token=token_data["token"],
+            vfile_timestamp=token_data["timestamp"],
+            vfile_signature=token_data["signature"],
+            file_content=self.file_content,
+        )
+        self.serve_url = f"/{self.nickname}/social.org"
+        self.content_hash = compute_content_hash(self.file_content.encode("utf-8"))
+
+    def test_serve_file_includes_validators(self):
+        """Test GET returns a strong ETag and Last-Modified."""
+        # When: We request the file
+        response = self.client.get(self.serve_url)
+
+        # Then: Validators match the stored content
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], f'"{self.content_hash}"')
+        self.assertEqual(response["ETag"], self.hosted_file.etag)
+        self.assertIn("Last-Modified", response)
+
+    def test_if_none_match_returns_304_without_loading_content(self):
+        """Test a matching If-None-Match returns 304 without reading the body."""
+        # When: We request the file with its current ETag
+        response = self.client.get(
+            self.serve_url, HTTP_IF_NONE_MATCH=f'"{self.content_hash}"'
+        )
+
+        # Then: We get 304 with validators and no body
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], f'"{self.content_hash}"')
+        self.assertEqual(response.content, b"")
+
+        # Then: The content was never loaded into the cache
+        self.assertIsNone(cache.get(CONTENT_KEY_PREFIX + self.content_hash))
+
+    def test_if_modified_since_returns_304(self):
+        """Test If-Modified-Since with the current Last-Modified returns 304."""
+        # Given: The Last-Modified of the file
+        last_modified = self.client.get(self.serve_url)["Last-Modified"]
+
+        # When: We request the file conditionally
+        response = self.client.get(self.serve_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        # Then: We get 304
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_stale_etag_returns_new_content(self):
+        """Test an outdated ETag gets the full new content."""
+        # Given: The file changed after the client fetched it
+        old_etag = self.client.get(self.serve_url)["ETag"]
+        self.hosted_file.file_content = "#+TITLE: Changed\n"
+        self.hosted_file.save()
+        invalidate_file(self.nickname)
+
+        # When: We request the file with the old ETag
+        response = self.client.get(self.serve_url, HTTP_IF_NONE_MATCH=old_etag)
+
+        # Then: We get the new content and ETag
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content.decode("utf-8"), "#+TITLE: Changed\n")
+        self.assertNotEqual(response["ETag"], old_etag)
+
+    def test_head_served_from_metadata(self):
+        """Test HEAD returns headers only, without reading the body."""
+        # When: We send a HEAD request
+        response = self.client.head(self.serve_url)
+
+        # Then: Headers describe the file but no body is sent
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            int(response["Content-Length"]), len(self.file_content.encode("utf-8"))
+        )
+        self.assertEqual(response["ETag"], f'"{self.content_hash}"')
+        self.assertEqual(response.content, b"")
+        self.assertIsNone(cache.get(CONTENT_KEY_PREFIX + self.content_hash))
+
+
+class CompressedVariantTest(HostingTestCase):
+    """Test cases for precompressed file representations."""
+
+    def setUp(self):
+        super().setUp()
+
+        # Create a test user through the API so variants are generated
+        self.nickname = "test_user"
+        self.hosted_file = self.sign_up(self.nickname)
+        self.vfile = self.vfiles[self.nickname]
+        self.serve_url = f"/{self.nickname}/social.org"
+
+        # Upload a compressible file
+        self.file_content = "#+TITLE: Test\n\n* Posts\n" + "** Post\nHello Org Social!\n" * 200
+        file = BytesIO(self.file_content.encode("utf-8"))
+        file.name = "social.org"
+        self.client.post(
+            "/upload",
+            {"vfile": self.vfile, "file": file},
+            format="multipart",
+        )
+
+    def test_upload_stores_variants(self):
+        """Test uploading a file stores one variant per encoding."""
+        # Then: All encodings are stored for the current content
+        content_hash = compute_content_hash(self.file_content.encode("utf-8"))
+        variants = self.hosted_file.compressed_variants.all()
+        self.assertEqual({v.encoding for v in variants}, {"gzip", "br", "zstd"})
+        for variant in variants:
+            self.assertEqual(variant.content_hash, content_hash)
+
+    def test_serve_precompressed_variant(self):
+        """Test the negotiated variant is served as-is with Vary."""
+        # When: We request the file accepting brotli
+        response = self.client.get(self.serve_url, HTTP_ACCEPT_ENCODING="gzip, br")
+
+        # Then: We get the brotli bytes
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(brotli.decompress(response.content).decode("utf-8"), self.file_content)
+
+    def test_serve_identity_without_accept_encoding(self):
+        """Test clients that do not accept compression get the raw file."""
+        # When: We request the file without Accept-Encoding
+        response = self.client.get(self.serve_url)
+
+        # Then: We get the uncompressed content
+        self.assertNotIn("Content-Encoding", response)
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(response.content.decode("utf-8"), self.file_content)
+
+    def test_head_reports_variant_size(self):
+        """Test HEAD reports the size of the negotiated variant."""
+        # When: We send a HEAD request accepting only gzip
+        response = self.client.head(self.serve_url, HTTP_ACCEPT_ENCODING="gzip")
+
+        # Then: Content-Length matches the stored gzip variant
+        variant = self.hosted_file.compressed_variants.get(encoding="gzip")
+        self.assertEqual(int(response["Content-Length"]), variant.size)
+        self.assertEqual(gzip.decompress(bytes(variant.data)).decode("utf-8"), self.file_content)
+
+    def test_negotiate_encoding(self):
+        """Test Accept-Encoding negotiation honours q-values."""
+        available = {"gzip": 10, "br": 8, "zstd": 7}
+
+        # When/Then: The best acceptable encoding is chosen
+        self.assertEqual(negotiate_encoding("gzip", available), "gzip")
+        self.assertEqual(negotiate_encoding("gzip, br;q=0", available), "gzip")
+        self.assertEqual(negotiate_encoding("gzip;q=0.5, br;q=0.8", available), "br")
+        self.assertEqual(negotiate_encoding("*", available), "zstd")
+        self.assertIsNone(negotiate_encoding("identity", available))
+        self.assertIsNone(negotiate_encoding("", available))
+        self.assertIsNone(negotiate_encoding("br", {}))
+
+
+class StorageSyncTest(HostingTestCase):
+    """Test cases for mirroring hosted files into STORAGE_PATH."""
+
+    def setUp(self):
+        super().setUp()
+        self.storage_path = self.use_temp_storage()
+
+        # Create a test user through the API
+        self.nickname = "test_user"
+        self.sign_up(self.nickname)
+        self.vfile = self.vfiles[self.nickname]
+        self.file_path = self.storage_path / self.nickname / "social.org"
+
+    def upload(self, content):
+        file = BytesIO(content.encode("utf-8"))
+        file.name = "social.org"
+        return self.client.post(
+            "/upload",
+            {"vfile": self.vfile, "file": file},
+            format="multipart",
+        )
+
+    def test_signup_writes_default_file(self):
+        """Test signing up mirrors the default file."""
+        # Then: The default file is in storage
+        self.assertTrue(self.file_path.exists())
+        self.assertIn(f"#+NICK: {self.nickname}", self.file_path.read_text())
+
+    def test_upload_writes_file_and_gzip_variant(self):
+        """Test uploading mirrors the file and its gzip variant."""
+        # When: We upload a compressible file
+        content = "#+TITLE: Test\n\n* Posts\n" + "** Post\nHello!\n" * 100
+        self.upload(content)
+
+        # Then: Both files hold the new content
+        self.assertEqual(self.file_path.read_text(), content)
+        gzip_path = self.file_path.with_name("social.org.gz")
+        self.assertEqual(gzip.decompress(gzip_path.read_bytes()).decode("utf-8"), content)
+
+    def test_redirect_and_remove_redirect(self):
+        """Test redirected files are removed and restored when the redirect ends."""
+        # When: We configure a redirect
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfile, "new-url": "https://new-domain.org/social.org"},
+            format="json",
+        )
+
+        # Then: The file is no longer mirrored
+        self.assertFalse(self.file_path.exists())
+
+        # When: We remove the redirect
+        self.client.post("/remove-redirect", {"vfile": self.vfile}, format="json")
+
+        # Then: The file is mirrored again
+        self.assertTrue(self.file_path.exists())
+
+    @override_settings(STORAGE_ACCEL_REDIRECT="/_storage/")
+    def test_mirrored_body_is_sent_by_nginx_with_django_validators(self):
+        """Test reads hand the mirrored file to nginx, keeping the content hash ETag."""
+        # Given: A compressible file, mirrored with its gzip variant
+        content = "#+TITLE: Test\n\n* Posts\n" + "** Post\nHello!\n" * 100
+        self.upload(content)
+        content_hash = compute_content_hash(content.encode("utf-8"))
+
+        # When: The file is read, uncompressed and with gzip
+        plain = self.client.get(f"/{self.nickname}/social.org", HTTP_ACCEPT_ENCODING="identity")
+        gzipped = self.client.get(f"/{self.nickname}/social.org", HTTP_ACCEPT_ENCODING="gzip")
+
+        # Then: nginx sends the mirrored copies, with Django's ETags
+        self.assertEqual(plain["X-Accel-Redirect"], f"/_storage/{self.nickname}/social.org")
+        self.assertEqual(plain["ETag"], f'"{content_hash}"')
+        self.assertEqual(gzipped["X-Accel-Redirect"], f"/_storage/{self.nickname}/social.org.gz")
+        self.assertEqual(gzipped["ETag"], f'"{content_hash}-gzip"')
+        self.assertEqual(gzipped["Content-Encoding"], "gzip")
+
+        # Then: Last-Modified is the upload time, for nginx to pass on
+        updated_at = HostedFile.objects.get(nickname=self.nickname).updated_at
+        self.assertEqual(plain["Last-Modified"], http_date(int(updated_at.timestamp())))
+        self.assertEqual(gzipped["Last-Modified"], plain["Last-Modified"])
+
+        # And: The downloaded ETag is accepted by If-Match
+        file = BytesIO(b"#+TITLE: Edited\n")
+        file.name = "social.org"
+        response = self.client.post(
+            "/upload",
+            {"vfile": self.vfile, "file": file},
+            format="multipart",
+            HTTP_IF_MATCH=gzipped["ETag"],
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(STORAGE_ACCEL_REDIRECT="/_storage/")
+    def test_unmirrored_body_is_sent_by_django(self):
+        """Test files missing from storage are sent by Django."""
+        # Given: The mirrored copy is gone
+        self.file_path.unlink()
+
+        # When: The file is read
+        response = self.client.get(f"/{self.nickname}/social.org", HTTP_ACCEPT_ENCODING="identity")
+
+        # Then: Django sends it
+        self.assertNotIn("X-Accel-Redirect", response)
+        self.assertIn(f"#+NICK: {self.nickname}", response.content.decode("utf-8"))
+
+    def test_mirror_is_written_while_the_row_is_locked(self):
+        """Test uploads mirror the file before releasing the row, so racing uploads keep order."""
+        in_transaction = []
+        commit = PendingFile.commit
+        sync = views_module.sync_file
+
+        # The test case's own transactions are outermost, so the view's
+        # transaction shows up as one more savepoint
+        depth = len(connection.savepoint_ids)
+
+        def record_commit(pending):
+            in_transaction.append(len(connection.savepoint_ids) > depth)
+            return commit(pending)
+
+        def record_sync(hosted_file, *args):
+            in_transaction.append(len(connection.savepoint_ids) > depth)
+            return sync(hosted_file, *args)
+
+        # When: The file is uploaded whole and then appended to
+        with mock.patch.object(PendingFile, "commit", record_commit), mock.patch.object(
+            views_module, "sync_file", record_sync
+        ):
+            self.upload("#+TITLE: Test\n")
+            etag = HostedFile.objects.get(nickname=self.nickname).etag
+            response = self.client.patch(
+                f"/{self.nickname}/social.org",
+                b"* Posts\n",
+                content_type="text/plain",
+                HTTP_AUTHORIZATION=f"VFile {self.vfile}",
+                HTTP_IF_MATCH=etag,
+            )
+
+        # Then: Both mirrors were written inside the transaction holding the row
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(in_transaction, [True, True])
+        self.assertEqual(self.file_path.read_text(), "#+TITLE: Test\n* Posts\n")
+
+    def test_delete_removes_file(self):
+        """Test deleting an account removes its mirrored file."""
+        # When: We delete the account
+        self.client.post("/delete", {"vfile": self.vfile}, format="json")
+
+        # Then: Its directory is gone
+        self.assertFalse(self.file_path.parent.exists())
+
+    def test_rebuild_storage_command(self):
+        """Test rebuild_storage writes active files and removes stale ones."""
+        # Given: A missing mirror and an orphaned directory
+        self.file_path.unlink()
+        orphan = self.storage_path / "ghost"
+        orphan.mkdir()
+        (orphan / "social.org").write_text("#+TITLE: Ghost\n")
+
+        # When: We rebuild the storage
+        call_command("rebuild_storage", stdout=StringIO())
+
+        # Then: Storage matches the database
+        self.assertTrue(self.file_path.exists())
+        self.assertFalse(orphan.exists())
+
+    def test_rebuild_storage_leaves_pending_files_to_the_pipeline(self):
+        """Test rebuild_storage does not write files whose pipeline has not run yet."""
+        # Given: A missing mirror and a queued pipeline for the file
+        self.file_path.unlink()
+        cache.set(tasks_module.PIPELINE_KEY_PREFIX + self.nickname, 1)
+
+        # When: We rebuild the storage
+        out = StringIO()
+        call_command("rebuild_storage", stdout=out)
+
+        # Then: The mirror is left to the pipeline
+        self.assertIn("Wrote 0 files", out.getvalue())
+        self.assertFalse(self.file_path.exists())
+
+
+class RawUploadTest(HostingTestCase):
+    """Test cases for PUT /<nickname>/social.org."""
+
+    def setUp(self):
+        super().setUp()
+        self.storage_path = self.use_temp_storage()
+
+        # Create a test user through the API
+        self.nickname = "test_user"
+        self.url = f"/{self.nickname}/social.org"
+        self.hosted_file = self.sign_up(self.nickname)
+        self.vfile = self.vfiles[self.nickname]
+        self.file_path = self.storage_path / self.nickname / "social.org"
+
+    def put(self, content: bytes, url=None, **extra):
+        extra.setdefault("HTTP_AUTHORIZATION", f"VFile {self.vfile}")
+        return self.client.put(
+            url or self.url,
+            content,
+            content_type="text/plain; charset=utf-8",
+            **extra,
+        )
+
+    def test_put_success(self):
+        """Test PUT stores the raw body and mirrors it to storage."""
+        # Given: New content
+        content = "#+TITLE: Raw\n\n* Posts\n** Ünïcödé post\n".encode("utf-8")
+
+        # When: It is uploaded as the raw request body
+        response = self.put(content)
+
+        # Then: It is saved with its hash and served from storage
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["type"], "Success")
+        self.assertEqual(response["ETag"], f'"{compute_content_hash(content)}"')
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.file_content, content.decode("utf-8"))
+        self.assertEqual(self.hosted_file.content_hash, compute_content_hash(content))
+        self.assertEqual(self.hosted_file.content_size, len(content))
+        self.assertEqual(self.file_path.read_bytes(), content)
+        self.assertEqual(self.client.get(self.url).content, content)
+
+    def test_put_empty_body(self):
+        """Test PUT with an empty body empties the file."""
+        # When: An empty body is uploaded
+        response = self.put(b"")
+
+        # Then: The file has no content and is not mirrored
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.hosted_file.refresh_from_db()
+        self.assertFalse(self.hosted_file.has_content)
+        self.assertFalse(self.file_path.exists())
+
+    def test_put_invalid_utf8(self):
+        """Test PUT rejects content that is not UTF-8 and keeps the old file."""
+        # Given: The current content
+        old_content = self.file_path.read_bytes()
+
+        # When: Invalid UTF-8 is uploaded (including a truncated sequence)
+        for content in [b"#+TITLE: \xff\xfe\n", b"#+TITLE: \xc3"]:
+            response = self.put(content)
+
+            # Then: It is rejected without touching the file
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("UTF-8", response.json()["errors"][0])
+            self.assertEqual(self.file_path.read_bytes(), old_content)
+
+        # Then: No temporary files are left behind
+        self.assertEqual(
+            sorted(p.name for p in self.file_path.parent.iterdir()),
+            ["social.org", "social.org.gz"],
+        )
+
+    @override_settings(MAX_FILE_SIZE=100)
+    def test_put_too_large(self):
+        """Test PUT enforces MAX_FILE_SIZE while reading the body."""
+        # When: A body larger than the limit is uploaded
+        response = self.put(b"x" * 101)
+
+        # Then: It is rejected
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.hosted_file.refresh_from_db()
+        self.assertNotEqual(self.hosted_file.file_content, "x" * 101)
+
+    @override_settings(MAX_FILE_SIZE=100)
+    def test_put_too_large_stream(self):
+        """Test the limit applies even if Content-Length understates the body."""
+        # Given: A stream longer than the limit
+        chunks = [b"x" * 60, b"x" * 60]
+
+        # When/Then: Reading it fails as soon as the limit is exceeded
+        with self.assertRaises(FileTooLarge):
+            read_upload(chunks, settings.MAX_FILE_SIZE)
+
+    def test_put_requires_vfile(self):
+        """Test PUT without an Authorization header is rejected."""
+        # When: No vfile is sent
+        response = self.put(b"#+TITLE: Test\n", HTTP_AUTHORIZATION="")
+
+        # Then: It is unauthorized
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()["type"], "Error")
+
+    def test_put_other_nickname(self):
+        """Test a vfile cannot upload to another nickname."""
+        # Given: Another account
+        self.client.post("/signup", {"nick": "other_user"}, format="json")
+
+        # When: The vfile is used on the other account's URL
+        response = self.put(b"#+TITLE: Test\n", url="/other_user/social.org")
+
+        # Then: It is forbidden
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_put_while_redirected(self):
+        """Test PUT is rejected while a redirect is active."""
+        # Given: A redirected account
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfile, "new-url": "https://other.org/social.org"},
+            format="json",
+        )
+
+        # When: A file is uploaded
+        response = self.put(b"#+TITLE: Test\n")
+
+        # Then: It is rejected
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_multipart_invalid_utf8(self):
+        """Test the multipart upload rejects invalid UTF-8 instead of failing."""
+        # Given: A file that is not UTF-8
+        file = BytesIO(b"\xff\xfe")
+        file.name = "social.org"
+
+        # When: It is uploaded through /upload
+        response = self.client.post(
+            "/upload",
+            {"vfile": self.vfile, "file": file},
+            format="multipart",
+        )
+
+        # Then: It is a client error
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UploadConcurrencyTest(HostingTestCase):
+    """Test cases for unchanged uploads and If-Match on upload."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.nickname = "test_user"
+        self.hosted_file = self.sign_up(self.nickname)
+        self.vfile = self.vfiles[self.nickname]
+        self.content = b"#+TITLE: Test\n\n* Posts\n** First post\n"
+        self.upload(self.content)
+        self.hosted_file.refresh_from_db()
+
+    def upload(self, content, **extra):
+        file = BytesIO(content)
+        file.name = "social.org"
+        return self.client.post(
+            "/upload",
+            {"vfile": self.vfile, "file": file},
+            format="multipart",
+            **extra,
+        )
+
+    def test_identical_upload_is_not_written(self):
+        """Test uploading the stored content again does not write anything."""
+        # Given: The stored state
+        updated_at = self.hosted_file.updated_at
+
+        # When: The same content is uploaded again
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload(self.content)
+
+        # Then: It succeeds with the current ETag
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], self.hosted_file.etag)
+
+        # Then: Nothing is written
+        writes = [
+            q["sql"] for q in queries if q["sql"].startswith(("UPDATE", "INSERT", "DELETE"))
         ]
+        self.assertEqual(writes, [])
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.updated_at, updated_at)
 
-        # When/Then: All should be invalid
-        for nickname, expected_error in invalid_cases:
-            is_valid, error = validate_nickname(nickname)
-            self.assertFalse(is_valid, f"{nickname} should be invalid")
-            self.assertIn(expected_error.lower(), error.lower())
+    def test_if_match_current_etag(self):
+        """Test an upload with the current ETag in If-Match is applied."""
+        # When: The client uploads based on the current version
+        response = self.upload(b"#+TITLE: New\n", HTTP_IF_MATCH=self.hosted_file.etag)
+
+        # Then: It is applied and the new ETag returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.file_content, "#+TITLE: New\n")
+        self.assertEqual(response["ETag"], self.hosted_file.etag)
+
+    def test_if_match_compressed_etag(self):
+        """Test the ETag of a compressed representation matches its content."""
+        # When: The client sends the ETag it got with gzip
+        etag = f'"{self.hosted_file.content_hash}-gzip"'
+        response = self.upload(b"#+TITLE: New\n", HTTP_IF_MATCH=etag)
+
+        # Then: It is applied
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_match_conflict(self):
+        """Test an upload based on an old version is rejected with 412."""
+        # Given: Another device uploaded in the meantime
+        old_etag = self.hosted_file.etag
+        self.upload(b"#+TITLE: From another device\n")
+
+        # When: This device uploads based on the old version
+        response = self.upload(b"#+TITLE: Stale\n", HTTP_IF_MATCH=old_etag)
+
+        # Then: It is rejected and the other device's content kept
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.json()["type"], "Error")
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.file_content, "#+TITLE: From another device\n")
+        self.assertEqual(response["ETag"], self.hosted_file.etag)
+
+    def test_if_match_conflict_raw_upload(self):
+        """Test If-Match is also checked by PUT /<nickname>/social.org."""
+        # When: A raw upload is sent with a wrong ETag
+        response = self.client.put(
+            f"/{self.nickname}/social.org",
+            b"#+TITLE: Stale\n",
+            content_type="text/plain",
+            HTTP_AUTHORIZATION=f"VFile {self.vfile}",
+            HTTP_IF_MATCH='"0000"',
+        )
+
+        # Then: It is rejected
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_if_match_any(self):
+        """Test If-Match: * matches any existing file."""
+        # When: The client uploads with If-Match: *
+        response = self.upload(b"#+TITLE: New\n", HTTP_IF_MATCH="*")
+
+        # Then: It is applied
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BulkFetchTest(HostingTestCase):
+    """Test cases for POST /bulk-fetch."""
+
+    def setUp(self):
+        super().setUp()
+
+        for nickname in ("alice", "bob", "carol"):
+            self.sign_up(nickname)
+            # Large enough to get compressed variants
+            self.put_file(nickname, self.content(nickname))
+
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfiles["bob"], "new-url": "https://example.org/social.org"},
+            format="json",
+        )
+
+    def content(self, nickname):
+        return f"#+TITLE: {nickname}\n" + "#+FOLLOW: https://example.org/social.org\n" * 20
+
+    def fetch(self, files):
+        response = self.client.post("/bulk-fetch", {"files": files}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        return [json.loads(line) for line in lines]
+
+    def test_files_in_request_order(self):
+        """Test each file is returned with its content, redirect or absence."""
+        # When: Several files are fetched
+        entries = self.fetch(["carol", "bob", "nobody", {"nick": "alice"}])
+
+        # Then: One line per file, in request order
+        self.assertEqual([entry["nick"] for entry in entries], ["carol", "bob", "nobody", "alice"])
+        self.assertEqual(entries[0]["status"], 200)
+        self.assertEqual(entries[0]["content"], self.content("carol"))
+        self.assertEqual(entries[0]["etag"], self.client.get("/carol/social.org")["ETag"])
+        self.assertEqual(
+            entries[1],
+            {"nick": "bob", "status": 301, "location": "https://example.org/social.org"},
+        )
+        self.assertEqual(entries[2], {"nick": "nobody", "status": 404})
+
+    def test_not_modified(self):
+        """Test files whose ETag the client has are not sent again."""
+        # Given: The ETags of alice's raw and carol's gzip representations
+        raw_etag = self.client.get("/alice/social.org")["ETag"]
+        gzip_etag = self.client.get("/carol/social.org", HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        self.assertTrue(gzip_etag.endswith('-gzip"'))
+
+        # When: They are sent back
+        entries = self.fetch(
+            [{"nick": "alice", "etag": raw_etag}, {"nick": "carol", "etag": gzip_etag}]
+        )
+
+        # Then: Both are not modified, without content
+        self.assertEqual([entry["status"] for entry in entries], [304, 304])
+        self.assertNotIn("content", entries[0])
+
+        # When: alice changes her file
+        self.client.put(
+            "/alice/social.org",
+            b"#+TITLE: Alice\n",
+            content_type="text/plain",
+            HTTP_AUTHORIZATION=f"VFile {self.vfiles['alice']}",
+        )
+
+        # Then: Her new content is sent
+        entry = self.fetch([{"nick": "alice", "etag": raw_etag}])[0]
+        self.assertEqual(entry["status"], 200)
+        self.assertEqual(entry["content"], "#+TITLE: Alice\n")
+
+    def test_constant_queries(self):
+        """Test files are resolved in bulk, not one query per file."""
+        # Given: More files than a content batch, and a cold cache
+        for index in range(settings.BULK_FETCH_BATCH_SIZE + 10):
+            HostedFile.objects.create(
+                nickname=f"user{index}",
+                vfile_token=f"token{index}",
+                vfile_timestamp=0,
+                vfile_signature="",
+                file_content=f"#+TITLE: {index}\n",
+            )
+        nicknames = list(HostedFile.objects.values_list("nickname", flat=True))
+        cache.clear()
+        local_cache.clear()
+
+        # When: Every file is fetched
+        with CaptureQueriesContext(connection) as queries:
+            entries = self.fetch(nicknames)
+
+        # Then: Metadata takes two queries, contents one per batch and
+        # access times one (an UPDATE, as there is no Redis in tests)
+        self.assertEqual(len(entries), len(nicknames))
+        self.assertEqual(len(queries), 5)
+
+        # When: They are fetched again
+        with CaptureQueriesContext(connection) as queries:
+            self.fetch(nicknames)
+
+        # Then: Everything comes from the cache
+        self.assertEqual(len(queries), 1)
+
+    def test_invalid_requests(self):
+        """Test malformed and oversized requests are rejected."""
+        for files in ([], "alice", [{"etag": '"x"'}], [1]):
+            response = self.client.post("/bulk-fetch", {"files": files}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, files)
+
+        with self.settings(BULK_FETCH_MAX_FILES=2):
+            response = self.client.post(
+                "/bulk-fetch", {"files": ["alice", "bob", "carol"]}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EventsTest(HostingTestCase):
+    """Test cases for the /events change notifications."""
+
+    def setUp(self):
+        super().setUp()
+
+        for nickname in ("alice", "bob"):
+            self.sign_up(nickname)
+
+    async def subscribe(self, nicks):
+        response = await self.async_client.get("/events", {"nick": nicks})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = response.streaming_content
+        self.assertEqual(await anext(events), b"retry: 5000\n\n")
+        return events
+
+    async def next_event(self, events):
+        chunk = (await asyncio.wait_for(anext(events), 5)).decode("utf-8")
+        event, data = chunk.strip().split("\n")
+        return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def test_upload_event(self):
+        """Test an upload notifies its ETag and new posts once indexed."""
+        # Given: A stream following alice and bob
+        events = await self.subscribe("alice,bob")
+
+        # When: alice uploads a post
+        await sync_to_async(self.put_file)(
+            "alice",
+            "#+TITLE: Alice\n\n* Posts\n**\n:PROPERTIES:\n:ID: 2025-01-01T10:00:00+0100\n:END:\n\nHi\n",
+        )
+
+        # Then: The event carries the new ETag and the post id
+        hosted_file = await HostedFile.objects.aget(nickname="alice")
+        self.assertEqual(
+            await self.next_event(events),
+            (
+                "update",
+                {"nick": "alice", "etag": hosted_file.etag, "posts": ["2025-01-01T10:00:00+0100"]},
+            ),
+        )
+
+    async def test_redirect_and_delete_events(self):
+        """Test redirects and deletes are notified, only to streams following the file."""
+        # Given: A stream following bob only
+        events = await self.subscribe("bob")
+
+        # When: alice is deleted, then bob redirected and deleted
+        await sync_to_async(self.client.post)(
+            "/delete", {"vfile": self.vfiles["alice"]}, format="json"
+        )
+        await sync_to_async(self.client.post)(
+            "/redirect",
+            {"vfile": self.vfiles["bob"], "new-url": "https://example.org/social.org"},
+            format="json",
+        )
+        await sync_to_async(self.client.post)("/delete", {"vfile": self.vfiles["bob"]}, format="json")
+
+        # Then: Only bob's changes are received, in order
+        self.assertEqual(
+            await self.next_event(events),
+            ("redirect", {"nick": "bob", "location": "https://example.org/social.org"}),
+        )
+        self.assertEqual(await self.next_event(events), ("delete", {"nick": "bob"}))
+
+    @override_settings(EVENTS_KEEPALIVE=0.01)
+    async def test_keepalive_and_unsubscribe(self):
+        """Test idle streams get keepalives and unsubscribe when closed."""
+        # Given: An open stream
+        events = stream_events(broker.subscribe(["alice"]))
+        await anext(events)
+        self.assertEqual(len(broker), 1)
+
+        # When: Nothing happens
+        # Then: A keepalive comment is sent
+        self.assertEqual(await anext(events), b": keepalive\n\n")
+
+        # When: The client goes away
+        await events.aclose()
+
+        # Then: Its subscription is removed
+        self.assertEqual(len(broker), 0)
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    async def test_slow_stream_is_ended(self):
+        """Test a stream that falls behind is ended instead of growing."""
+        # Given: A stream that is not being read
+        events = stream_events(broker.subscribe(["alice"]))
+        await anext(events)
+
+        # When: More events arrive than it can hold
+        for _ in range(3):
+            broker.dispatch({"event": "delete", "nick": "alice"})
+
+        # Then: The stream ends, so the client reconnects
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+        self.assertEqual(len(broker), 0)
+
+    def test_nick_is_required(self):
+        """Test streams need between one and EVENTS_MAX_NICKNAMES files."""
+        self.assertEqual(self.client.get("/events").status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(EVENTS_MAX_NICKNAMES=1):
+            response = self.client.get("/events", {"nick": "alice,bob"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PatchUploadTest(HostingTestCase):
+    """Test cases for PATCH /<nickname>/social.org."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.nickname = "test_user"
+        self.url = f"/{self.nickname}/social.org"
+        self.hosted_file = self.sign_up(self.nickname)
+        self.vfile = self.vfiles[self.nickname]
+        self.content = "#+TITLE: Test\n\n* Posts\n** First post\nHello\n"
+        self.put_file(self.nickname, self.content)
+        self.hosted_file.refresh_from_db()
+
+    def patch(self, body: str, content_type="text/plain", **extra):
+        extra.setdefault("HTTP_AUTHORIZATION", f"VFile {self.vfile}")
+        return self.client.patch(
+            self.url,
+            body.encode("utf-8"),
+            content_type=content_type,
+            **extra,
+        )
+
+    def test_append(self):
+        """Test appending a post guarded by the current ETag."""
+        # Given: A new post
+        post = "** Second post\nWorld\n"
+
+        # When: It is appended
+        response = self.patch(post, HTTP_IF_MATCH=self.hosted_file.etag)
+
+        # Then: The file is extended and the new ETag returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.file_content, self.content + post)
+        expected_hash = compute_content_hash((self.content + post).encode("utf-8"))
+        self.assertEqual(response["ETag"], f'"{expected_hash}"')
+
+        # Then: The new content is served
+        self.assertEqual(
+            self.client.get(self.url).content.decode("utf-8"),
+            self.content + post,
+        )
+
+    def test_append_requires_if_match(self):
+        """Test appending without If-Match is refused."""
+        # When: A post is appended without If-Match
+        response = self.patch("** Second post\n")
+
+        # Then: A precondition is required
+        self.assertEqual(response.status_code, status.HTTP_428_PRECONDITION_REQUIRED)
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.file_content, self.content)
+
+    def test_append_stale_etag(self):
+        """Test a retried append is not applied twice."""
+        # Given: An append that succeeded
+        etag = self.hosted_file.etag
+        self.patch("** Second post\n", HTTP_IF_MATCH=etag)
+
+        # When: The same request is retried
+        response = self.patch("** Second post\n", HTTP_IF_MATCH=etag)
+
+        # Then: It is rejected
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.file_content.count("Second post"), 1)
+
+    @override_settings(MAX_FILE_SIZE=60)
+    def test_append_too_large(self):
+        """Test the resulting file must fit in MAX_FILE_SIZE."""
+        # When: An append would make the file too large
+        response = self.patch("x" * 30, HTTP_IF_MATCH=self.hosted_file.etag)
+
+        # Then: It is rejected
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_unified_diff(self):
+        """Test applying a unified diff to the stored file."""
+        # Given: A diff that edits a post and adds another
+        diff = (
+            "--- a/social.org\n"
+            "+++ b/social.org\n"
+            "@@ -3,3 +3,5 @@\n"
+            " * Posts\n"
+            " ** First post\n"
+            "-Hello\n"
+            "+Hello, edited\n"
+            "+** Second post\n"
+            "+World\n"
+        )
+
+        # When: It is sent as a patch
+        response = self.patch(diff, content_type="text/x-diff")
+
+        # Then: It is applied
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(
+            self.hosted_file.file_content,
+            "#+TITLE: Test\n\n* Posts\n** First post\nHello, edited\n** Second post\nWorld\n",
+        )
+        self.assertEqual(response["ETag"], self.hosted_file.etag)
+
+    def test_unified_diff_conflict(self):
+        """Test a diff made against another version is rejected."""
+        # Given: A diff whose context does not match the stored file
+        diff = "@@ -5 +5 @@\n-Goodbye\n+Hello again\n"
+
+        # When: It is sent
+        response = self.patch(diff, content_type="text/x-diff")
+
+        # Then: It conflicts and nothing changes
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn("does not apply", response.json()["errors"][0])
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.file_content, self.content)
+
+    def test_apply_unified_diff_end_of_file(self):
+        """Test diffs touching a last line without a newline."""
+        # Given: A file without a trailing newline and a diff adding one line
+        original = "a\nb"
+        diff = "@@ -1,2 +1,3 @@\n a\n-b\n\\ No newline at end of file\n+b\n+c\n"
+
+        # When/Then: The diff applies
+        self.assertEqual(apply_unified_diff(original, diff), "a\nb\nc\n")
+
+        # When/Then: Malformed diffs are rejected
+        with self.assertRaises(PatchError):
+            apply_unified_diff(original, "not a diff")
+
+    def test_patch_file_with_line_separators(self):
+        """Test form feeds and Unicode line separators do not split lines."""
+        # Given: A file with a form feed line and a line containing U+2028
+        content = "#+TITLE: Test\n\x0c\n* Posts\nA\u2028B\n"
+        self.client.put(
+            self.url,
+            content.encode("utf-8"),
+            content_type="text/plain",
+            HTTP_AUTHORIZATION=f"VFile {self.vfile}",
+        )
+        etag = self.client.get(self.url)["ETag"]
+        diff = (
+            "--- a/social.org\n+++ b/social.org\n"
+            "@@ -2,3 +2,4 @@\n \x0c\n * Posts\n A\u2028B\n+C\n"
+        )
+
+        # When: A diff made by diff -u is applied
+        response = self.patch(diff, content_type="text/x-diff", HTTP_IF_MATCH=etag)
+
+        # Then: It applies
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.file_content, content + "C\n")
+
+
+class PartialReadTest(HostingTestCase):
+    """Test cases for ?since= and Range reads of a hosted file."""
+
+    HEADER = "#+TITLE: Test\n#+NICK: test_user\n#+FOLLOW: https://example.org/social.org\n\n* Posts\n"
+    POSTS = [
+        "**\n:PROPERTIES:\n:ID: 2025-01-01T10:00:00+0100\n:END:\n\nFirst post\n\n",
+        "**\n:PROPERTIES:\n:ID: 2025-01-02T10:00:00+0100\n:END:\n\nSecond post ünïcödé\n*** Notes\nNested\n\n",
+        "** 2025-01-03T10:00:00+01:00\nThird post, old style\n",
+    ]
+
+    def setUp(self):
+        super().setUp()
+
+        self.nickname = "test_user"
+        self.url = f"/{self.nickname}/social.org"
+        self.hosted_file = self.sign_up(self.nickname)
+        self.vfile = self.vfiles[self.nickname]
+        self.content = self.HEADER + "".join(self.POSTS)
+        self.put_file(self.nickname, self.content)
+        self.hosted_file.refresh_from_db()
+
+    def test_upload_builds_index(self):
+        """Test uploads store the byte offsets of the header and posts."""
+        # Then: The header and every post are indexed
+        encoded = self.content.encode("utf-8")
+        self.assertEqual(self.hosted_file.header_size, len(self.HEADER.encode("utf-8")))
+        posts = list(Post.objects.filter(hosted_file=self.hosted_file).order_by("start"))
+        self.assertEqual(
+            [post.post_id for post in posts],
+            ["2025-01-01T10:00:00+0100", "2025-01-02T10:00:00+0100", "2025-01-03T10:00:00+01:00"],
+        )
+        for post, text in zip(posts, self.POSTS):
+            self.assertEqual(encoded[post.start : post.end].decode("utf-8"), text)
+
+    def test_since_timestamp(self):
+        """Test ?since= returns the header plus newer posts only."""
+        # When: Posts after the first one are requested
+        response = self.client.get(self.url, {"since": "2025-01-01T12:00:00+01:00"})
+
+        # Then: The header and the two newer posts are returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.content.decode("utf-8"),
+            self.HEADER + self.POSTS[1] + self.POSTS[2],
+        )
+
+    def test_since_post_id(self):
+        """Test ?since= accepts a post id and excludes that post."""
+        # When: Posts after the second one are requested by its id
+        response = self.client.get(self.url, {"since": "2025-01-02T10:00:00+0100"})
+
+        # Then: Only the third post is returned
+        self.assertEqual(response.content.decode("utf-8"), self.HEADER + self.POSTS[2])
+
+    def test_since_unencoded_plus(self):
+        """Test ?since= with an unencoded "+" in the offset, which arrives as a space."""
+        # When: Posts are requested by a timestamp and by a post id written raw in the URL
+        timestamp = self.client.get(f"{self.url}?since=2025-01-01T12:00:00+01:00")
+        post_id = self.client.get(f"{self.url}?since=2025-01-02T10:00:00+0100")
+
+        # Then: The "+" is restored
+        self.assertEqual(timestamp.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            timestamp.content.decode("utf-8"),
+            self.HEADER + self.POSTS[1] + self.POSTS[2],
+        )
+        self.assertEqual(post_id.content.decode("utf-8"), self.HEADER + self.POSTS[2])
+
+    def test_since_no_new_posts(self):
+        """Test ?since= after the last post returns the header only."""
+        # When: Nothing was published after since
+        response = self.client.get(self.url, {"since": "2030-01-01T00:00:00Z"})
+
+        # Then: The header is still returned
+        self.assertEqual(response.content.decode("utf-8"), self.HEADER)
+
+    def test_since_conditional(self):
+        """Test partial reads have their own ETag and answer If-None-Match."""
+        # Given: A partial read
+        params = {"since": "2025-01-01T12:00:00+01:00"}
+        etag = self.client.get(self.url, params)["ETag"]
+        self.assertNotEqual(etag, self.hosted_file.etag)
+
+        # When: It is requested again with its ETag
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+
+        # Then: It has not been modified
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_since_invalid(self):
+        """Test an invalid since parameter is rejected."""
+        # When: since is neither a timestamp nor a post id
+        response = self.client.get(self.url, {"since": "yesterday"})
+
+        # Then: It is a bad request
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_since_without_index(self):
+        """Test files indexed before the post index existed are split on the fly."""
+        # Given: A file without index
+        Post.objects.filter(hosted_file=self.hosted_file).delete()
+        HostedFile.objects.filter(id=self.hosted_file.id).update(header_size=None)
+        invalidate_file(self.nickname)
+
+        # When: Newer posts are requested
+        response = self.client.get(self.url, {"since": "2025-01-01T12:00:00+01:00"})
+
+        # Then: The result is the same
+        self.assertEqual(
+            response.content.decode("utf-8"),
+            self.HEADER + self.POSTS[1] + self.POSTS[2],
+        )
+
+    def test_index_posts_command(self):
+        """Test index_posts indexes files that have no index."""
+        # Given: A file without index
+        Post.objects.filter(hosted_file=self.hosted_file).delete()
+        HostedFile.objects.filter(id=self.hosted_file.id).update(header_size=None)
+
+        # When: The command runs
+        out = StringIO()
+        call_command("index_posts", stdout=out)
+
+        # Then: The file is indexed again, by its artifacts pipeline
+        self.assertIn("Queued 1 files.", out.getvalue())
+        self.hosted_file.refresh_from_db()
+        self.assertEqual(self.hosted_file.header_size, len(self.HEADER.encode("utf-8")))
+        self.assertEqual(Post.objects.filter(hosted_file=self.hosted_file).count(), 3)
+
+    def test_range(self):
+        """Test byte ranges of the file are served."""
+        encoded = self.content.encode("utf-8")
+
+        # When: The bytes appended after a known length are requested
+        offset = len((self.HEADER + self.POSTS[0]).encode("utf-8"))
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={offset}-")
+
+        # Then: Only those bytes are returned, uncompressed
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.content, encoded[offset:])
+        self.assertEqual(
+            response["Content-Range"], f"bytes {offset}-{len(encoded) - 1}/{len(encoded)}"
+        )
+        self.assertNotIn("Content-Encoding", response)
+
+        # When/Then: Suffix ranges are served too
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(response.content, encoded[-10:])
+
+    def test_range_not_satisfiable(self):
+        """Test a range past the end of the file returns 416."""
+        # When: A range past the end is requested
+        response = self.client.get(self.url, HTTP_RANGE="bytes=999999-")
+
+        # Then: It cannot be satisfied
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response["Content-Range"], f"bytes */{self.hosted_file.content_size}")
+
+    def test_if_range_stale(self):
+        """Test a Range for another version of the file returns the whole file."""
+        # When: If-Range names an old ETag
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"old"')
+
+        # Then: The whole file is returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.content.encode("utf-8"))
+
+
+class PostIndexTest(TestCase):
+    """Test cases for the structured post index built at upload."""
+
+    CONTENT = (
+        "#+TITLE: Alice's journal\n"
+        "#+NICK: alice\n"
+        "#+DESCRIPTION: Emacs and coffee\n"
+        "#+AVATAR: https://example.org/avatar.png\n"
+        "#+FOLLOW: bob https://bob.example.org/social.org\n"
+        "#+FOLLOW: https://carol.example.org/social.org\n"
+        "\n"
+        "* Posts\n"
+        "** A title :emacs:org:\n"
+        ":PROPERTIES:\n"
+        ":ID: 2025-01-01T10:00:00+0100\n"
+        ":LANG: en\n"
+        ":TAGS: social emacs\n"
+        ":CLIENT: org-social.el\n"
+        ":END:\n"
+        "\n"
+        "First post\n"
+        "**\n"
+        ":PROPERTIES:\n"
+        ":ID: 2025-01-02T10:00:00+0100\n"
+        ":REPLY_TO: https://bob.example.org/social.org#2025-01-01T09:00:00+0100\n"
+        ":END:\n"
+        "\n"
+        "A reply\n"
+        "**\n"
+        ":PROPERTIES:\n"
+        ":ID: 2025-01-02T10:00:00+0100\n"
+        ":END:\n"
+        "\n"
+        "Duplicated id\n"
+        "**\n"
+        "No id at all\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.hosted_file = HostedFile.objects.create(
+            nickname="alice",
+            vfile_token="token",
+            vfile_timestamp=1700000000,
+            vfile_signature="signature",
+            file_content=self.CONTENT,
+        )
+
+    def test_posts_properties_and_tags(self):
+        """Test posts are indexed with their properties and tags."""
+        # When: The file is indexed
+        index_posts(self.hosted_file)
+
+        # Then: Each post with an id is stored once, in file order
+        posts = list(Post.objects.filter(hosted_file=self.hosted_file).order_by("start"))
+        self.assertEqual(
+            [post.post_id for post in posts],
+            ["2025-01-01T10:00:00+0100", "2025-01-02T10:00:00+0100"],
+        )
+
+        first, reply = posts
+        self.assertEqual(first.properties["LANG"], "en")
+        self.assertEqual(first.properties["CLIENT"], "org-social.el")
+        self.assertEqual(first.tags, ["emacs", "org", "social"])
+        self.assertEqual(
+            reply.properties["REPLY_TO"],
+            "https://bob.example.org/social.org#2025-01-01T09:00:00+0100",
+        )
+        self.assertEqual(reply.tags, [])
+
+    def test_profile_header(self):
+        """Test the #+ keywords are stored as a profile header."""
+        # When: The file is indexed
+        index_posts(self.hosted_file)
+
+        # Then: The header is stored
+        header = ProfileHeader.objects.get(hosted_file=self.hosted_file)
+        self.assertEqual(header.title, "Alice's journal")
+        self.assertEqual(header.nick, "alice")
+        self.assertEqual(header.description, "Emacs and coffee")
+        self.assertEqual(header.avatar, "https://example.org/avatar.png")
+        self.assertEqual(
+            header.keywords["FOLLOW"],
+            ["bob https://bob.example.org/social.org", "https://carol.example.org/social.org"],
+        )
+
+    def test_reindex_replaces_index(self):
+        """Test indexing again replaces the previous posts and header."""
+        # Given: An indexed file
+        index_posts(self.hosted_file)
+
+        # When: The file changes and is indexed again
+        self.hosted_file.file_content = "#+TITLE: New\n\n* Posts\n"
+        self.hosted_file.save()
+        index_posts(self.hosted_file)
+
+        # Then: Only the new state is stored
+        self.assertEqual(Post.objects.filter(hosted_file=self.hosted_file).count(), 0)
+        header = ProfileHeader.objects.get(hosted_file=self.hosted_file)
+        self.assertEqual(header.title, "New")
+        self.assertEqual(header.nick, "")
+
+
+class IncrementalIndexTest(TestCase):
+    """Test cases for incremental re-indexing of posts."""
+
+    HEADER = "#+TITLE: Test\n#+NICK: test_user\n\n* Posts\n"
+
+    def setUp(self):
+        self.posts = [self.post(day) for day in range(1, 11)]
+        self.hosted_file = HostedFile.objects.create(
+            nickname="test_user",
+            vfile_token="token",
+            vfile_timestamp=1700000000,
+            vfile_signature="signature",
+            file_content=self.HEADER + "".join(self.posts),
+        )
+        index_posts(self.hosted_file)
+
+    def post(self, day, body="Hello"):
+        return f"**\n:PROPERTIES:\n:ID: 2025-01-{day:02d}T10:00:00+0100\n:END:\n\n{body} {day}\n\n"
+
+    def reindex(self, header=None):
+        self.hosted_file.file_content = (header or self.HEADER) + "".join(self.posts)
+        self.hosted_file.save()
+        return index_posts(self.hosted_file)
+
+    def assertIndexMatchesContent(self):
+        """The incremental index equals a full index of the content."""
+        _, posts = split_posts(self.hosted_file.file_content.encode("utf-8"))
+        expected = [
+            (post["post_id"], post["start"], post["end"], post["tags"]) for post in posts
+        ]
+        stored = list(
+            Post.objects.filter(hosted_file=self.hosted_file)
+            .order_by("start")
+            .values_list("post_id", "start", "end", "tags")
+        )
+        self.assertEqual(stored, expected)
+
+    def test_unchanged_file(self):
+        """Test indexing an unchanged file parses and writes nothing."""
+        # When: The same content is indexed again
+        with CaptureQueriesContext(connection) as queries:
+            result = index_posts(self.hosted_file)
+
+        # Then: Nothing is parsed or written
+        self.assertEqual(
+            result,
+            {
+                "parsed": 0,
+                "created": 0,
+                "updated": 0,
+                "moved": 0,
+                "deleted": 0,
+                "follows": 0,
+                "changed": [],
+            },
+        )
+        writes = [
+            q["sql"] for q in queries if q["sql"].startswith(("UPDATE", "INSERT", "DELETE"))
+        ]
+        self.assertEqual(writes, [])
+
+    def test_append_post(self):
+        """Test appending a post only parses and inserts that post."""
+        # When: A post is appended
+        self.posts.append(self.post(11))
+        result = self.reindex()
+
+        # Then: Only the new post is parsed and created
+        self.assertEqual(
+            result,
+            {
+                "parsed": 1,
+                "created": 1,
+                "updated": 0,
+                "moved": 0,
+                "deleted": 0,
+                "follows": 0,
+                "changed": ["2025-01-11T10:00:00+0100"],
+            },
+        )
+        self.assertIndexMatchesContent()
+
+    def test_edit_post(self):
+        """Test editing a post updates it and moves the posts after it."""
+        # When: The third post is edited
+        self.posts[2] = self.post(3, body="Hello, edited")
+        result = self.reindex()
+
+        # Then: Only that post is parsed; the following posts only move
+        self.assertEqual(result["parsed"], 1)
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(result["moved"], 7)
+        self.assertEqual(result["created"] + result["deleted"], 0)
+        self.assertEqual(result["changed"], ["2025-01-03T10:00:00+0100"])
+        self.assertIndexMatchesContent()
+
+    def test_edits_with_different_shifts(self):
+        """Test posts shifted by different amounts all end at their new offsets."""
+        # When: One post grows, a later one shrinks and another is removed
+        self.posts[1] = self.post(2, body="Hello, this post got much longer")
+        self.posts[4] = self.post(5, body="Hi")
+        del self.posts[7]
+        with CaptureQueriesContext(connection) as queries:
+            result = self.reindex()
+
+        # Then: The index matches the content, moving posts by runs
+        self.assertEqual(result["updated"], 2)
+        self.assertEqual(result["deleted"], 1)
+        self.assertEqual(result["moved"], 6)
+        self.assertIndexMatchesContent()
+        shifts = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "posts" SET "start"')]
+        self.assertLessEqual(len(shifts), 4)
+
+    def test_delete_post(self):
+        """Test removing a post deletes its row."""
+        # When: The last post is removed
+        self.posts.pop()
+        result = self.reindex()
+
+        # Then: Its row is deleted
+        self.assertEqual(
+            result,
+            {
+                "parsed": 0,
+                "created": 0,
+                "updated": 0,
+                "moved": 0,
+                "deleted": 1,
+                "follows": 0,
+                "changed": [],
+            },
+        )
+        self.assertIndexMatchesContent()
+
+    def test_duplicate_id(self):
+        """Test a new post reusing an id of a later post takes its place."""
+        # When: A post with the id of the last post is inserted first
+        self.posts.insert(0, self.post(10, body="Copy of"))
+        self.reindex()
+
+        # Then: The first occurrence is indexed
+        post = Post.objects.get(hosted_file=self.hosted_file, post_id="2025-01-10T10:00:00+0100")
+        self.assertEqual(post.start, len(self.HEADER))
+        self.assertEqual(Post.objects.filter(hosted_file=self.hosted_file).count(), 10)
+
+    def test_header_change(self):
+        """Test the profile header is only rewritten when it changes."""
+        # When: The header changes
+        self.reindex(header="#+TITLE: Renamed\n\n* Posts\n")
+
+        # Then: The header and the offsets of every post are updated
+        header = ProfileHeader.objects.get(hosted_file=self.hosted_file)
+        self.assertEqual(header.title, "Renamed")
+        self.assertEqual(header.nick, "")
+        self.assertIndexMatchesContent()
+
+
+class ArtifactsPipelineTest(HostingTestCase):
+    """Test cases for the background build of derived artifacts."""
+
+    CONTENT = (
+        "#+TITLE: Test\n\n* Posts\n"
+        "**\n:PROPERTIES:\n:ID: 2025-01-01T10:00:00+0100\n:END:\n\n"
+        + "A post long enough to be worth compressing. " * 20
+        + "\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.storage_path = self.use_temp_storage()
+
+        self.nickname = "test_user"
+        self.url = f"/{self.nickname}/social.org"
+        self.hosted_file = self.sign_up(self.nickname)
+        self.vfile = self.vfiles[self.nickname]
+
+    def put(self, content: str):
+        return self.client.put(
+            self.url,
+            content.encode("utf-8"),
+            content_type="text/plain",
+            HTTP_AUTHORIZATION=f"VFile {self.vfile}",
+        )
+
+    def test_signup_builds_artifacts(self):
+        """Test the default file of a new account gets its artifacts."""
+        # Then: The artifacts match the content
+        self.assertTrue(self.hosted_file.artifacts_ready)
+        self.assertTrue((self.storage_path / self.nickname / "social.org").exists())
+
+    def test_upload_builds_artifacts(self):
+        """Test an upload queues the build of variants, index and mirror."""
+        # When: A file is uploaded
+        self.put(self.CONTENT)
+
+        # Then: Every artifact is built for the new content
+        self.hosted_file.refresh_from_db()
+        self.assertTrue(self.hosted_file.artifacts_ready)
+        self.assertTrue(
+            CompressedVariant.objects.filter(
+                hosted_file=self.hosted_file,
+                content_hash=self.hosted_file.content_hash,
+            ).exists()
+        )
+        self.assertEqual(Post.objects.filter(hosted_file=self.hosted_file).count(), 1)
+        self.assertTrue((self.storage_path / self.nickname / "social.org.gz").exists())
+        self.assertNotIn(PIPELINE_KEY_PREFIX + self.nickname, cache)
+
+    def test_pending_pipeline_is_reused(self):
+        """Test uploads while a pipeline is queued do not queue another."""
+        # Given: A pipeline is queued but has not started
+        cache.set(PIPELINE_KEY_PREFIX + self.nickname, 1)
+
+        # When: A file is uploaded
+        response = self.put(self.CONTENT)
+
+        # Then: The content is stored, but its artifacts are not built yet
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.hosted_file.refresh_from_db()
+        self.assertFalse(self.hosted_file.artifacts_ready)
+        self.assertEqual(Post.objects.filter(hosted_file=self.hosted_file).count(), 0)
+
+        # When: The queued pipeline runs
+        result = build_artifacts.call_local(self.nickname)
+
+        # Then: It builds the artifacts of the latest content
+        self.assertEqual(result, self.nickname)
+        self.hosted_file.refresh_from_db()
+        self.assertTrue(self.hosted_file.artifacts_ready)
+        self.assertEqual(Post.objects.filter(hosted_file=self.hosted_file).count(), 1)
+
+        # And: Running it again has nothing to do
+        self.assertIsNone(build_artifacts.call_local(self.nickname))
+
+    def test_readers_fall_back_while_building(self):
+        """Test reads serve the raw content while artifacts are being built."""
+        # Given: An upload whose artifacts are not built yet
+        cache.set(PIPELINE_KEY_PREFIX + self.nickname, 1)
+        self.put(self.CONTENT)
+
+        # When: The file is read with compression and with ?since=
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        since = self.client.get(self.url, {"since": "2024-12-31T00:00:00Z"})
+
+        # Then: The raw content is served, split on the fly for ?since=
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response.content.decode("utf-8"), self.CONTENT)
+        self.assertEqual(since.content.decode("utf-8"), self.CONTENT)
+
+        # And: The mirror has the new content, without a stale gzip variant
+        directory = self.storage_path / self.nickname
+        self.assertEqual((directory / "social.org").read_text(), self.CONTENT)
+        self.assertFalse((directory / "social.org.gz").exists())
+
+    def test_compression_runs_before_the_row_is_locked(self):
+        """Test uploads do not wait on the row while the content is compressed."""
+        in_transaction = []
+        compress = tasks_module.compress_content
+
+        # The test case's own transactions are outermost
+        depth = len(connection.savepoint_ids)
+
+        def record_compress(content):
+            in_transaction.append(len(connection.savepoint_ids) > depth)
+            return compress(content)
+
+        # When: A file is uploaded
+        with mock.patch.object(tasks_module, "compress_content", record_compress):
+            self.put(self.CONTENT)
+
+        # Then: Its content was compressed outside of any transaction
+        self.assertEqual(in_transaction, [False])
+        self.assertTrue(
+            CompressedVariant.objects.filter(
+                hosted_file=self.hosted_file, encoding="gzip"
+            ).exists()
+        )
+
+    def test_build_artifacts_command(self):
+        """Test files written before their variants existed get them built."""
+        # Given: A file backfilled by the migration, with no artifacts yet
+        self.put(self.CONTENT)
+        CompressedVariant.objects.filter(hosted_file=self.hosted_file).delete()
+        (self.storage_path / self.nickname / "social.org.gz").unlink()
+        HostedFile.objects.filter(id=self.hosted_file.id).update(artifacts_hash="")
+        self.hosted_file.refresh_from_db()
+        self.assertFalse(self.hosted_file.artifacts_ready)
+
+        # When: The command runs
+        out = StringIO()
+        call_command("build_artifacts", stdout=out)
+
+        # Then: The variants and the gzip mirror are built
+        self.assertIn("Queued 1 files.", out.getvalue())
+        self.hosted_file.refresh_from_db()
+        self.assertTrue(self.hosted_file.artifacts_ready)
+        self.assertTrue(
+            CompressedVariant.objects.filter(
+                hosted_file=self.hosted_file, encoding="gzip"
+            ).exists()
+        )
+        self.assertTrue((self.storage_path / self.nickname / "social.org.gz").exists())
+
+    def test_deleted_file(self):
+        """Test a pipeline for a deleted file does nothing."""
+        # Given: The file is deleted before its pipeline runs
+        HostedFile.objects.filter(id=self.hosted_file.id).delete()
+
+        # Then: There is nothing to build
+        self.assertIsNone(build_artifacts.call_local(self.nickname))
+
+
+class PostsApiTest(HostingTestCase):
+    """Test cases for GET /<nickname>/posts."""
+
+    HEADER = "#+TITLE: Test\n#+NICK: test_user\n\n* Posts\n"
+
+    def setUp(self):
+        super().setUp()
+
+        self.nickname = "test_user"
+        self.url = f"/{self.nickname}/posts"
+        self.hosted_file = self.sign_up(self.nickname)
+        self.vfile = self.vfiles[self.nickname]
+        self.posts = [
+            self.post(1, "First post", tags="emacs"),
+            self.post(2, "Second post", tags="Emacs org", mood="😀"),
+            self.post(
+                3,
+                "A reply",
+                reply_to="https://example.org/social.org#2025-01-01T10:00:00+0100",
+            ),
+            self.post(4, "Fourth post", tags="org"),
+            self.post(5, "Fifth post"),
+        ]
+        self.upload()
+
+    def post(self, day, text, tags=None, mood=None, reply_to=None):
+        properties = {"TAGS": tags, "MOOD": mood, "REPLY_TO": reply_to}
+        return org_post(day, text, {name: value for name, value in properties.items() if value})
+
+    def upload(self):
+        return self.put_file(self.nickname, self.HEADER + "".join(self.posts))
+
+    def ids(self, response):
+        return [post["id"][8:10] for post in response.json()["data"]]
+
+    def test_posts_newest_first(self):
+        """Test posts are listed newest first with their fields."""
+        # When: The posts are requested
+        response = self.client.get(self.url)
+
+        # Then: They are returned newest first
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(response), ["05", "04", "03", "02", "01"])
+
+        second = response.json()["data"][3]
+        self.assertEqual(second["id"], "2025-01-02T10:00:00+0100")
+        self.assertEqual(second["timestamp"], "2025-01-02T09:00:00+00:00")
+        self.assertEqual(second["text"], "Second post")
+        self.assertEqual(second["tags"], ["Emacs", "org"])
+        self.assertEqual(second["mood"], "😀")
+        self.assertIsNone(second["reply-to"])
+        self.assertEqual(
+            response.json()["data"][2]["reply-to"],
+            "https://example.org/social.org#2025-01-01T10:00:00+0100",
+        )
+
+    def test_pagination(self):
+        """Test following next links lists every post once."""
+        # When: The posts are read two at a time
+        pages = []
+        url = f"{self.url}?limit=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(self.ids(response))
+            url = response.json()["_links"].get("next", {}).get("href")
+
+        # Then: Every post is listed once, newest first
+        self.assertEqual(pages, [["05", "04"], ["03", "02"], ["01"]])
+
+    def test_filters(self):
+        """Test posts are filtered by tag (case-insensitive) and date range."""
+        # When: Posts are filtered
+        by_tag = self.client.get(self.url, {"tag": "EMACS"})
+        by_date = self.client.get(
+            self.url,
+            {"since": "2025-01-02T09:00:00Z", "until": "2025-01-04T09:00:00Z"},
+        )
+        combined = self.client.get(self.url, {"tag": "org", "since": "2025-01-03T00:00:00Z"})
+
+        # Then: Only matching posts are returned
+        self.assertEqual(self.ids(by_tag), ["02", "01"])
+        self.assertEqual(self.ids(by_date), ["04", "03"])
+        self.assertEqual(self.ids(combined), ["04"])
+
+    def test_tags_follow_uploads(self):
+        """Test the tag filter reflects edited, added and removed posts."""
+        # When: Tags change in a new upload
+        self.posts[0] = self.post(1, "First post, retagged", tags="lisp")
+        self.posts[4] = self.post(5, "Fifth post", tags="emacs")
+        del self.posts[1]
+        self.upload()
+
+        # Then: The tag filter uses the new tags
+        self.assertEqual(self.ids(self.client.get(self.url, {"tag": "emacs"})), ["05"])
+        self.assertEqual(self.ids(self.client.get(self.url, {"tag": "lisp"})), ["01"])
+
+    def test_etag(self):
+        """Test listings are conditional on the content of the file."""
+        # Given: A listing and its ETag
+        response = self.client.get(self.url, {"limit": 2})
+        etag = response["ETag"]
+        self.hosted_file.refresh_from_db()
+        self.assertIn(self.hosted_file.content_hash, etag)
+
+        # When: It is requested again with If-None-Match
+        not_modified = self.client.get(self.url, {"limit": 2}, HTTP_IF_NONE_MATCH=etag)
+
+        # Then: It has not changed
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # When: The file changes
+        self.posts.append(self.post(6, "Sixth post"))
+        self.upload()
+        modified = self.client.get(self.url, {"limit": 2}, HTTP_IF_NONE_MATCH=etag)
+
+        # Then: The new listing is returned
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(modified), ["06", "05"])
+
+    def test_file_not_read(self):
+        """Test listings are served from the index without reading the file."""
+        # When: The posts are requested
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"tag": "org"})
+
+        # Then: The content of the file is never loaded
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any("file_content" in q["sql"] for q in queries))
+
+    def test_invalid_parameters(self):
+        """Test invalid limit, cursor and dates are rejected."""
+        for params in ({"limit": 0}, {"limit": "x"}, {"cursor": "!!"}, {"since": "yesterday"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_unknown_nickname(self):
+        """Test listing the posts of an unknown nickname fails."""
+        response = self.client.get("/nobody/posts")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TimelineTest(HostingTestCase):
+    """Test cases for GET /timeline."""
+
+    def setUp(self):
+        super().setUp()
+
+        for nickname in ("alice", "bob", "carol"):
+            self.sign_up(nickname)
+
+        # Posts interleaved in time across files
+        self.upload("alice", [1, 4, 5])
+        self.upload("bob", [2, 3, 6])
+        self.upload("carol", [7])
+
+    def upload(self, nickname, days):
+        self.upload_posts(nickname, [(day, f"{nickname} {day}") for day in days])
+
+    def texts(self, response):
+        return [post["text"] for post in response.json()["data"]]
+
+    def test_timeline_merges_files(self):
+        """Test the timeline lists every file's posts, newest first."""
+        # When: The timeline is requested
+        response = self.client.get("/timeline")
+
+        # Then: Posts of all files are merged by date
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.texts(response),
+            ["carol 7", "bob 6", "alice 5", "alice 4", "bob 3", "bob 2", "alice 1"],
+        )
+        first = response.json()["data"][0]
+        self.assertEqual(first["nick"], "carol")
+        self.assertEqual(first["url"], "http://localhost:8080/carol/social.org")
+
+    def test_pagination(self):
+        """Test every page is one query and pages do not overlap."""
+        # When: The timeline is read three posts at a time
+        pages = []
+        url = "/timeline?limit=3"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(queries), 1)
+            pages.append(self.texts(response))
+            url = response.json()["_links"].get("next", {}).get("href")
+
+        # Then: Every post is listed once
+        self.assertEqual(
+            pages,
+            [["carol 7", "bob 6", "alice 5"], ["alice 4", "bob 3", "bob 2"], ["alice 1"]],
+        )
+
+    def test_redirected_files_are_excluded(self):
+        """Test posts of redirected files leave the timeline."""
+        # Given: The current ETag
+        etag = self.client.get("/timeline")["ETag"]
+
+        # When: bob sets up a redirect
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfiles["bob"], "new-url": "https://example.org/social.org"},
+            format="json",
+        )
+        response = self.client.get("/timeline", HTTP_IF_NONE_MATCH=etag)
+
+        # Then: The timeline changed and bob's posts are gone
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.texts(response), ["carol 7", "alice 5", "alice 4", "alice 1"]
+        )
+
+    def test_etag(self):
+        """Test the timeline is conditional until a post changes."""
+        # Given: The current ETag
+        etag = self.client.get("/timeline")["ETag"]
+
+        # When: Nothing changed
+        response = self.client.get("/timeline", HTTP_IF_NONE_MATCH=etag)
+
+        # Then: It is not modified
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # When: A post is added
+        self.upload("carol", [7, 8])
+        response = self.client.get("/timeline", HTTP_IF_NONE_MATCH=etag)
+
+        # Then: The new post is listed first
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.texts(response)[0], "carol 8")
+
+
+class SearchTest(HostingTestCase):
+    """Test cases for GET /search."""
+
+    def setUp(self):
+        super().setUp()
+
+        for nickname in ("alice", "bob"):
+            self.sign_up(nickname)
+
+        self.upload(
+            "alice",
+            [
+                "Learning Emacs and org-mode",
+                "Emacs, emacs, emacs: my editor <3",
+                "Cooking pasta tonight",
+            ],
+        )
+        self.upload("bob", ["Vim or Emacs? Both are fine", "Gardening notes"])
+
+    def upload(self, nickname, texts):
+        self.upload_posts(nickname, enumerate(texts, start=1))
+
+    def search(self, q, **params):
+        return self.client.get("/search", {"q": q, **params})
+
+    def texts(self, response):
+        return [post["text"] for post in response.json()["data"]]
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 triggers are SQLite only")
+    def test_search_triggers_exist(self):
+        """Test the triggers feeding the FTS5 index survived every migration of posts."""
+        # When: The schema is inspected
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'posts'"
+            )
+            triggers = {row[0] for row in cursor.fetchall()}
+
+        # Then: Inserts, updates and deletes of posts still reach the index
+        # (a migration that rebuilt the posts table must create them again)
+        self.assertEqual(
+            triggers, {"posts_search_insert", "posts_search_update", "posts_search_delete"}
+        )
+
+    def test_search_ranks_matches(self):
+        """Test every matching post is returned, the most relevant first."""
+        # When: A word is searched
+        response = self.search("emacs")
+
+        # Then: Matching posts of every file are returned, ranked
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        texts = self.texts(response)
+        self.assertEqual(len(texts), 3)
+        self.assertEqual(texts[0], "Emacs, emacs, emacs: my editor <3")
+        self.assertEqual(
+            {post["nick"] for post in response.json()["data"]}, {"alice", "bob"}
+        )
+
+    def test_snippet_highlighting(self):
+        """Test snippets mark the matched words and escape the text."""
+        # When: A word is searched
+        response = self.search("editor")
+
+        # Then: The snippet is escaped HTML with the match in <mark>
+        self.assertEqual(
+            response.json()["data"][0]["snippet"],
+            "Emacs, emacs, emacs: my <mark>editor</mark> &lt;3",
+        )
+
+    def test_all_words_and_prefix(self):
+        """Test every word is required and the last one matches as a prefix."""
+        self.assertEqual(self.texts(self.search("emacs vim")), ["Vim or Emacs? Both are fine"])
+        self.assertEqual(self.texts(self.search("garden")), ["Gardening notes"])
+        self.assertEqual(self.texts(self.search('"cooking" OR -x*')), [])
+
+    def test_index_follows_changes(self):
+        """Test the index follows uploads, redirects and deletes."""
+        # When: alice edits her posts and bob is redirected
+        self.upload("alice", ["Learning Lisp", "Cooking pasta tonight"])
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfiles["bob"], "new-url": "https://example.org/social.org"},
+            format="json",
+        )
+
+        # Then: Old texts and redirected files are no longer found
+        self.assertEqual(self.texts(self.search("emacs")), [])
+        self.assertEqual(self.texts(self.search("lisp")), ["Learning Lisp"])
+
+        # When: alice deletes her file
+        self.client.post("/delete", {"vfile": self.vfiles["alice"]}, format="json")
+
+        # Then: Her posts are no longer found
+        self.assertEqual(self.texts(self.search("lisp")), [])
+
+    def test_pagination(self):
+        """Test results are paginated with offset links."""
+        # When: Results are read one at a time
+        texts = []
+        url = "/search?q=emacs&limit=1"
+        while url:
+            response = self.client.get(url)
+            texts.extend(self.texts(response))
+            url = response.json()["_links"].get("next", {}).get("href")
+
+        # Then: Every result is read once
+        self.assertEqual(len(texts), 3)
+        self.assertEqual(len(set(texts)), 3)
+
+    def test_etag(self):
+        """Test results are conditional until the index changes."""
+        etag = self.search("emacs")["ETag"]
+        response = self.client.get("/search", {"q": "emacs"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.upload("bob", ["Vim or Emacs? Emacs!"])
+        response = self.client.get("/search", {"q": "emacs"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_parameters(self):
+        """Test a missing query and invalid pagination are rejected."""
+        for params in ({}, {"q": "emacs", "limit": 0}, {"q": "emacs", "offset": -1}):
+            response = self.client.get("/search", params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class LinkIndexTest(HostingTestCase):
+    """Test cases for /tags/<tag>, /<nickname>/mentions and /<nickname>/replies/<post-id>."""
+
+    ALICE_POST = "2025-01-01T10:00:00+0100"
+
+    def setUp(self):
+        super().setUp()
+
+        for nickname in ("alice", "bob", "carol"):
+            self.sign_up(nickname)
+
+        self.upload("alice", [({"TAGS": "emacs"}, "Hello")])
+        self.upload(
+            "bob",
+            [
+                (
+                    {"TAGS": "Emacs org", "REPLY_TO": f"http://localhost:8080/alice/social.org#{self.ALICE_POST}"},
+                    "Welcome!",
+                ),
+                ({}, "Say hi to [[org-social:https://LOCALHOST:8080/alice/social.org][alice]]"),
+            ],
+        )
+        self.upload(
+            "carol",
+            [
+                ({}, "Good morning"),
+                ({"REPLY_TO": f"https://localhost:8080/alice/social.org#{self.ALICE_POST}"}, "Hi alice"),
+            ],
+        )
+
+    def upload(self, nickname, posts):
+        self.upload_posts(
+            nickname,
+            [(day, text, properties) for day, (properties, text) in enumerate(posts, start=1)],
+        )
+
+    def listed(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(post["nick"], post["text"]) for post in response.json()["data"]]
+
+    def test_tags(self):
+        """Test posts are listed by tag across files, case-insensitively."""
+        self.assertEqual(
+            self.listed("/tags/EMACS"), [("bob", "Welcome!"), ("alice", "Hello")]
+        )
+        self.assertEqual(self.listed("/tags/org"), [("bob", "Welcome!")])
+        self.assertEqual(self.listed("/tags/lisp"), [])
+
+    def test_mentions(self):
+        """Test mentions are found whatever the scheme and case of the host."""
+        self.assertEqual(
+            self.listed("/alice/mentions"),
+            [("bob", "Say hi to [[org-social:https://LOCALHOST:8080/alice/social.org][alice]]")],
+        )
+        self.assertEqual(self.listed("/bob/mentions"), [])
+
+    def test_replies(self):
+        """Test replies to a post are listed newest first."""
+        self.assertEqual(
+            self.listed(f"/alice/replies/{self.ALICE_POST}"),
+            [("carol", "Hi alice"), ("bob", "Welcome!")],
+        )
+        self.assertEqual(self.listed("/alice/replies/2025-01-02T10:00:00+0100"), [])
+
+    def test_unknown_account(self):
+        """Test mentions and replies of unknown accounts are not found."""
+        self.assertEqual(self.client.get("/nobody/mentions").status_code, 404)
+        self.assertEqual(
+            self.client.get(f"/nobody/replies/{self.ALICE_POST}").status_code, 404
+        )
+
+    def test_redirected_account(self):
+        """Test mentions and replies of redirected accounts redirect to the new URL."""
+        # Given: alice is redirected
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfiles["alice"], "new-url": "https://example.org/social.org"},
+            format="json",
+        )
+
+        # When: Her mentions and the replies to her post are requested
+        responses = [
+            self.client.get("/alice/mentions"),
+            self.client.get(f"/alice/replies/{self.ALICE_POST}"),
+        ]
+
+        # Then: Both redirect permanently
+        for response in responses:
+            self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
+            self.assertEqual(response["Location"], "https://example.org/social.org")
+
+    def test_reupload_replaces_rows(self):
+        """Test a re-upload replaces the rows of changed posts only."""
+        # Given: The current ETag of alice's mentions
+        etag = self.client.get("/alice/mentions")["ETag"]
+
+        # When: bob stops mentioning alice and drops a tag
+        self.upload(
+            "bob",
+            [
+                (
+                    {"TAGS": "emacs", "REPLY_TO": f"http://localhost:8080/alice/social.org#{self.ALICE_POST}"},
+                    "Welcome!",
+                ),
+                ({}, "Say hi to alice"),
+            ],
+        )
+
+        # Then: The listings follow and the ETag changed
+        response = self.client.get("/alice/mentions", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"], [])
+        self.assertEqual(self.listed("/tags/org"), [])
+        self.assertEqual(len(self.listed(f"/alice/replies/{self.ALICE_POST}")), 2)
+
+    def test_delete_redirect_and_cleanup(self):
+        """Test rows leave the listings with their files."""
+        # When: carol is redirected
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfiles["carol"], "new-url": "https://example.org/social.org"},
+            format="json",
+        )
+
+        # Then: Her reply is not listed
+        self.assertEqual(self.listed(f"/alice/replies/{self.ALICE_POST}"), [("bob", "Welcome!")])
+
+        # When: bob deletes his file
+        self.client.post("/delete", {"vfile": self.vfiles["bob"]}, format="json")
+
+        # Then: His rows are gone
+        self.assertEqual(self.listed("/alice/mentions"), [])
+        self.assertEqual(self.listed("/tags/emacs"), [("alice", "Hello")])
+        self.assertFalse(PostTag.objects.filter(tag="org").exists())
+
+        # When: alice's file is cleaned up as stale
+        HostedFile.objects.filter(nickname="alice").update(
+            last_access=timezone.now() - timedelta(days=settings.FILE_TTL_DAYS + 1)
+        )
+        cleanup_stale_files.call_local()
+
+        # Then: Her tagged post is gone
+        self.assertEqual(self.client.get("/tags/emacs").json()["data"], [])
+
+    def test_pagination(self):
+        """Test listings are paginated with cursors."""
+        response = self.client.get("/tags/emacs?limit=1")
+        self.assertEqual(len(response.json()["data"]), 1)
+        response = self.client.get(response.json()["_links"]["next"]["href"])
+        self.assertEqual(response.json()["data"][0]["nick"], "alice")
+        self.assertNotIn("next", response.json()["_links"])
+
+
+class FollowGraphTest(HostingTestCase):
+    """Test cases for /<nickname>/followers and /<nickname>/following."""
+
+    def setUp(self):
+        super().setUp()
+
+        for nickname in ("alice", "bob", "carol"):
+            self.sign_up(nickname)
+
+        self.upload("alice", ["http://localhost:8080/bob/social.org", "https://example.org/social.org"])
+        self.upload("bob", ["http://localhost:8080/alice/social.org"])
+        self.upload("carol", ["Alice https://localhost:8080/alice/social.org"])
+
+    def upload(self, nickname, follows):
+        self.upload_posts(nickname, follows=follows)
+
+    def followers(self, nickname):
+        response = self.client.get(f"/{nickname}/followers")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [follower["nick"] for follower in response.json()["data"]]
+
+    def test_followers_and_following(self):
+        """Test followers are local files following the public URL, whatever the scheme."""
+        # When: alice's graph is requested
+        followers = self.client.get("/alice/followers").json()["data"]
+        following = self.client.get("/alice/following").json()["data"]
+
+        # Then: bob and carol follow her, and she follows bob and an external file
+        self.assertEqual(
+            followers,
+            [
+                {"nick": "bob", "url": "http://localhost:8080/bob/social.org"},
+                {"nick": "carol", "url": "http://localhost:8080/carol/social.org"},
+            ],
+        )
+        self.assertEqual(
+            following,
+            [
+                {"name": None, "url": "https://example.org/social.org"},
+                {"name": None, "url": "http://localhost:8080/bob/social.org"},
+            ],
+        )
+        self.assertEqual(
+            self.client.get("/carol/following").json()["data"],
+            [{"name": "Alice", "url": "https://localhost:8080/alice/social.org"}],
+        )
+
+    def test_edges_are_diffed(self):
+        """Test an upload only writes the edges that changed."""
+        # Given: The current edges and ETag
+        kept = Follow.objects.get(hosted_file__nickname="alice", target="example.org/social.org")
+        etag = self.client.get("/bob/followers")["ETag"]
+
+        # When: alice stops following bob and follows carol
+        self.upload("alice", ["https://example.org/social.org", "http://localhost:8080/carol/social.org"])
+
+        # Then: The unchanged edge is kept and the listings changed
+        self.assertTrue(Follow.objects.filter(id=kept.id).exists())
+        response = self.client.get("/bob/followers", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"], [])
+        self.assertEqual(self.followers("carol"), ["alice"])
+
+    def test_unchanged_header_is_not_reindexed(self):
+        """Test re-uploading the same header keeps the listings conditional."""
+        etag = self.client.get("/alice/followers")["ETag"]
+        self.upload("bob", ["http://localhost:8080/alice/social.org"])
+        response = self.client.get("/alice/followers", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_redirect_removes_edges(self):
+        """Test a redirected file stops following until the redirect is removed."""
+        # When: carol is redirected
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfiles["carol"], "new-url": "https://example.org/carol.org"},
+            format="json",
+        )
+
+        # Then: Her edges are removed
+        self.assertFalse(Follow.objects.filter(hosted_file__nickname="carol").exists())
+        self.assertEqual(self.followers("alice"), ["bob"])
+        self.assertEqual(
+            self.client.get("/carol/following").status_code,
+            status.HTTP_301_MOVED_PERMANENTLY,
+        )
+
+        # When: The redirect is removed
+        self.client.post("/remove-redirect", {"vfile": self.vfiles["carol"]}, format="json")
+
+        # Then: Her edges are back
+        self.assertEqual(self.followers("alice"), ["bob", "carol"])
+
+    def test_delete_and_cleanup_remove_edges(self):
+        """Test edges leave with their files."""
+        self.client.post("/delete", {"vfile": self.vfiles["bob"]}, format="json")
+        self.assertEqual(self.followers("alice"), ["carol"])
+
+        HostedFile.objects.filter(nickname="carol").update(
+            last_access=timezone.now() - timedelta(days=settings.FILE_TTL_DAYS + 1)
+        )
+        cleanup_stale_files.call_local()
+        self.assertEqual(self.followers("alice"), [])
+
+    def test_pagination(self):
+        """Test listings are paginated with cursors."""
+        response = self.client.get("/alice/followers?limit=1")
+        self.assertEqual(len(response.json()["data"]), 1)
+        response = self.client.get(response.json()["_links"]["next"]["href"])
+        self.assertEqual(response.json()["data"][0]["nick"], "carol")
+        self.assertNotIn("next", response.json()["_links"])
+
+        for params in ({"limit": 0}, {"cursor": "!"}):
+            response = self.client.get("/alice/following", params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_unknown_account(self):
+        """Test listings of unknown accounts are not found."""
+        self.assertEqual(self.client.get("/nobody/followers").status_code, 404)
+        self.assertEqual(self.client.get("/nobody/following").status_code, 404)
+
+
+class ChangeLogTest(HostingTestCase):
+    """Test cases for the change log (/changes) and its compaction."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.sign_up("alice")
+        self.vfile = self.vfiles["alice"]
+
+    def changes(self, **params):
+        response = self.client.get("/changes", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_every_change_is_logged_in_order(self):
+        """Test signup, upload, redirect, remove-redirect and delete append entries."""
+        # Given: alice uploads, redirects, removes the redirect and deletes her file
+        content = b"#+TITLE: Alice\n"
+        self.client.put(
+            "/alice/social.org",
+            content,
+            content_type="text/plain",
+            HTTP_AUTHORIZATION=f"VFile {self.vfile}",
+        )
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfile, "new-url": "https://example.org/social.org"},
+            format="json",
+        )
+        self.client.post("/remove-redirect", {"vfile": self.vfile}, format="json")
+        self.client.post("/delete", {"vfile": self.vfile}, format="json")
+
+        # When: The whole log is read
+        data = self.changes()["data"]
+
+        # Then: Every change is listed once, with increasing sequence numbers
+        self.assertEqual(
+            [change["event"] for change in data],
+            ["signup", "upload", "redirect", "remove-redirect", "delete"],
+        )
+        self.assertEqual([change["seq"] for change in data], sorted(change["seq"] for change in data))
+        self.assertEqual({change["nick"] for change in data}, {"alice"})
+        self.assertEqual(data[1]["hash"], compute_content_hash(content))
+        self.assertEqual(data[2]["url"], "https://example.org/social.org")
+        self.assertNotIn("hash", data[0])
+
+    def test_pagination_follows_sequence_numbers(self):
+        """Test after and limit page through the log and next points after the last entry."""
+        # Given: Three more signups
+        for nickname in ("bob", "carol", "dave"):
+            self.client.post("/signup", {"nick": nickname}, format="json")
+
+        # When: The log is read two entries at a time
+        first = self.changes(limit=2)
+        second = self.client.get(first["_links"]["next"]["href"]).json()
+        third = self.client.get(second["_links"]["next"]["href"]).json()
+
+        # Then: Pages continue where the previous one stopped
+        self.assertEqual([change["nick"] for change in first["data"]], ["alice", "bob"])
+        self.assertEqual([change["nick"] for change in second["data"]], ["carol", "dave"])
+        self.assertEqual(third["data"], [])
+        # An empty page keeps pointing at the same position
+        self.assertEqual(third["_links"]["next"]["href"], second["_links"]["next"]["href"])
+
+    def test_invalid_parameters(self):
+        """Test after and limit are validated."""
+        for params in ({"after": "x"}, {"after": -1}, {"limit": 0}, {"limit": 100000}):
+            # When: The log is requested with an invalid parameter
+            response = self.client.get("/changes", params)
+
+            # Then: The request is rejected
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()["type"], "Error")
+
+    def test_cleanup_is_logged(self):
+        """Test files deleted by the cleanup task are logged as cleanup."""
+        # Given: alice's file is stale
+        HostedFile.objects.filter(nickname="alice").update(
+            last_access=timezone.now() - timedelta(days=settings.FILE_TTL_DAYS + 1)
+        )
+
+        # When: The cleanup runs
+        cleanup_stale_files.call_local()
+
+        # Then: The deletion is in the log
+        data = self.changes()["data"]
+        self.assertEqual([change["event"] for change in data], ["signup", "cleanup"])
+
+    def test_compaction_keeps_latest_change_per_nickname(self):
+        """Test compaction only drops old entries superseded by a later one."""
+        # Given: Old entries for alice and bob, and a recent one for alice
+        old = timezone.now() - timedelta(days=settings.CHANGES_RETENTION_DAYS + 1)
+        for nickname in ("bob", "bob", "alice"):
+            record_change(UPLOAD, nickname, content_hash="x")
+        Change.objects.update(created_at=old)
+        record_change(UPLOAD, "alice", content_hash="y")
+
+        # When: The log is compacted in small batches
+        metrics = compact_change_log.call_local(batch_size=2)
+
+        # Then: Only the latest entry of each nickname is left
+        self.assertEqual(metrics["deleted"], 3)
+        self.assertEqual(metrics["batches"], 2)
+        data = self.changes()["data"]
+        self.assertEqual(
+            [(change["nick"], change["hash"]) for change in data],
+            [("bob", "x"), ("alice", "y")],
+        )
+
+    def test_compaction_keeps_recent_changes(self):
+        """Test entries newer than the retention window are never compacted."""
+        # Given: Several recent entries for alice
+        record_change(UPLOAD, "alice", content_hash="x")
+        record_change(UPLOAD, "alice", content_hash="y")
+
+        # When: The log is compacted
+        metrics = compact_change_log.call_local()
+
+        # Then: Nothing is deleted
+        self.assertEqual(metrics["deleted"], 0)
+        self.assertEqual(len(self.changes()["data"]), 3)
+
+
+class WebhookReceiver(BaseHTTPRequestHandler):
+    """Stand-in for a webhook subscriber: records requests, answers server.status."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append((dict(self.headers), body))
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(WEBHOOK_TOKEN="operator-token")
+class WebhookTest(TestCase):
+    """Test cases for /webhooks and the delivery of changes to webhooks."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer operator-token")
+        cache.clear()
+        local_cache.clear()
+
+        self.receiver = ThreadingHTTPServer(("127.0.0.1", 0), WebhookReceiver)
+        self.receiver.received = []
+        self.receiver.status = 200
+        threading.Thread(
+            target=self.receiver.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        ).start()
+        self.addCleanup(self.receiver.server_close)
+        self.addCleanup(self.receiver.shutdown)
+
+        # A change made before the webhook is registered is not delivered
+        record_change(SIGNUP, "before")
+        self.webhook = self.register()
+
+    def register(self, window=5):
+        response = self.client.post(
+            "/webhooks",
+            {"url": f"http://127.0.0.1:{self.receiver.server_port}/hook", "window": window},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()["data"]
+
+    def delivered(self):
+        """Nicknames of the changes received, one list per request."""
+        return [
+            [change["nick"] for change in json.loads(body)["data"]]
+            for _, body in self.receiver.received
+        ]
+
+    def test_registration_requires_token(self):
+        """Test webhooks are managed with the operator token only."""
+        # When: A webhook is registered without the token, or with a wrong one
+        anonymous = APIClient().post("/webhooks", {"url": "http://example.org"}, format="json")
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer wrong")
+        wrong = self.client.post("/webhooks", {"url": "http://example.org"}, format="json")
+
+        # Then: Both are rejected
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(wrong.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # And: Without a configured token the endpoints do not exist
+        with override_settings(WEBHOOK_TOKEN=""):
+            response = self.client.post("/webhooks", {"url": "http://example.org"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_registration_validates_parameters(self):
+        """Test url and window are validated."""
+        for data in (
+            {"url": "ftp://example.org"},
+            {"url": "http://example.org", "window": -1},
+            {"url": "http://example.org", "window": "5"},
+        ):
+            # When: A webhook is registered with an invalid parameter
+            response = self.client.post("/webhooks", data, format="json")
+
+            # Then: The request is rejected
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_changes_are_delivered_in_one_signed_batch(self):
+        """Test the changes since the last delivery are POSTed together and signed."""
+        # Given: Three changes
+        for nickname in ("alice", "bob", "carol"):
+            record_change(SIGNUP, nickname)
+
+        # When: The delivery runs, then runs again
+        first = deliver(self.webhook["id"])
+        second = deliver(self.webhook["id"])
+
+        # Then: One request carried the three changes, and nothing was left
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(self.delivered(), [["alice", "bob", "carol"]])
+
+        headers, body = self.receiver.received[0]
+        expected = hmac.new(self.webhook["secret"].encode(), body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers["X-Org-Social-Signature"], f"sha256={expected}")
+        self.assertEqual(json.loads(body)["data"][0]["event"], "signup")
+
+    @override_settings(WEBHOOK_BATCH_SIZE=2)
+    def test_large_backlogs_are_split(self):
+        """Test deliveries carry at most WEBHOOK_BATCH_SIZE changes and continue."""
+        # Given: Three changes
+        for nickname in ("alice", "bob", "carol"):
+            record_change(SIGNUP, nickname)
+
+        # When: The delivery task runs
+        deliver_webhook.call_local(self.webhook["id"])
+
+        # Then: The changes arrived in two requests
+        self.assertEqual(self.delivered(), [["alice", "bob"], ["carol"]])
+
+    def test_committed_changes_schedule_delivery_after_window(self):
+        """Test the changes of a window schedule a single delivery."""
+        # Given: Nothing is scheduled
+        scheduled = HUEY.scheduled_count()
+
+        # When: Two changes are committed
+        with self.captureOnCommitCallbacks(execute=True):
+            record_change(SIGNUP, "alice")
+        with self.captureOnCommitCallbacks(execute=True):
+            record_change(SIGNUP, "bob")
+
+        # Then: One delivery is scheduled for the end of the window
+        self.assertEqual(HUEY.scheduled_count(), scheduled + 1)
+        self.assertEqual(self.receiver.received, [])
+        HUEY.storage.flush_schedule()
+
+    def test_window_zero_delivers_on_commit(self):
+        """Test a webhook without window is delivered as soon as a change is committed."""
+        # Given: A webhook without batching window
+        webhook = self.register(window=0)
+        delete_webhook(Webhook.objects.get(id=self.webhook["id"]))
+
+        # When: A user signs up
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/signup", {"nick": "alice"}, format="json")
+
+        # Then: The signup was delivered
+        self.assertEqual(self.delivered(), [["alice"]])
+        self.assertEqual(get_state(webhook["id"])["cursor"], Change.objects.get(nickname="alice").seq)
+
+    def test_failed_delivery_backs_off(self):
+        """Test failed deliveries are retried after exponentially growing delays."""
+        # Given: The receiver fails and there is a change
+        self.receiver.status = 500
+        record_change(SIGNUP, "alice")
+
+        # When: The delivery runs
+        delay = deliver(self.webhook["id"])
+
+        # Then: It is retried after the first backoff delay
+        self.assertEqual(delay, settings.WEBHOOK_BACKOFF_BASE)
+        state = get_state(self.webhook["id"])
+        self.assertEqual(state["attempts"], 1)
+
+        # And: Deliveries triggered before the retry is due send nothing
+        self.assertIsNone(deliver(self.webhook["id"]))
+        self.assertEqual(len(self.receiver.received), 1)
+
+        # When: The retry is due and fails again
+        state["retry_at"] = 0
+        set_state(self.webhook["id"], state)
+        delay = deliver(self.webhook["id"])
+
+        # Then: The delay doubled
+        self.assertEqual(delay, settings.WEBHOOK_BACKOFF_BASE * 2)
+        self.assertEqual(len(self.receiver.received), 2)
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=2, WEBHOOK_BACKOFF_BASE=0)
+    def test_dead_letters_after_max_attempts(self):
+        """Test a batch that keeps failing is dead-lettered and delivery moves on."""
+        # Given: The receiver fails and there is a change
+        self.receiver.status = 503
+        record_change(SIGNUP, "alice")
+
+        # When: Every attempt fails
+        deliver(self.webhook["id"])
+        deliver(self.webhook["id"])
+
+        # Then: The batch is dead-lettered
+        response = self.client.get(f"/webhooks/{self.webhook['id']}")
+        data = response.json()["data"]
+        seq = Change.objects.get(nickname="alice").seq
+        self.assertEqual(data["delivered"], seq)
+        self.assertEqual(data["failed-attempts"], 0)
+        self.assertEqual(len(data["dead-letters"]), 1)
+        self.assertEqual(data["dead-letters"][0]["first-seq"], seq)
+        self.assertEqual(data["dead-letters"][0]["error"], "HTTP 503")
+
+        # And: Later changes are delivered once the receiver recovers
+        self.receiver.status = 200
+        record_change(SIGNUP, "bob")
+        deliver(self.webhook["id"])
+        self.assertEqual(self.delivered()[-1], ["bob"])
+
+    def test_unreachable_receiver_is_a_failure(self):
+        """Test connection errors are retried like error responses."""
+        # Given: A webhook whose receiver is gone
+        Webhook.objects.filter(id=self.webhook["id"]).update(url="http://127.0.0.1:1/hook")
+        record_change(SIGNUP, "alice")
+
+        # When: The delivery runs
+        delay = deliver(self.webhook["id"])
+
+        # Then: It is retried later
+        self.assertEqual(delay, settings.WEBHOOK_BACKOFF_BASE)
+
+    @override_settings(WEBHOOK_MAX_CONCURRENCY=1)
+    def test_concurrency_is_bounded(self):
+        """Test deliveries wait while every slot, or their webhook, is busy."""
+        # Given: A pending change and the only delivery slot taken
+        record_change(SIGNUP, "alice")
+        cache.add(SLOT_KEY_PREFIX + "0", 1)
+
+        # When: The delivery runs
+        delay = deliver(self.webhook["id"])
+
+        # Then: Nothing is sent and it is tried again shortly
+        self.assertEqual(delay, BUSY_DELAY)
+        self.assertEqual(self.receiver.received, [])
+
+        # Given: A delivery of the same webhook in flight
+        cache.delete(SLOT_KEY_PREFIX + "0")
+        cache.add(LOCK_KEY_PREFIX + str(self.webhook["id"]), 1)
+
+        # Then: The delivery waits for it too
+        self.assertEqual(deliver(self.webhook["id"]), BUSY_DELAY)
+        self.assertEqual(self.receiver.received, [])
+
+    def test_lost_state_resumes_from_latest_change(self):
+        """Test a webhook whose state was lost is not sent the whole log again."""
+        # Given: Changes, then the delivery state is lost
+        record_change(SIGNUP, "alice")
+        cache.delete(STATE_KEY_PREFIX + str(self.webhook["id"]))
+
+        # When: A new change is delivered
+        record_change(SIGNUP, "bob")
+        self.assertEqual(get_state(self.webhook["id"])["cursor"], get_last_seq())
+        record_change(SIGNUP, "carol")
+        deliver(self.webhook["id"])
+
+        # Then: Only the changes after the state was restored are sent
+        self.assertEqual(self.delivered(), [["carol"]])
+
+    def test_delete_webhook(self):
+        """Test unregistered webhooks receive nothing."""
+        # When: The webhook is deleted
+        response = self.client.delete(f"/webhooks/{self.webhook['id']}")
+        record_change(SIGNUP, "alice")
+
+        # Then: Nothing is delivered and it is gone
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(deliver(self.webhook["id"]))
+        self.assertEqual(self.receiver.received, [])
+        self.assertEqual(get_webhooks(), [])
+        response = self.client.get(f"/webhooks/{self.webhook['id']}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AccessTrackingTest(TestCase):
+    """Test cases for buffered last_access tracking."""
+
+    def setUp(self):
+        self.old_access = timezone.now() - timedelta(days=10)
+        self.hosted_files = []
+        for nickname in ["alice", "bob", "charlie"]:
+            token_data = generate_vfile_token(nickname)
+            self.hosted_files.append(
+                HostedFile.objects.create(
+                    nickname=nickname,
+                    vfile_token=token_data["token"],
+                    vfile_timestamp=token_data["timestamp"],
+                    vfile_signature=token_data["signature"],
+                    file_content="#+TITLE: Test\n",
+                    last_access=self.old_access,
+                )
+            )
+
+    def test_apply_access_times_bulk_updates(self):
+        """Test buffered access times are written in one bulk update per batch."""
+        # Given: Buffered accesses for two users and an unknown nickname
+        now = timezone.now()
+        access_times = {"alice": now, "bob": now, "ghost": now}
+
+        # When: We apply them
+        # Then: One query loads the rows and one bulk update writes them
+        with self.assertNumQueries(2):
+            updated = apply_access_times(access_times)
+
+        self.assertEqual(updated, 2)
+        self.assertEqual(HostedFile.objects.get(nickname="alice").last_access, now)
+        self.assertEqual(HostedFile.objects.get(nickname="bob").last_access, now)
+        self.assertEqual(
+            HostedFile.objects.get(nickname="charlie").last_access, self.old_access
+        )
+
+    def test_apply_access_times_never_moves_back(self):
+        """Test an older buffered time does not overwrite a newer one."""
+        # Given: A buffered time older than the stored one
+        older = self.old_access - timedelta(days=1)
+
+        # When: We apply it
+        updated = apply_access_times({"alice": older})
+
+        # Then: The stored time is unchanged
+        self.assertEqual(updated, 0)
+        self.assertEqual(
+            HostedFile.objects.get(nickname="alice").last_access, self.old_access
+        )
+
+    def test_serve_file_records_access(self):
+        """Test serving a file refreshes last_access."""
+        # Given: A file accessed long ago
+        cache.clear()
+        local_cache.clear()
+
+        # When: We serve the file
+        APIClient().get("/alice/social.org")
+
+        # Then: last_access is recent
+        hosted_file = HostedFile.objects.get(nickname="alice")
+        self.assertGreater(hosted_file.last_access, self.old_access)
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis client behind the cache: hashes and pub/sub."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.subscribers = {}  # channel -> list of pub/sub connections
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        self.hashes.setdefault(key, {}).update(
+            {str(name).encode(): str(value).encode() for name, value in fields.items()}
+        )
+        return len(fields)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def delete(self, *keys):
+        return sum(self.hashes.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def publish(self, channel, message):
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        subscribers = self.subscribers.get(channel, [])
+        for pubsub in subscribers:
+            pubsub.deliver({"type": "message", "channel": channel.encode(), "data": message})
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+    def wait_for_subscriber(self, channel):
+        for _ in range(500):
+            if self.subscribers.get(channel):
+                return
+            time.sleep(0.01)
+        raise AssertionError(f"Nothing subscribed to {channel}")
+
+    def close(self):
+        """End every listener."""
+        for subscribers in self.subscribers.values():
+            for pubsub in subscribers:
+                pubsub.deliver(None)
+
+
+class FakePipeline:
+    """Queues commands of a FakeRedis and runs them on execute()."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue_command(*args, **kwargs):
+            self.commands.append((getattr(self.client, name), args, kwargs))
+            return self
+
+        return queue_command
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class FakePubSub:
+    """A blocking pub/sub connection of a FakeRedis."""
+
+    def __init__(self, client):
+        self.client = client
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        self.client.subscribers.setdefault(channel, []).append(self)
+
+    def deliver(self, message):
+        self.messages.put(message)
+
+    def listen(self):
+        while True:
+            message = self.messages.get()
+            if message is None:
+                # Ends the listener thread without a traceback
+                raise SystemExit
+            yield message
+
+
+class FakeAsyncRedis:
+    """redis.asyncio client over a FakeRedis, for the /events listener."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakeAsyncPubSub(self.client)
+
+    async def aclose(self):
+        pass
+
+
+class FakeAsyncPubSub:
+    """An asyncio pub/sub connection of a FakeRedis."""
+
+    def __init__(self, client):
+        self.client = client
+        self.loop = asyncio.get_running_loop()
+        self.messages = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for subscribers in self.client.subscribers.values():
+            if self in subscribers:
+                subscribers.remove(self)
+
+    async def subscribe(self, channel):
+        self.client.subscribers.setdefault(channel, []).append(self)
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self.messages.put_nowait, message)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+
+class RedisTest(TestCase):
+    """Test cases for the paths taken when the cache is Redis."""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.redis = FakeRedis()
+        self.addCleanup(self.redis.close)
+
+        # Every module sees the fake client; the invalidation listener is
+        # started by the tests that need it
+        for module in (access_module, cache_module, events_module):
+            patcher = mock.patch.object(module, "get_redis_client", return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(cache_module, "_listener_started", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.old_access = timezone.now() - timedelta(days=10)
+        for nickname in ["alice", "bob"]:
+            token_data = generate_vfile_token(nickname)
+            HostedFile.objects.create(
+                nickname=nickname,
+                vfile_token=token_data["token"],
+                vfile_timestamp=token_data["timestamp"],
+                vfile_signature=token_data["signature"],
+                file_content="#+TITLE: Test\n",
+                last_access=self.old_access,
+            )
+
+    def subscribe(self, channel):
+        pubsub = self.redis.pubsub()
+        pubsub.subscribe(channel)
+        return pubsub
+
+    def test_accesses_are_buffered_and_drained(self):
+        """Test reads buffer their access time in Redis until it is flushed."""
+        # When: alice's file is served and both files are bulk-fetched
+        APIClient().get("/alice/social.org")
+        record_accesses(["alice", "bob"])
+
+        # Then: The times are buffered, not written
+        self.assertEqual(set(self.redis.hgetall(ACCESS_BUFFER_KEY)), {b"alice", b"bob"})
+        self.assertEqual(HostedFile.objects.get(nickname="alice").last_access, self.old_access)
+
+        # When: The buffer is flushed
+        updated = flush_access_times.call_local()
+
+        # Then: The rows are updated and the buffer is empty
+        self.assertEqual(updated, 2)
+        self.assertGreater(HostedFile.objects.get(nickname="alice").last_access, self.old_access)
+        self.assertGreater(HostedFile.objects.get(nickname="bob").last_access, self.old_access)
+        self.assertEqual(drain_access_buffer(), {})
+
+    def test_invalidations_reach_other_processes(self):
+        """Test the invalidation listener evicts the local entries published by writers."""
+        # Given: The listener of this process is running
+        thread = threading.Thread(
+            target=cache_module._listen_for_invalidations, args=(self.redis,), daemon=True
+        )
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(self.redis.close)
+        self.redis.wait_for_subscriber(INVALIDATION_CHANNEL)
+
+        # Given: Both files are in the local tier
+        get_file("alice")
+        get_file("bob")
+
+        # When: Another process publishes an invalidation of alice
+        self.redis.publish(INVALIDATION_CHANNEL, "alice")
+
+        # Then: Only alice is evicted
+        for _ in range(500):
+            if local_cache.get(cache_module._meta_key("alice")) is None:
+                break
+            time.sleep(0.01)
+        self.assertIsNone(local_cache.get(cache_module._meta_key("alice")))
+        self.assertIsNotNone(local_cache.get(cache_module._meta_key("bob")))
+
+    async def test_changes_reach_event_streams(self):
+        """Test the /events listener dispatches the changes published on Redis."""
+        # Given: A stream following alice, whose process listens on Redis
+        change_broker = ChangeBroker()
+        with mock.patch("redis.asyncio.from_url", return_value=FakeAsyncRedis(self.redis)), (
+            mock.patch.dict(settings.CACHES["default"], LOCATION="redis://redis:6379/1")
+        ):
+            subscription = change_broker.subscribe(["alice"])
+            for _ in range(500):
+                if self.redis.subscribers.get(CHANGES_CHANNEL):
+                    break
+                await asyncio.sleep(0.01)
+
+        # When: Changes are published, with a malformed message among them
+        with self.assertLogs("app.hosting.events", "WARNING"):
+            publish_change("delete", "bob")
+            self.redis.publish(CHANGES_CHANNEL, "not json")
+            publish_change("redirect", "alice", location="https://example.org/social.org")
+            message = await subscription.get(5)
+
+        # Then: The stream gets alice's change only
+        self.assertEqual(
+            message,
+            {"event": "redirect", "nick": "alice", "location": "https://example.org/social.org"},
+        )
+        change_broker._listener.cancel()
+
+    def test_cleanup_dry_run_applies_buffered_accesses(self):
+        """Test a dry run does not count files read since the last flush as stale."""
+        # Given: Both files are stale, but alice was read and the access is only buffered
+        stale_access = timezone.now() - timedelta(days=settings.FILE_TTL_DAYS + 1)
+        HostedFile.objects.update(last_access=stale_access)
+        record_accesses(["alice"])
+
+        # When: The cleanup runs in dry-run mode
+        metrics = cleanup_stale_files.call_local(dry_run=True)
+
+        # Then: Only bob would be deleted, and nothing is
+        self.assertEqual(metrics["scanned"], 1)
+        self.assertEqual(HostedFile.objects.count(), 2)
+
+    def test_cleanup_applies_buffered_accesses_and_publishes(self):
+        """Test the cleanup keeps files read since the last flush and notifies other processes."""
+        # Given: Both files are stale, but alice was read and the access is only buffered
+        stale_access = timezone.now() - timedelta(days=settings.FILE_TTL_DAYS + 1)
+        HostedFile.objects.update(last_access=stale_access)
+        record_accesses(["alice"])
+        invalidations = self.subscribe(INVALIDATION_CHANNEL)
+        changes = self.subscribe(CHANGES_CHANNEL)
+
+        # When: The cleanup runs
+        metrics = cleanup_stale_files.call_local()
+
+        # Then: Only bob is deleted
+        self.assertEqual(metrics["deleted"], 1)
+        self.assertEqual(list(HostedFile.objects.values_list("nickname", flat=True)), ["alice"])
+        self.assertIsNone(cache.get(CLEANUP_CHECKPOINT_KEY))
+
+        # Then: Other processes are told to drop bob and end its streams
+        self.assertEqual(invalidations.messages.get_nowait()["data"], b"bob")
+        self.assertEqual(
+            json.loads(changes.messages.get_nowait()["data"]), {"event": "delete", "nick": "bob"}
+        )
+
+
+class CleanupTaskTest(TestCase):
+    """Test cases for the stale file cleanup task."""
+
+    def setUp(self):
+        cache.clear()
+        stale_access = timezone.now() - timedelta(days=settings.FILE_TTL_DAYS + 1)
+
+        # Create five stale users (oldest first) and one active user
+        self.stale = []
+        for index in range(5):
+            self.stale.append(
+                self.create_file(f"stale{index}", stale_access + timedelta(minutes=index))
+            )
+        self.active = self.create_file("active", timezone.now())
+
+    def create_file(self, nickname, last_access):
+        token_data = generate_vfile_token(nickname)
+        hosted_file = HostedFile.objects.create(
+            nickname=nickname,
+            vfile_token=token_data["token"],
+            vfile_timestamp=token_data["timestamp"],
+            vfile_signature=token_data["signature"],
+            file_content="#+TITLE: Test\n",
+            last_access=last_access,
+        )
+        CompressedVariant.objects.create(
+            hosted_file=hosted_file,
+            encoding="gzip",
+            content_hash=hosted_file.content_hash,
+            size=1,
+            data=b"x",
+        )
+        return hosted_file
+
+    def test_cleanup_deletes_in_batches(self):
+        """Test stale files and their variants are deleted in batches."""
+        # When: The cleanup runs with batches of two
+        with CaptureQueriesContext(connection) as queries:
+            metrics = cleanup_stale_files.call_local(batch_size=2)
+
+        # Then: All stale files are deleted in three batches
+        self.assertEqual(metrics["scanned"], 5)
+        self.assertEqual(metrics["deleted"], 5)
+        self.assertEqual(metrics["batches"], 3)
+        self.assertFalse(metrics["resumed"])
+        self.assertEqual(list(HostedFile.objects.values_list("nickname", flat=True)), ["active"])
+        self.assertEqual(CompressedVariant.objects.count(), 1)
+
+        # Then: File bodies were never loaded
+        self.assertFalse(any("file_content" in query["sql"] for query in queries))
+
+        # Then: The checkpoint is cleared once the run completes
+        self.assertIsNone(cache.get(CLEANUP_CHECKPOINT_KEY))
+
+    def test_cleanup_dry_run(self):
+        """Test a dry run reports stale files without deleting them."""
+        # When: The cleanup runs in dry-run mode
+        metrics = cleanup_stale_files.call_local(dry_run=True)
+
+        # Then: Nothing is deleted
+        self.assertTrue(metrics["dry_run"])
+        self.assertEqual(metrics["scanned"], 5)
+        self.assertEqual(metrics["deleted"], 0)
+        self.assertEqual(HostedFile.objects.count(), 6)
+
+    def test_cleanup_resumes_from_checkpoint(self):
+        """Test an interrupted run resumes after its checkpoint."""
+        # Given: A checkpoint left after the first two stale files
+        checkpoint_file = self.stale[1]
+        cache.set(
+            CLEANUP_CHECKPOINT_KEY,
+            {"last_access": checkpoint_file.last_access, "id": checkpoint_file.id},
+        )
+
+        # When: The cleanup runs
+        metrics = cleanup_stale_files.call_local()
+
+        # Then: Only the files after the checkpoint are processed
+        self.assertTrue(metrics["resumed"])
+        self.assertEqual(metrics["deleted"], 3)
+        self.assertTrue(HostedFile.objects.filter(nickname="stale0").exists())
+        self.assertFalse(HostedFile.objects.filter(nickname="stale4").exists())
+
+    def test_cleanup_checkpoint_stops_at_failed_batch(self):
+        """Test a failed batch is counted and the checkpoint never moves past it."""
+        delete_stale_batch = tasks_module._delete_stale_batch
+        checkpoints = []
+
+        def fail_second_batch(batch, cutoff_date):
+            checkpoints.append(cache.get(CLEANUP_CHECKPOINT_KEY))
+            if len(checkpoints) == 2:
+                raise RuntimeError("database went away")
+            return delete_stale_batch(batch, cutoff_date)
+
+        # When: The cleanup runs with batches of two and the second batch fails
+        with mock.patch.object(tasks_module, "_delete_stale_batch", fail_second_batch):
+            with self.assertLogs("app.hosting.tasks", "ERROR"):
+                metrics = cleanup_stale_files.call_local(batch_size=2)
+
+        # Then: The failed files are counted and kept
+        self.assertEqual(metrics["deleted"], 3)
+        self.assertEqual(metrics["failed"], 2)
+        self.assertEqual(
+            sorted(HostedFile.objects.values_list("nickname", flat=True)),
+            ["active", "stale2", "stale3"],
+        )
+
+        # Then: Once it failed, a resumed run would still start before it
+        first_batch_end = {"last_access": self.stale[1].last_access, "id": self.stale[1].id}
+        self.assertEqual(checkpoints, [None, first_batch_end, first_batch_end])
+
+    @override_settings(ENABLE_CLEANUP=False)
+    def test_cleanup_disabled(self):
+        """Test nothing happens when cleanup is disabled."""
+        # When: The cleanup runs while disabled
+        metrics = cleanup_stale_files.call_local()
+
+        # Then: Nothing is deleted
+        self.assertIsNone(metrics)
+        self.assertEqual(HostedFile.objects.count(), 6)
+
+
+class VFileAuthenticationTest(TestCase):
+    """Test cases for the shared vfile authentication."""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        verified_vfiles.clear()
+        self.client = APIClient()
+
+        self.nickname = "test_user"
+        token_data = generate_vfile_token(self.nickname)
+        self.vfile = build_vfile_url(
+            token_data["token"],
+            token_data["timestamp"],
+            token_data["signature"],
+        )
+        self.hosted_file = HostedFile.objects.create(
+            nickname=self.nickname,
+            vfile_token=token_data["token"],
+            vfile_timestamp=token_data["timestamp"],
+            vfile_signature=token_data["signature"],
+            file_content="#+TITLE: Test\n",
+        )
+
+    def upload(self, content=b"#+TITLE: Updated\n"):
+        file = BytesIO(content)
+        file.name = "social.org"
+        return self.client.post(
+            "/upload",
+            {"vfile": self.vfile, "file": file},
+            format="multipart",
+        )
+
+    def test_verified_vfile_is_cached(self):
+        """Test repeated requests do not look the token up again."""
+        # Given: A vfile that has already been used once
+        self.assertEqual(self.upload().status_code, status.HTTP_200_OK)
+
+        # When: The same vfile is used again
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload()
+
+        # Then: The token is not looked up in the database
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token_queries = [q for q in queries if '"vfile_token" = ' in q["sql"]]
+        self.assertEqual(token_queries, [])
+
+    def test_lookup_does_not_load_file_content(self):
+        """Test authentication reads only the columns it needs."""
+        # When: An upload is authenticated for the first time
+        with CaptureQueriesContext(connection) as queries:
+            self.upload()
+
+        # Then: The token lookup does not read the file content
+        token_queries = [q["sql"] for q in queries if '"vfile_token" = ' in q["sql"]]
+        self.assertEqual(len(token_queries), 1)
+        self.assertNotIn("file_content", token_queries[0])
+
+    def test_redirect_state_is_not_cached(self):
+        """Test a cached vfile sees a redirect configured afterwards."""
+        # Given: A cached vfile
+        self.upload()
+
+        # When: A redirect is configured and a new upload is attempted
+        self.client.post(
+            "/redirect",
+            {"vfile": self.vfile, "new-url": "https://other.org/social.org"},
+            format="json",
+        )
+        response = self.upload()
+
+        # Then: The upload is rejected
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("redirect", response.json()["errors"][0].lower())
+
+    def test_deleted_account_is_unauthorized(self):
+        """Test a cached vfile stops working once the account is deleted."""
+        # Given: A cached vfile
+        self.upload()
+
+        # When: The account is deleted and the vfile used again
+        self.client.post("/delete", {"vfile": self.vfile}, format="json")
+        response = self.upload()
+
+        # Then: The vfile is rejected
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()["type"], "Error")
+        self.assertEqual(response.json()["errors"], ["Invalid vfile token"])
+
+        # And: Deleting again reports the account as not found
+        response = self.client.post("/delete", {"vfile": self.vfile}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json()["errors"], ["File not found"])
+
+    def test_unknown_token_is_unauthorized(self):
+        """Test a well-formed token no account has gets 401 outside of delete."""
+        # Given: A well-formed vfile for an account that does not exist
+        token_data = generate_vfile_token("nobody")
+        vfile = build_vfile_url(
+            token_data["token"],
+            token_data["timestamp"],
+            token_data["signature"],
+        )
+
+        # When: It is used to redirect and to remove a redirect
+        redirect = self.client.post(
+            "/redirect",
+            {"vfile": vfile, "new-url": "https://other.org/social.org"},
+            format="json",
+        )
+        remove = self.client.post("/remove-redirect", {"vfile": vfile}, format="json")
+
+        # Then: Both are rejected as unauthenticated
+        for response in (redirect, remove):
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(response.json()["errors"], ["Invalid vfile token"])
+
+    def test_invalid_signature(self):
+        """Test a vfile with a forged signature is rejected and not cached."""
+        # Given: The right token with a wrong signature
+        forged = build_vfile_url(self.hosted_file.vfile_token, 123, "bad")
+
+        # When: It is used to upload
+        file = BytesIO(b"#+TITLE: Forged\n")
+        file.name = "social.org"
+        response = self.client.post(
+            "/upload", {"vfile": forged, "file": file}, format="multipart"
+        )
+
+        # Then: It is rejected
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()["errors"], ["Invalid vfile signature"])
+        self.assertEqual(len(verified_vfiles), 0)
+
+
+class UtilsTest(TestCase):
+    """Test cases for utility functions."""
+
+    def test_generate_vfile_token(self):
+        """Test generate_vfile_token creates valid token."""
+        # Given: A nickname
+        nickname = "test_user"
+
+        # When: We generate a token
+        token_data = generate_vfile_token(nickname)
+
+        # Then: Token should have required fields
+        self.assertIn("token", token_data)
+        self.assertIn("timestamp", token_data)
+        self.assertIn("signature", token_data)
+
+        # Then: Token should be 64 hex characters (256 bits)
+        self.assertEqual(len(token_data["token"]), 64)
+
+        # Then: Timestamp should be an integer
+        self.assertIsInstance(token_data["timestamp"], int)
+
+        # Then: Signature should be a hex string
+        self.assertTrue(all(c in "0123456789abcdef" for c in token_data["signature"]))
+
+    def test_validate_nickname_valid(self):
+        """Test validate_nickname accepts valid nicknames."""
+        # Given: Valid nicknames
+        valid_nicknames = [
+            "user123",
+            "test_user",
+            "user-name",
+            "ABC",
+            "a_b_c",
+        ]
+
+        # When/Then: All should be valid
+        for nickname in valid_nicknames:
+            is_valid, error = validate_nickname(nickname)
+            self.assertTrue(is_valid, f"{nickname} should be valid: {error}")
+            self.assertEqual(error, "")
+
+    def test_validate_nickname_invalid(self):
+        """Test validate_nickname rejects invalid nicknames."""
+        # Given: Invalid nicknames
+        invalid_cases = [
+            ("", "Nickname is required"),
+            ("ab", "at least 3 characters"),
+            ("a" * 51, "at most 50 characters"),
+            ("user@name", "letters, numbers"),
+            ("user name", "letters, numbers"),
+        ]
+
+        # When/Then: All should be invalid
+        for nickname, expected_error in invalid_cases:
+            is_valid, error = validate_nickname(nickname)
+            self.assertFalse(is_valid, f"{nickname} should be invalid")
+            self.assertIn(expected_error.lower(), error.lower())
+
+    def test_sign_vfile(self):
+        """Test sign_vfile matches an HMAC-SHA256 keyed with SECRET_KEY."""
+        # Given: The parts of a vfile
+        import hashlib
+        import hmac
+
+        expected = hmac.new(
+            settings.SECRET_KEY.encode(),
+            b"token:123:test_user",
+            hashlib.sha256,
+        ).hexdigest()
+
+        # When/Then: The signature matches and verifies
+        self.assertEqual(sign_vfile("token", 123, "test_user"), expected)
+        self.assertTrue(verify_vfile_token("token", 123, expected, "test_user"))
+        self.assertFalse(verify_vfile_token("token", 123, expected, "other_user"))
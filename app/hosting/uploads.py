@@ -0,0 +1,67 @@
+"""
+Reading of uploaded social.org files.
+
+Uploads are consumed chunk by chunk: the size limit is enforced as bytes
+arrive, UTF-8 is validated incrementally and the content is hashed on the
+fly, so a file is never decoded or hashed a second time.
+"""
+
+import codecs
+import hashlib
+
+# Bytes read from the request body at a time
+CHUNK_SIZE = 64 * 1024
+
+
+class FileTooLarge(Exception):
+    """The upload is larger than MAX_FILE_SIZE."""
+
+
+def iter_stream(stream, chunk_size: int = CHUNK_SIZE):
+    """
+    Iterate over a file-like object in chunks.
+
+    Args:
+        stream: Object with a read(size) method, or None for an empty body
+        chunk_size: Maximum bytes per chunk
+    """
+    if stream is None:
+        return
+    while chunk := stream.read(chunk_size):
+        yield chunk
+
+
+def read_upload(chunks, max_size: int, pending=None) -> tuple[str, str, int]:
+    """
+    Read an uploaded file from an iterable of byte chunks.
+
+    Args:
+        chunks: Iterable of bytes
+        max_size: Maximum size in bytes
+        pending: Optional storage.PendingFile each chunk is written to
+
+    Returns:
+        Tuple of (file_content, content_hash, content_size)
+
+    Raises:
+        FileTooLarge: If the upload exceeds max_size
+        UnicodeDecodeError: If the upload is not valid UTF-8
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    digest = hashlib.sha256()
+    parts = []
+    size = 0
+
+    for chunk in chunks:
+        size += len(chunk)
+        if size > max_size:
+            raise FileTooLarge()
+
+        parts.append(decoder.decode(chunk))
+        digest.update(chunk)
+        if pending is not None:
+            pending.write(chunk)
+
+    # Fails on a truncated multi-byte sequence at the end
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), digest.hexdigest(), size
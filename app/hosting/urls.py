@@ -13,5 +13,18 @@ urlpatterns = [
     path("redirect", views.redirect_view, name="redirect"),
     path("remove-redirect", views.remove_redirect_view, name="remove-redirect"),
     path("public-routes", views.public_routes_view, name="public-routes"),
-    path("<str:nickname>/social.org", views.serve_file_view, name="serve-file"),
+    path("bulk-fetch", views.bulk_fetch_view, name="bulk-fetch"),
+    path("events", views.events_view, name="events"),
+    path("changes", views.changes_view, name="changes"),
+    path("webhooks", views.webhooks_view, name="webhooks"),
+    path("webhooks/<int:webhook_id>", views.webhook_view, name="webhook"),
+    path("timeline", views.timeline_view, name="timeline"),
+    path("search", views.search_view, name="search"),
+    path("tags/<str:tag>", views.tag_posts_view, name="tag-posts"),
+    path("<str:nickname>/social.org", views.file_view, name="serve-file"),
+    path("<str:nickname>/posts", views.posts_view, name="posts"),
+    path("<str:nickname>/mentions", views.mentions_view, name="mentions"),
+    path("<str:nickname>/followers", views.followers_view, name="followers"),
+    path("<str:nickname>/following", views.following_view, name="following"),
+    path("<str:nickname>/replies/<str:post_id>", views.replies_view, name="replies"),
 ]
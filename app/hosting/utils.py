@@ -6,11 +6,37 @@ import hashlib
 import hmac
 import secrets
 import time
+from functools import lru_cache
 from urllib.parse import urlencode
 
 from django.conf import settings
 
 
+@lru_cache(maxsize=1)
+def _keyed_hmac(secret_key: str):
+    """Return an HMAC-SHA256 object already keyed with secret_key."""
+    return hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
+
+
+def sign_vfile(token: str, timestamp: int, nickname: str) -> str:
+    """
+    Compute the signature of a vfile: HMAC-SHA256 of token:timestamp:nickname.
+
+    The HMAC is keyed with SECRET_KEY once and copied for each signature.
+
+    Args:
+        token: Random token
+        timestamp: Unix timestamp
+        nickname: User's nickname
+
+    Returns:
+        Hex digest signature
+    """
+    signer = _keyed_hmac(settings.SECRET_KEY).copy()
+    signer.update(f"{token}:{timestamp}:{nickname}".encode())
+    return signer.hexdigest()
+
+
 def generate_vfile_token(nickname: str) -> dict:
     """
     Generate a secure vfile token for a user.
@@ -28,12 +54,7 @@ def generate_vfile_token(nickname: str) -> dict:
     timestamp = int(time.time())
 
     # Generate signature: HMAC-SHA256 of token:timestamp:nickname
-    message = f"{token}:{timestamp}:{nickname}"
-    signature = hmac.new(
-        settings.SECRET_KEY.encode(),
-        message.encode(),
-        hashlib.sha256,
-    ).hexdigest()
+    signature = sign_vfile(token, timestamp, nickname)
 
     return {
         "token": token,
@@ -56,40 +77,48 @@ def verify_vfile_token(token: str, timestamp: int, signature: str, nickname: str
         True if token is valid, False otherwise
     """
     # Regenerate signature
-    message = f"{token}:{timestamp}:{nickname}"
-    expected_signature = hmac.new(
-        settings.SECRET_KEY.encode(),
-        message.encode(),
-        hashlib.sha256,
-    ).hexdigest()
+    expected_signature = sign_vfile(token, timestamp, nickname)
 
     # Compare signatures (constant time to prevent timing attacks)
     return hmac.compare_digest(signature, expected_signature)
 
 
-def build_vfile_url(token: str, timestamp: int, signature: str, request=None) -> str:
+def get_scheme(request=None) -> str:
     """
-    Build a complete vfile URL from components.
+    Return the scheme used in URLs returned to clients.
 
     Args:
-        token: Random token
-        timestamp: Unix timestamp
-        signature: HMAC signature
-        request: Optional Django request object to detect scheme
+        request: Optional Django request object
 
     Returns:
-        Complete vfile URL
+        "https" or "http"
     """
     # Detect scheme:
     # 1. If request is secure (X-Forwarded-Proto: https), use https
     # 2. If SITE_DOMAIN is not localhost, assume https (production)
     # 3. Otherwise use http (development)
     if request and request.is_secure():
-        scheme = "https"
+        return "https"
     elif not settings.SITE_DOMAIN.startswith("localhost"):
-        scheme = "https"
+        return "https"
     else:
-        scheme = "http"
+        return "http"
+
+
+def build_vfile_url(token: str, timestamp: int, signature: str, request=None) -> str:
+    """
+    Build a complete vfile URL from components.
+
+    Args:
+        token: Random token
+        timestamp: Unix timestamp
+        signature: HMAC signature
+        request: Optional Django request object to detect scheme
+
+    Returns:
+        Complete vfile URL
+    """
+    scheme = get_scheme(request)
 
     base_url = f"{scheme}://{settings.SITE_DOMAIN}/vfile"
     params = {
@@ -100,6 +129,22 @@ def build_vfile_url(token: str, timestamp: int, signature: str, request=None) ->
     return f"{base_url}?{urlencode(params)}"
 
 
+def build_public_url(nickname: str, request=None) -> str:
+    """
+    Build the public URL of a nickname's social.org file.
+
+    Args:
+        nickname: User's nickname
+        request: Optional Django request object to detect scheme
+
+    Returns:
+        Public URL with correct scheme (http/https)
+    """
+    scheme = get_scheme(request)
+
+    return f"{scheme}://{settings.SITE_DOMAIN}/{nickname}/social.org"
+
+
 def parse_vfile_url(vfile_url: str) -> dict:
     """
     Parse a vfile URL into its components.
@@ -125,6 +170,19 @@ def parse_vfile_url(vfile_url: str) -> dict:
         return None
 
 
+def compute_content_hash(content: bytes) -> str:
+    """
+    Compute the hash used as the strong ETag of a file.
+
+    Args:
+        content: File content encoded as UTF-8
+
+    Returns:
+        SHA-256 hex digest
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
 def validate_nickname(nickname: str) -> tuple[bool, str]:
     """
     Validate a nickname meets requirements.
@@ -149,3 +207,19 @@ def validate_nickname(nickname: str) -> tuple[bool, str]:
         return False, "Nickname can only contain letters, numbers, hyphens, and underscores"
 
     return True, ""
+
+
+def get_redis_client():
+    """
+    Return the raw Redis client behind the default cache.
+
+    Returns:
+        redis.Redis instance, or None if the cache backend is not Redis
+        (e.g. the in-memory backend used by the test suite)
+    """
+    if not settings.CACHES["default"]["BACKEND"].startswith("django_redis."):
+        return None
+
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
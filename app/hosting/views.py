@@ -2,21 +2,91 @@
 Views for Org Social Host application.
 """
 
+import json
+import re
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+from urllib.parse import urlencode
+
 from django.conf import settings
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 from rest_framework import status
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view, authentication_classes, parser_classes
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
 
-from .models import HostedFile
+from .access import record_access, record_accesses
+from .authentication import (
+    VFileAuthentication,
+    VFileDeleteAuthentication,
+    VFileHeaderAuthentication,
+    WebhookTokenAuthentication,
+)
+from .cache import get_file, get_file_content, get_files, get_files_content, invalidate_file
+from .changes import (
+    DELETE,
+    REDIRECT,
+    REMOVE_REDIRECT,
+    SIGNUP,
+    UPLOAD,
+    get_changes,
+    record_change,
+    serialize_change,
+)
+from .compression import get_stored_variant, negotiate_encoding
+from .directory import (
+    decode_cursor,
+    encode_cursor,
+    get_directory_version,
+    get_page,
+    get_snapshot,
+    invalidate_directory,
+    public_nicknames,
+    set_snapshot,
+)
+from .events import broker, publish_change, stream_events
+from .feeds import (
+    TIMELINE_FIELDS,
+    decode_post_cursor,
+    filter_posts,
+    get_posts_page,
+    get_timeline_version,
+    invalidate_timeline,
+    mentioning_posts,
+    replying_posts,
+    serialize_post,
+    timeline_posts,
+)
+from .follows import (
+    get_followers_page,
+    get_following_page,
+    get_follows_version,
+    invalidate_follows,
+    remove_follows,
+    restore_follows,
+)
+from .models import HostedFile, Post, Webhook
+from .patch import PatchError, apply_unified_diff
+from .posts import parse_timestamp, posts_since, resolve_since
+from .search import search_posts
+from .storage import GZIP_FILE_NAME, PendingFile, get_file_path, remove_file, sync_file
+from .tasks import enqueue_artifacts
+from .uploads import FileTooLarge, iter_stream, read_upload
 from .utils import (
+    build_public_url,
     build_vfile_url,
+    compute_content_hash,
     generate_vfile_token,
-    parse_vfile_url,
+    get_scheme,
     validate_nickname,
-    verify_vfile_token,
 )
+from .webhooks import create_webhook, delete_webhook, get_state
 
 
 @api_view(["GET"])
@@ -63,6 +133,41 @@ def root_view(request):
                     "method": "GET",
                     "description": "List all public social.org files hosted on the server",
                 },
+                "timeline": {
+                    "href": "/timeline",
+                    "method": "GET",
+                    "description": "List the posts of every public file, newest first",
+                },
+                "search": {
+                    "href": "/search?q={query}",
+                    "method": "GET",
+                    "description": "Search the posts of every public file",
+                },
+                "tags": {
+                    "href": "/tags/{tag}",
+                    "method": "GET",
+                    "description": "List the public posts with a tag, newest first",
+                },
+                "changes": {
+                    "href": "/changes",
+                    "method": "GET",
+                    "description": "Read the change log of hosted files",
+                },
+                "events": {
+                    "href": "/events?nick={nicknames}",
+                    "method": "GET",
+                    "description": "Stream the changes of some hosted files as Server-Sent Events",
+                },
+                "bulk-fetch": {
+                    "href": "/bulk-fetch",
+                    "method": "POST",
+                    "description": "Fetch many hosted files in one request",
+                },
+                "webhooks": {
+                    "href": "/webhooks",
+                    "method": "POST",
+                    "description": "Register a webhook for the change log (operator token required)",
+                },
             },
         }
     )
@@ -131,13 +236,17 @@ def signup_view(request):
     )
 
     # Create hosted file record with default content
-    hosted_file = HostedFile.objects.create(
-        nickname=nickname,
-        vfile_token=token_data["token"],
-        vfile_timestamp=token_data["timestamp"],
-        vfile_signature=token_data["signature"],
-        file_content=default_content,
-    )
+    with transaction.atomic():
+        hosted_file = HostedFile.objects.create(
+            nickname=nickname,
+            vfile_token=token_data["token"],
+            vfile_timestamp=token_data["timestamp"],
+            vfile_signature=token_data["signature"],
+            file_content=default_content,
+        )
+        record_change(SIGNUP, nickname)
+    invalidate_directory()
+    enqueue_artifacts(nickname)
 
     # Return vfile and public URL
     return Response(
@@ -154,102 +263,245 @@ def signup_view(request):
 
 
 @api_view(["POST"])
+@authentication_classes([VFileAuthentication])
 def upload_view(request):
     """Upload or update social.org file."""
-    vfile_url = request.data.get("vfile")
     uploaded_file = request.FILES.get("file")
 
     # Validate vfile
-    if not vfile_url:
+    if request.user is None:
+        return _vfile_required()
+
+    # Check if file is provided
+    if not uploaded_file:
         return Response(
             {
                 "type": "Error",
-                "errors": ["vfile parameter is required"],
+                "errors": ["File is required"],
                 "data": {},
             },
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # Parse vfile
-    vfile_data = parse_vfile_url(vfile_url)
-    if not vfile_data or not all(vfile_data.values()):
+    # Check file size
+    if uploaded_file.size > settings.MAX_FILE_SIZE:
+        return _file_too_large()
+
+    # Check if account is redirected
+    if request.user.is_redirected:
+        return _redirect_active()
+
+    return _store_upload(request, uploaded_file.chunks())
+
+
+@api_view(["PUT"])
+@authentication_classes([VFileHeaderAuthentication])
+def upload_file_view(request, nickname):
+    """Upload social.org file as the raw request body, read in chunks."""
+    error = _check_raw_upload(request, nickname)
+    if error is not None:
+        return error
+
+    return _store_upload(request, iter_stream(request.stream))
+
+
+@api_view(["PATCH"])
+@authentication_classes([VFileHeaderAuthentication])
+def patch_file_view(request, nickname):
+    """
+    Change social.org file without sending it whole.
+
+    A text/x-diff (or text/x-patch) body is applied as a unified diff. Any
+    other body is appended to the file, which requires If-Match with the
+    current ETag so a retried request is never appended twice.
+    """
+    error = _check_raw_upload(request, nickname)
+    if error is not None:
+        return error
+
+    content_type = request.META.get("CONTENT_TYPE", "").split(";")[0].strip().lower()
+    is_diff = content_type in ("text/x-diff", "text/x-patch")
+    if not is_diff and not request.META.get("HTTP_IF_MATCH"):
         return Response(
             {
                 "type": "Error",
-                "errors": ["Invalid vfile format"],
+                "errors": ["If-Match with the current ETag is required to append"],
                 "data": {},
             },
-            status=status.HTTP_401_UNAUTHORIZED,
+            status=status.HTTP_428_PRECONDITION_REQUIRED,
         )
 
-    # Find hosted file by token
     try:
-        hosted_file = HostedFile.objects.get(vfile_token=vfile_data["token"])
-    except HostedFile.DoesNotExist:
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["Invalid vfile token"],
-                "data": {},
-            },
-            status=status.HTTP_401_UNAUTHORIZED,
-        )
+        body, _, _ = read_upload(iter_stream(request.stream), settings.MAX_FILE_SIZE)
+    except FileTooLarge:
+        return _file_too_large()
+    except UnicodeDecodeError:
+        return _invalid_utf8()
 
-    # Verify signature
-    if not verify_vfile_token(
-        vfile_data["token"],
-        vfile_data["timestamp"],
-        vfile_data["signature"],
-        hosted_file.nickname,
-    ):
+    with transaction.atomic():
+        hosted_file = HostedFile.objects.select_for_update().get(id=request.user.id)
+        if not _if_match(request, hosted_file.content_hash):
+            return _precondition_failed(hosted_file.content_hash)
+
+        if is_diff:
+            try:
+                file_content = apply_unified_diff(hosted_file.file_content, body)
+            except PatchError as e:
+                response = Response(
+                    {
+                        "type": "Error",
+                        "errors": [f"Patch does not apply: {e}"],
+                        "data": {},
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+                response["ETag"] = hosted_file.etag
+                return response
+        else:
+            file_content = hosted_file.file_content + body
+
+        encoded = file_content.encode("utf-8")
+        if len(encoded) > settings.MAX_FILE_SIZE:
+            return _file_too_large()
+
+        # Unchanged: nothing to write, invalidate or regenerate
+        content_hash = compute_content_hash(encoded)
+        if content_hash == hosted_file.content_hash:
+            return _upload_response(request, hosted_file)
+
+        had_content = hosted_file.has_content
+        hosted_file.set_content(file_content, content_hash, len(encoded))
+        hosted_file.save(update_fields=["file_content", "updated_at"])
+        record_change(UPLOAD, hosted_file.nickname, content_hash=content_hash)
+
+        # Mirrored while the row is locked, so a concurrent upload cannot
+        # overwrite it with older content (without the gzip variant, which
+        # is not built yet)
+        sync_file(hosted_file)
+
+    _file_changed(hosted_file, had_content)
+    return _upload_response(request, hosted_file)
+
+
+def _check_raw_upload(request, nickname):
+    """
+    Check a request that changes a file through /<nickname>/social.org.
+
+    Returns:
+        Error response, or None if the request can go ahead
+    """
+    # Validate vfile
+    if request.user is None:
         return Response(
             {
                 "type": "Error",
-                "errors": ["Invalid vfile signature"],
+                "errors": ["Authorization header with a vfile is required"],
                 "data": {},
             },
             status=status.HTTP_401_UNAUTHORIZED,
         )
 
-    # Check if file is provided
-    if not uploaded_file:
+    if request.user.nickname != nickname:
         return Response(
             {
                 "type": "Error",
-                "errors": ["File is required"],
+                "errors": ["vfile does not belong to this nickname"],
                 "data": {},
             },
-            status=status.HTTP_400_BAD_REQUEST,
+            status=status.HTTP_403_FORBIDDEN,
         )
 
-    # Check file size
-    if uploaded_file.size > settings.MAX_FILE_SIZE:
-        return Response(
-            {
-                "type": "Error",
-                "errors": [f"File too large. Maximum size is {settings.MAX_FILE_SIZE} bytes"],
-                "data": {},
-            },
-            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-        )
+    # Check file size before reading the body
+    try:
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > settings.MAX_FILE_SIZE:
+        return _file_too_large()
 
     # Check if account is redirected
-    if hosted_file.is_redirected:
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["Cannot upload file while redirect is active. Remove redirect first."],
-                "data": {},
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+    if request.user.is_redirected:
+        return _redirect_active()
 
-    # Save file content to database
-    file_content = uploaded_file.read().decode("utf-8")
-    hosted_file.file_content = file_content
-    hosted_file.save()
+    return None
 
-    return Response(
+
+def _store_upload(request, chunks):
+    """
+    Read an uploaded file, save it and queue the build of its derived artifacts.
+
+    The file is streamed into storage while it is read, and moved into place
+    once it has been saved; its compressed variants and post index are built
+    in the background (see tasks.build_artifacts). Uploads identical to the
+    stored file are not written at all. With If-Match, the upload only
+    applies if the stored file still has one of the given ETags.
+
+    Args:
+        request: Authenticated request
+        chunks: Iterable of the bytes of the file
+    """
+    nickname = request.user.nickname
+
+    # Reject stale uploads before reading them (checked again below)
+    meta = get_file(nickname)
+    if meta is not None and not _if_match(request, meta["content_hash"]):
+        return _precondition_failed(meta["content_hash"])
+
+    with PendingFile(nickname) as pending:
+        try:
+            file_content, content_hash, content_size = read_upload(
+                chunks, settings.MAX_FILE_SIZE, pending
+            )
+        except FileTooLarge:
+            return _file_too_large()
+        except UnicodeDecodeError:
+            return _invalid_utf8()
+
+        with transaction.atomic():
+            # The previous content is not loaded, only its hash
+            hosted_file = (
+                HostedFile.objects.select_for_update()
+                .defer("file_content")
+                .get(id=request.user.id)
+            )
+            if not _if_match(request, hosted_file.content_hash):
+                return _precondition_failed(hosted_file.content_hash)
+
+            # Unchanged: nothing to write, invalidate or regenerate
+            if hosted_file.content_hash == content_hash:
+                return _upload_response(request, hosted_file)
+
+            had_content = hosted_file.has_content
+            hosted_file.set_content(file_content, content_hash, content_size)
+            hosted_file.save(update_fields=["file_content", "updated_at"])
+            record_change(UPLOAD, nickname, content_hash=content_hash)
+
+            # Renamed into place while the row is locked, so a concurrent
+            # upload cannot overwrite it with older content (without the
+            # gzip variant, which is not built yet)
+            if hosted_file.has_content:
+                pending.commit()
+            else:
+                remove_file(nickname)
+
+    _file_changed(hosted_file, had_content)
+    return _upload_response(request, hosted_file)
+
+
+def _file_changed(hosted_file, had_content: bool):
+    """
+    Invalidate what depends on the content of a file after it changed, and
+    queue the build of its derived artifacts.
+    """
+    invalidate_file(hosted_file.nickname)
+    if hosted_file.has_content != had_content:
+        invalidate_directory()
+    enqueue_artifacts(hosted_file.nickname)
+
+
+def _upload_response(request, hosted_file):
+    """Success response for an upload, with the ETag of the stored content."""
+    response = Response(
         {
             "type": "Success",
             "errors": [],
@@ -260,81 +512,104 @@ def upload_view(request):
         },
         status=status.HTTP_200_OK,
     )
+    response["ETag"] = hosted_file.etag
+    return response
 
 
-@api_view(["POST"])
-def delete_view(request):
-    """Delete hosted file."""
-    vfile_url = request.data.get("vfile")
+def _if_match(request, content_hash: str) -> bool:
+    """
+    Evaluate the If-Match header against the stored content.
 
-    # Validate vfile
-    if not vfile_url:
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["vfile parameter is required"],
-                "data": {},
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+    ETags of compressed representations ("<hash>-gzip") match their content.
 
-    # Parse vfile
-    vfile_data = parse_vfile_url(vfile_url)
-    if not vfile_data or not all(vfile_data.values()):
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["Invalid vfile format"],
-                "data": {},
-            },
-            status=status.HTTP_401_UNAUTHORIZED,
-        )
+    Returns:
+        True if there is no If-Match header or one of its ETags matches
+    """
+    header = request.META.get("HTTP_IF_MATCH")
+    if not header:
+        return True
 
-    # Find hosted file by token
-    try:
-        hosted_file = HostedFile.objects.get(vfile_token=vfile_data["token"])
-    except HostedFile.DoesNotExist:
-        # Check if token is properly formatted (64-char hex string)
-        # If yes, it's likely a valid token for non-existent account (404)
-        # If no, it's an invalid/forged token (401)
-        token = vfile_data["token"]
-        if len(token) == 64 and all(c in "0123456789abcdef" for c in token.lower()):
-            return Response(
-                {
-                    "type": "Error",
-                    "errors": ["File not found"],
-                    "data": {},
-                },
-                status=status.HTTP_404_NOT_FOUND,
-            )
-        else:
-            return Response(
-                {
-                    "type": "Error",
-                    "errors": ["Invalid vfile token"],
-                    "data": {},
-                },
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
+    for etag in parse_etags(header):
+        if etag == "*":
+            return True
+        if etag.startswith("W/"):
+            # Weak ETags never match (strong comparison)
+            continue
+        tag = etag.strip('"')
+        if tag == content_hash or tag.startswith(f"{content_hash}-"):
+            return True
+    return False
+
+
+def _precondition_failed(content_hash: str):
+    """Error response for uploads whose If-Match does not match the stored file."""
+    response = Response(
+        {
+            "type": "Error",
+            "errors": ["File has changed since it was read (If-Match does not match)"],
+            "data": {},
+        },
+        status=status.HTTP_412_PRECONDITION_FAILED,
+    )
+    response["ETag"] = _file_etag(content_hash)
+    return response
+
+
+def _file_too_large():
+    """Error response for uploads larger than MAX_FILE_SIZE."""
+    return Response(
+        {
+            "type": "Error",
+            "errors": [f"File too large. Maximum size is {settings.MAX_FILE_SIZE} bytes"],
+            "data": {},
+        },
+        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    )
+
+
+def _invalid_utf8():
+    """Error response for uploads that are not valid UTF-8."""
+    return Response(
+        {
+            "type": "Error",
+            "errors": ["File must be valid UTF-8 text"],
+            "data": {},
+        },
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def _redirect_active():
+    """Error response for uploads to a redirected account."""
+    return Response(
+        {
+            "type": "Error",
+            "errors": ["Cannot upload file while redirect is active. Remove redirect first."],
+            "data": {},
+        },
+        status=status.HTTP_400_BAD_REQUEST,
+    )
 
-    # Verify signature
-    if not verify_vfile_token(
-        vfile_data["token"],
-        vfile_data["timestamp"],
-        vfile_data["signature"],
-        hosted_file.nickname,
-    ):
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["Invalid vfile signature"],
-                "data": {},
-            },
-            status=status.HTTP_401_UNAUTHORIZED,
-        )
 
-    # Delete database record
-    hosted_file.delete()
+@api_view(["POST"])
+@authentication_classes([VFileDeleteAuthentication])
+def delete_view(request):
+    """Delete hosted file."""
+    # Validate vfile
+    if request.user is None:
+        return _vfile_required()
+
+    # Delete database record (related rows are deleted in bulk)
+    nickname = request.user.nickname
+    with transaction.atomic():
+        HostedFile.objects.filter(id=request.user.id).only("id").delete()
+        record_change(DELETE, nickname)
+        remove_file(nickname)
+    invalidate_file(nickname)
+    invalidate_directory()
+    invalidate_timeline()
+    invalidate_follows()
+    publish_change("delete", nickname)
 
     return Response(
         {
@@ -349,21 +624,14 @@ def delete_view(request):
 
 
 @api_view(["POST"])
+@authentication_classes([VFileAuthentication])
 def redirect_view(request):
     """Set up permanent redirect to new URL."""
-    vfile_url = request.data.get("vfile")
     new_url = request.data.get("new-url")
 
     # Validate vfile
-    if not vfile_url:
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["vfile parameter is required"],
-                "data": {},
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+    if request.user is None:
+        return _vfile_required()
 
     # Validate new URL
     if not new_url:
@@ -387,50 +655,21 @@ def redirect_view(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # Parse vfile
-    vfile_data = parse_vfile_url(vfile_url)
-    if not vfile_data or not all(vfile_data.values()):
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["Invalid vfile format"],
-                "data": {},
-            },
-            status=status.HTTP_401_UNAUTHORIZED,
-        )
-
-    # Find hosted file by token
-    try:
-        hosted_file = HostedFile.objects.get(vfile_token=vfile_data["token"])
-    except HostedFile.DoesNotExist:
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["File not found"],
-                "data": {},
-            },
-            status=status.HTTP_404_NOT_FOUND,
-        )
-
-    # Verify signature
-    if not verify_vfile_token(
-        vfile_data["token"],
-        vfile_data["timestamp"],
-        vfile_data["signature"],
-        hosted_file.nickname,
-    ):
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["Invalid vfile signature"],
-                "data": {},
-            },
-            status=status.HTTP_401_UNAUTHORIZED,
-        )
-
     # Set redirect URL
-    hosted_file.redirect_url = new_url
-    hosted_file.save()
+    nickname = request.user.nickname
+    with transaction.atomic():
+        HostedFile.objects.filter(id=request.user.id).update(
+            redirect_url=new_url,
+            updated_at=timezone.now(),
+        )
+        record_change(REDIRECT, nickname, redirect_url=new_url)
+        remove_file(nickname)
+    remove_follows(request.user.id)
+    invalidate_file(nickname)
+    invalidate_directory()
+    invalidate_timeline()
+    invalidate_follows()
+    publish_change("redirect", nickname, location=new_url)
 
     return Response(
         {
@@ -446,64 +685,15 @@ def redirect_view(request):
 
 
 @api_view(["POST"])
+@authentication_classes([VFileAuthentication])
 def remove_redirect_view(request):
     """Remove redirect and resume hosting."""
-    vfile_url = request.data.get("vfile")
-
     # Validate vfile
-    if not vfile_url:
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["vfile parameter is required"],
-                "data": {},
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-
-    # Parse vfile
-    vfile_data = parse_vfile_url(vfile_url)
-    if not vfile_data or not all(vfile_data.values()):
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["Invalid vfile format"],
-                "data": {},
-            },
-            status=status.HTTP_401_UNAUTHORIZED,
-        )
-
-    # Find hosted file by token
-    try:
-        hosted_file = HostedFile.objects.get(vfile_token=vfile_data["token"])
-    except HostedFile.DoesNotExist:
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["File not found"],
-                "data": {},
-            },
-            status=status.HTTP_404_NOT_FOUND,
-        )
-
-    # Verify signature
-    if not verify_vfile_token(
-        vfile_data["token"],
-        vfile_data["timestamp"],
-        vfile_data["signature"],
-        hosted_file.nickname,
-    ):
-        return Response(
-            {
-                "type": "Error",
-                "errors": ["Invalid vfile signature"],
-                "data": {},
-            },
-            status=status.HTTP_401_UNAUTHORIZED,
-        )
+    if request.user is None:
+        return _vfile_required()
 
     # Check if redirect exists
-    if not hosted_file.is_redirected:
+    if not request.user.is_redirected:
         return Response(
             {
                 "type": "Error",
@@ -513,9 +703,19 @@ def remove_redirect_view(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # Remove redirect
-    hosted_file.redirect_url = None
-    hosted_file.save()
+    # Remove redirect (the content is needed to restore the mirrored copy)
+    with transaction.atomic():
+        hosted_file = HostedFile.objects.select_for_update().get(id=request.user.id)
+        hosted_file.redirect_url = None
+        hosted_file.save(update_fields=["redirect_url", "updated_at"])
+        record_change(REMOVE_REDIRECT, hosted_file.nickname)
+        sync_file(hosted_file, get_stored_variant(hosted_file, "gzip"))
+    restore_follows(hosted_file)
+    invalidate_file(hosted_file.nickname)
+    invalidate_directory()
+    invalidate_timeline()
+    invalidate_follows()
+    publish_change("update", hosted_file.nickname, etag=hosted_file.etag, posts=[])
 
     return Response(
         {
@@ -529,53 +729,172 @@ def remove_redirect_view(request):
     )
 
 
-@api_view(["GET"])
-def public_routes_view(request):
-    """List all public social.org files hosted on the server."""
-    # Get all hosted files that are not redirected and have content
-    hosted_files = HostedFile.objects.filter(
-        redirect_url__isnull=True,
-        file_content__isnull=False,
-    ).exclude(file_content="")
-
-    # Build list of public URLs
-    public_urls = [hosted_file.get_public_url(request) for hosted_file in hosted_files]
-
+def _vfile_required():
+    """Error response for requests without a vfile."""
     return Response(
         {
-            "type": "Success",
-            "errors": [],
-            "data": public_urls,
+            "type": "Error",
+            "errors": ["vfile parameter is required"],
+            "data": {},
         },
-        status=status.HTTP_200_OK,
+        status=status.HTTP_400_BAD_REQUEST,
     )
 
 
 @api_view(["GET"])
-def serve_file_view(request, nickname):
-    """Serve the social.org file for a given nickname."""
-    # Find hosted file
+def public_routes_view(request):
+    """
+    List all public social.org files hosted on the server.
+
+    Without parameters the full list is returned, streamed from the database
+    or served from a cached snapshot. With `limit` and/or `cursor` a single
+    page is returned, with a `next` link when there are more.
+    """
+    version = get_directory_version()
+    scheme = get_scheme(request)
+
+    if "cursor" in request.GET or "limit" in request.GET:
+        return _public_routes_page(request, version, scheme)
+
+    # Answer conditional requests from the directory version alone
+    etag = f'"{version}-{scheme}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        snapshot = get_snapshot(version, scheme)
+        if snapshot is not None:
+            response = HttpResponse(snapshot, content_type="application/json")
+        else:
+            response = StreamingHttpResponse(
+                _stream_public_routes(request, version, scheme),
+                content_type="application/json",
+            )
+
+    response["ETag"] = etag
+    return response
+
+
+def _public_routes_page(request, version, scheme):
+    """Return one page of /public-routes (keyset pagination by nickname)."""
+    # Validate limit
     try:
-        hosted_file = HostedFile.objects.get(nickname=nickname)
-    except HostedFile.DoesNotExist:
+        limit = int(request.GET.get("limit", settings.PUBLIC_ROUTES_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+
+    if not 1 <= limit <= settings.PUBLIC_ROUTES_MAX_PAGE_SIZE:
         return Response(
             {
                 "type": "Error",
-                "errors": ["File not found"],
+                "errors": [
+                    f"limit must be between 1 and {settings.PUBLIC_ROUTES_MAX_PAGE_SIZE}"
+                ],
+                "data": {},
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Validate cursor
+    cursor = request.GET.get("cursor", "")
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            return Response(
+                {
+                    "type": "Error",
+                    "errors": ["Invalid cursor"],
+                    "data": {},
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    # Answer conditional requests from the directory version alone
+    etag = f'"{version}-{scheme}-{limit}-{cursor}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+        return response
+
+    nicknames, next_cursor = get_page(after, limit)
+
+    links = {
+        "self": {"href": request.get_full_path(), "method": "GET"},
+    }
+    if next_cursor:
+        query = urlencode({"cursor": next_cursor, "limit": limit})
+        links["next"] = {"href": f"/public-routes?{query}", "method": "GET"}
+
+    response = Response(
+        {
+            "type": "Success",
+            "errors": [],
+            "data": [build_public_url(nickname, request) for nickname in nicknames],
+            "_links": links,
+        },
+        status=status.HTTP_200_OK,
+    )
+    response["ETag"] = etag
+    return response
+
+
+def _stream_public_routes(request, version, scheme):
+    """Yield the full /public-routes JSON document, caching it once complete."""
+    chunks = [b'{"type":"Success","errors":[],"data":[']
+    yield chunks[-1]
+
+    nicknames = public_nicknames().iterator(chunk_size=2000)
+    separator = b""
+    while batch := list(islice(nicknames, 2000)):
+        chunks.append(
+            separator
+            + b",".join(
+                json.dumps(build_public_url(nickname, request)).encode("utf-8")
+                for nickname in batch
+            )
+        )
+        separator = b","
+        yield chunks[-1]
+
+    chunks.append(b"]}")
+    yield chunks[-1]
+
+    set_snapshot(version, scheme, b"".join(chunks))
+
+
+@csrf_exempt
+def file_view(request, nickname):
+    """Dispatch /<nickname>/social.org: PUT and PATCH change the file, anything else serves it."""
+    if request.method == "PUT":
+        return upload_file_view(request, nickname)
+    if request.method == "PATCH":
+        return patch_file_view(request, nickname)
+    return serve_file_view(request, nickname)
+
+
+@api_view(["GET", "HEAD"])
+def serve_file_view(request, nickname):
+    """Serve the social.org file for a given nickname."""
+    # Find hosted file metadata (read-through cache)
+    meta = get_file(nickname)
+    if meta is None:
+        return Response(
+            {
+                "type": "Error",
+                "errors": ["File not found"],
                 "data": {},
             },
             status=status.HTTP_404_NOT_FOUND,
         )
 
     # Check if redirected
-    if hosted_file.is_redirected:
+    if meta["redirect_url"]:
         return HttpResponse(
             status=status.HTTP_301_MOVED_PERMANENTLY,
-            headers={"Location": hosted_file.redirect_url},
+            headers={"Location": meta["redirect_url"]},
         )
 
     # Check if file has content
-    if not hosted_file.file_content:
+    if not meta["content_size"]:
         return Response(
             {
                 "type": "Error",
@@ -586,11 +905,840 @@ def serve_file_view(request, nickname):
         )
 
     # Update last access
-    hosted_file.touch()
+    record_access(nickname)
+
+    # Only the posts published after a point
+    since = request.GET.get("since")
+    if since:
+        return _serve_since(request, nickname, meta, since)
+
+    # Pick a precompressed variant the client accepts (ranges are served
+    # from the uncompressed content)
+    range_header = request.META.get("HTTP_RANGE") if request.method == "GET" else None
+    encoding = None
+    if not range_header:
+        encoding = negotiate_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""),
+            meta["encodings"],
+        )
+
+    # Answer conditional requests from the metadata alone
+    content_hash = meta["content_hash"]
+    etag = _file_etag(content_hash, encoding)
+    last_modified = int(meta["updated_at"].timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None and request.method == "HEAD":
+        response = HttpResponse(content_type="text/plain; charset=utf-8")
+        if encoding:
+            response["Content-Length"] = meta["encodings"][encoding]
+        else:
+            response["Content-Length"] = meta["content_size"]
+
+    if (
+        response is None
+        and settings.STORAGE_ACCEL_REDIRECT
+        and not range_header
+        and encoding in (None, "gzip")
+    ):
+        # nginx sends the mirrored copy; the validators above stay Django's
+        response = _accel_redirect(nickname, encoding)
+
+    if response is None:
+        # Return file content
+        file = get_file_content(nickname, content_hash, encoding)
+        if file is None and encoding:
+            # Variant disappeared after the metadata was read
+            encoding = None
+            file = get_file_content(nickname, content_hash)
+
+        if file is None:
+            return _file_not_found()
+
+        content_hash, content = file
+        etag = _file_etag(content_hash, encoding)
+        if range_header and _if_range(request, etag, last_modified):
+            response = _range_response(range_header, content)
+        if response is None:
+            response = HttpResponse(
+                content,
+                content_type="text/plain; charset=utf-8",
+            )
+
+    if encoding and response.status_code == status.HTTP_200_OK:
+        response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Accept-Ranges"] = "bytes"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+@api_view(["POST"])
+def bulk_fetch_view(request):
+    """
+    Serve several social.org files in one response.
+
+    The body lists the files as {"files": [{"nick": ..., "etag": ...}]}
+    (or plain nicknames). The response is streamed as NDJSON, one line
+    per file in request order: its content, or that it is not modified,
+    redirected or not found.
+    """
+    files = request.data.get("files") if isinstance(request.data, dict) else None
+    if not isinstance(files, list) or not files:
+        return _invalid_parameter("files must be a non-empty list")
+    if len(files) > settings.BULK_FETCH_MAX_FILES:
+        return _invalid_parameter(f"At most {settings.BULK_FETCH_MAX_FILES} files per request")
+
+    # nickname -> ETags the client already has
+    requested = {}
+    for file in files:
+        if isinstance(file, str):
+            file = {"nick": file}
+        if not isinstance(file, dict) or not isinstance(file.get("nick"), str):
+            return _invalid_parameter("Each file must be a nickname or an object with nick")
+        etag = file.get("etag")
+        requested[file["nick"]] = parse_etags(etag) if isinstance(etag, str) else []
+
+    metas = get_files(list(requested))
+    record_accesses(
+        [
+            nickname
+            for nickname, meta in metas.items()
+            if not meta["redirect_url"] and meta["content_size"]
+        ]
+    )
+
+    return StreamingHttpResponse(
+        _stream_bulk_fetch(requested, metas),
+        content_type="application/x-ndjson",
+    )
+
+
+@require_GET
+async def events_view(request):
+    """
+    Stream the changes of some hosted files as Server-Sent Events.
+
+    The files are given as `nick` parameters (repeated or comma
+    separated). The stream stays open: serve it from the ASGI
+    application (core/asgi.py), where idle streams do not hold a thread.
+    """
+    nicknames = list(
+        dict.fromkeys(
+            nickname.strip()
+            for value in request.GET.getlist("nick")
+            for nickname in value.split(",")
+            if nickname.strip()
+        )
+    )
+    if not nicknames or len(nicknames) > settings.EVENTS_MAX_NICKNAMES:
+        return JsonResponse(
+            {
+                "type": "Error",
+                "errors": [
+                    f"Between 1 and {settings.EVENTS_MAX_NICKNAMES} nick parameters are required"
+                ],
+                "data": {},
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    response = StreamingHttpResponse(
+        stream_events(broker.subscribe(nicknames)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Sent as it is produced, without buffering by nginx
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_view(["GET"])
+def changes_view(request):
+    """
+    List the entries of the change log after a sequence number, oldest first.
+
+    `after` is the sequence number of the last entry already applied (0,
+    the default, for the whole log) and `limit` the page size. The next
+    link always points after the last entry returned, so mirrors keep
+    following it to poll for new changes.
+    """
+    try:
+        after = int(request.GET.get("after", 0))
+        limit = int(request.GET.get("limit", settings.CHANGES_PAGE_SIZE))
+    except ValueError:
+        return _invalid_parameter("after and limit must be integers")
+    if after < 0:
+        return _invalid_parameter("after must be 0 or greater")
+    if not 1 <= limit <= settings.CHANGES_MAX_PAGE_SIZE:
+        return _invalid_parameter(f"limit must be between 1 and {settings.CHANGES_MAX_PAGE_SIZE}")
+
+    data = [serialize_change(change) for change in get_changes(after, limit)]
+
+    params = request.GET.copy()
+    params["after"] = data[-1]["seq"] if data else after
+    params["limit"] = limit
+    return Response(
+        {
+            "type": "Success",
+            "errors": [],
+            "data": data,
+            "_links": {
+                "self": {"href": request.get_full_path(), "method": "GET"},
+                "next": {"href": f"{request.path}?{params.urlencode()}", "method": "GET"},
+            },
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@authentication_classes([WebhookTokenAuthentication])
+@parser_classes([JSONParser])
+def webhooks_view(request):
+    """
+    Register a webhook that receives the change log entries from now on.
+
+    `url` is where batches are POSTed and `window` how many seconds changes
+    are batched for (WEBHOOK_WINDOW by default). The secret that signs the
+    deliveries is only returned here.
+    """
+    url = request.data.get("url")
+    if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+        return _invalid_parameter("Invalid URL format. Must start with http:// or https://")
+    if len(url) > Webhook._meta.get_field("url").max_length:
+        return _invalid_parameter("url is too long")
+
+    window = request.data.get("window", settings.WEBHOOK_WINDOW)
+    if (
+        not isinstance(window, int)
+        or isinstance(window, bool)
+        or not 0 <= window <= settings.WEBHOOK_MAX_WINDOW
+    ):
+        return _invalid_parameter(f"window must be between 0 and {settings.WEBHOOK_MAX_WINDOW}")
 
-    # Return file content
+    webhook = create_webhook(url, window)
+    return Response(
+        {
+            "type": "Success",
+            "errors": [],
+            "data": {
+                "id": webhook.id,
+                "url": webhook.url,
+                "window": webhook.window,
+                "secret": webhook.secret,
+            },
+            "_links": {
+                "self": {"href": f"/webhooks/{webhook.id}", "method": "GET"},
+                "delete": {"href": f"/webhooks/{webhook.id}", "method": "DELETE"},
+            },
+        },
+        status=status.HTTP_201_CREATED,
+    )
+
+
+@api_view(["GET", "DELETE"])
+@authentication_classes([WebhookTokenAuthentication])
+def webhook_view(request, webhook_id):
+    """Show the delivery state of a webhook (GET) or unregister it (DELETE)."""
+    webhook = Webhook.objects.filter(id=webhook_id).first()
+    if webhook is None:
+        return Response(
+            {
+                "type": "Error",
+                "errors": ["Webhook not found"],
+                "data": {},
+            },
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    if request.method == "DELETE":
+        delete_webhook(webhook)
+        return Response(
+            {
+                "type": "Success",
+                "errors": [],
+                "data": {
+                    "message": "Webhook deleted successfully",
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    state = get_state(webhook.id)
+    return Response(
+        {
+            "type": "Success",
+            "errors": [],
+            "data": {
+                "id": webhook.id,
+                "url": webhook.url,
+                "window": webhook.window,
+                "delivered": state["cursor"],
+                "failed-attempts": state["attempts"],
+                "retry-at": (
+                    datetime.fromtimestamp(state["retry_at"], dt_timezone.utc).isoformat()
+                    if state["retry_at"]
+                    else None
+                ),
+                "dead-letters": state["dead_letters"],
+            },
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def _stream_bulk_fetch(requested: dict, metas: dict):
+    """Yield the NDJSON lines of /bulk-fetch, loading contents batch by batch."""
+    nicknames = list(requested)
+    for first in range(0, len(nicknames), settings.BULK_FETCH_BATCH_SIZE):
+        batch = nicknames[first : first + settings.BULK_FETCH_BATCH_SIZE]
+        entries = {
+            nickname: _bulk_fetch_entry(nickname, requested[nickname], metas.get(nickname))
+            for nickname in batch
+        }
+        contents = get_files_content(
+            {
+                nickname: metas[nickname]["content_hash"]
+                for nickname, entry in entries.items()
+                if entry["status"] == status.HTTP_200_OK
+            }
+        )
+
+        lines = []
+        for nickname, entry in entries.items():
+            if entry["status"] == status.HTTP_200_OK:
+                if nickname not in contents:
+                    # Deleted after the metadata was read
+                    entry = {"nick": nickname, "status": status.HTTP_404_NOT_FOUND}
+                else:
+                    content_hash, content = contents[nickname]
+                    entry["etag"] = _file_etag(content_hash)
+                    entry["content"] = content.decode("utf-8")
+            lines.append(json.dumps(entry).encode("utf-8") + b"\n")
+        yield b"".join(lines)
+
+
+def _bulk_fetch_entry(nickname: str, etags: list, meta: dict) -> dict:
+    """
+    Return the /bulk-fetch line of a file, without its content.
+
+    Args:
+        nickname: Requested nickname
+        etags: ETags the client sent for it
+        meta: File metadata, or None if the nickname does not exist
+    """
+    if meta is None or (not meta["redirect_url"] and not meta["content_size"]):
+        return {"nick": nickname, "status": status.HTTP_404_NOT_FOUND}
+
+    if meta["redirect_url"]:
+        return {
+            "nick": nickname,
+            "status": status.HTTP_301_MOVED_PERMANENTLY,
+            "location": meta["redirect_url"],
+        }
+
+    # ETags of any representation served by /<nickname>/social.org
+    content_hash = meta["content_hash"]
+    current = {_file_etag(content_hash)} | {
+        _file_etag(content_hash, encoding) for encoding in meta["encodings"]
+    }
+    if current.intersection(etags):
+        return {
+            "nick": nickname,
+            "status": status.HTTP_304_NOT_MODIFIED,
+            "etag": _file_etag(content_hash),
+        }
+
+    return {
+        "nick": nickname,
+        "status": status.HTTP_200_OK,
+        "last-modified": http_date(int(meta["updated_at"].timestamp())),
+    }
+
+
+def _serve_since(request, nickname, meta, value):
+    """Serve the header of a file plus the posts published after `since`."""
+    # An unencoded "+" in the offset of a timestamp or post id arrives as a space
+    value = re.sub(r" (\d{2}:?\d{2})$", r"+\1", value)
+    since = resolve_since(meta["id"], value)
+    if since is None:
+        return Response(
+            {
+                "type": "Error",
+                "errors": ["Invalid since parameter. Use an RFC 3339 timestamp or a post id"],
+                "data": {},
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    content_hash = meta["content_hash"]
+    last_modified = int(meta["updated_at"].timestamp())
+    etag = _since_etag(content_hash, since)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        file = get_file_content(nickname, content_hash)
+        if file is None:
+            return _file_not_found()
+
+        # Sliced from the content with the post index, not parsed again
+        content_hash, content = file
+        etag = _since_etag(content_hash, since)
+        header_size, offsets = posts_since(meta, content, since)
+        response = HttpResponse(
+            b"".join([content[:header_size], *(content[start:end] for start, end in offsets)]),
+            content_type="text/plain; charset=utf-8",
+        )
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def _range_response(range_header: str, content: bytes):
+    """
+    Serve a single byte range of content.
+
+    Returns:
+        206 or 416 response, or None to serve the whole content (malformed
+        or multiple ranges)
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    size = len(content)
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if start < 0 or end < start:
+        return None
+
+    end = min(end, size - 1)
     response = HttpResponse(
-        hosted_file.file_content,
+        content[start : end + 1],
+        status=status.HTTP_206_PARTIAL_CONTENT,
         content_type="text/plain; charset=utf-8",
     )
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
     return response
+
+
+def _if_range(request, etag: str, last_modified: int) -> bool:
+    """Check If-Range: a Range only applies to the representation it names."""
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _file_not_found():
+    """Error response for files that no longer exist."""
+    return Response(
+        {
+            "type": "Error",
+            "errors": ["File not found"],
+            "data": {},
+        },
+        status=status.HTTP_404_NOT_FOUND,
+    )
+
+
+def _since_etag(content_hash: str, since) -> str:
+    """Return the strong ETag of the posts of a file published after since."""
+    since_hash = compute_content_hash(since.isoformat().encode("utf-8"))[:16]
+    return f'"{content_hash}-since-{since_hash}"'
+
+
+def _accel_redirect(nickname: str, encoding: str = None):
+    """
+    Hand the body of a file to nginx with X-Accel-Redirect.
+
+    Returns:
+        The response, or None if the file (or its gzip variant) is not mirrored
+    """
+    path = get_file_path(nickname)
+    if encoding == "gzip":
+        path = path.with_name(GZIP_FILE_NAME)
+    if not path.exists():
+        return None
+
+    response = HttpResponse(content_type="text/plain; charset=utf-8")
+    response["X-Accel-Redirect"] = f"{settings.STORAGE_ACCEL_REDIRECT}{nickname}/{path.name}"
+    return response
+
+
+def _file_etag(content_hash: str, encoding: str = None) -> str:
+    """Return the strong ETag of a file representation."""
+    if encoding:
+        return f'"{content_hash}-{encoding}"'
+    return f'"{content_hash}"'
+
+
+@api_view(["GET"])
+def posts_view(request, nickname):
+    """
+    List the posts of a hosted file as JSON, newest first.
+
+    Served from the post index, never from the file. `limit` and `cursor`
+    paginate; `since`, `until` (RFC 3339) and `tag` filter.
+    """
+    meta = get_file(nickname)
+    if meta is None:
+        return _file_not_found()
+
+    if meta["redirect_url"]:
+        return HttpResponse(
+            status=status.HTTP_301_MOVED_PERMANENTLY,
+            headers={"Location": meta["redirect_url"]},
+        )
+
+    query = _posts_query(request)
+    if isinstance(query, Response):
+        return query
+
+    # The index changes only when the artifacts of the file are rebuilt
+    query_hash = compute_content_hash(request.GET.urlencode().encode("utf-8"))[:16]
+    etag = f'"{meta["artifacts_hash"]}-posts-{query_hash}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+        return response
+
+    record_access(nickname)
+    posts = filter_posts(
+        Post.objects.filter(hosted_file_id=meta["id"]),
+        since=query["since"],
+        until=query["until"],
+        tag=query["tag"],
+    )
+    page, next_cursor = get_posts_page(posts, query["after"], query["limit"])
+
+    response = Response(
+        {
+            "type": "Success",
+            "errors": [],
+            "data": [serialize_post(post) for post in page],
+            "_links": _page_links(request, next_cursor),
+        },
+        status=status.HTTP_200_OK,
+    )
+    response["ETag"] = etag
+    return response
+
+
+@api_view(["GET"])
+def timeline_view(request):
+    """
+    List the posts of every public file as JSON, newest first.
+
+    Served from the post index with one range scan per page. Takes the
+    same parameters as /<nickname>/posts.
+    """
+    return _timeline_listing(request, timeline_posts())
+
+
+@api_view(["GET"])
+def tag_posts_view(request, tag):
+    """List the posts of every public file with a tag, newest first."""
+    return _timeline_listing(request, filter_posts(timeline_posts(), tag=tag))
+
+
+@api_view(["GET"])
+def mentions_view(request, nickname):
+    """List the public posts that mention a hosted file, newest first."""
+    meta = get_file(nickname)
+    if meta is None:
+        return _file_not_found()
+
+    if meta["redirect_url"]:
+        return HttpResponse(
+            status=status.HTTP_301_MOVED_PERMANENTLY,
+            headers={"Location": meta["redirect_url"]},
+        )
+
+    return _timeline_listing(request, mentioning_posts(build_public_url(nickname)))
+
+
+@api_view(["GET"])
+def replies_view(request, nickname, post_id):
+    """List the public posts that reply to a post of a hosted file, newest first."""
+    meta = get_file(nickname)
+    if meta is None:
+        return _file_not_found()
+
+    if meta["redirect_url"]:
+        return HttpResponse(
+            status=status.HTTP_301_MOVED_PERMANENTLY,
+            headers={"Location": meta["redirect_url"]},
+        )
+
+    return _timeline_listing(request, replying_posts(build_public_url(nickname), post_id))
+
+
+@api_view(["GET"])
+def followers_view(request, nickname):
+    """
+    List the hosted files that follow a file (#+FOLLOW with its public URL), by nickname.
+
+    Served from the follow edges built when files are written. `limit`
+    and `cursor` paginate.
+    """
+    return _follows_listing(request, nickname, "followers")
+
+
+@api_view(["GET"])
+def following_view(request, nickname):
+    """List the #+FOLLOW lines of a hosted file, by URL, as indexed when it was written."""
+    return _follows_listing(request, nickname, "following")
+
+
+def _follows_listing(request, nickname, listing: str):
+    """
+    Answer a paginated listing of the follow graph of a hosted file.
+
+    Args:
+        request: The request
+        nickname: Nickname of the hosted file
+        listing: "followers" or "following"
+    """
+    meta = get_file(nickname)
+    if meta is None:
+        return _file_not_found()
+
+    if meta["redirect_url"]:
+        return HttpResponse(
+            status=status.HTTP_301_MOVED_PERMANENTLY,
+            headers={"Location": meta["redirect_url"]},
+        )
+
+    try:
+        limit = int(request.GET.get("limit", settings.FOLLOWS_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.FOLLOWS_MAX_PAGE_SIZE:
+        return _invalid_parameter(f"limit must be between 1 and {settings.FOLLOWS_MAX_PAGE_SIZE}")
+
+    after = None
+    cursor = request.GET.get("cursor")
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            return _invalid_parameter("Invalid cursor")
+
+    # Answer conditional requests from the follow graph version alone
+    query_hash = compute_content_hash(request.get_full_path().encode("utf-8"))[:16]
+    etag = f'"{get_follows_version()}-{get_scheme(request)}-{query_hash}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+        return response
+
+    if listing == "followers":
+        followers, last = get_followers_page(nickname, after, limit)
+        data = [
+            {"nick": follower, "url": build_public_url(follower, request)}
+            for follower in followers
+        ]
+    else:
+        follows, last = get_following_page(meta["id"], after, limit)
+        data = [{"name": follow["name"] or None, "url": follow["url"]} for follow in follows]
+
+    response = Response(
+        {
+            "type": "Success",
+            "errors": [],
+            "data": data,
+            "_links": _page_links(request, encode_cursor(last) if last else None),
+        },
+        status=status.HTTP_200_OK,
+    )
+    response["ETag"] = etag
+    return response
+
+
+def _timeline_listing(request, posts):
+    """
+    Answer a listing of posts of public files, newest first.
+
+    Takes the same parameters as /<nickname>/posts. Every listing changes
+    with the timeline, so its ETag is the timeline version and the request
+    path and query.
+
+    Args:
+        request: The request
+        posts: Post queryset, already restricted to the posts listed
+    """
+    query = _posts_query(request)
+    if isinstance(query, Response):
+        return query
+
+    # Answer conditional requests from the timeline version alone
+    query_hash = compute_content_hash(request.get_full_path().encode("utf-8"))[:16]
+    etag = f'"{get_timeline_version()}-{get_scheme(request)}-{query_hash}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+        return response
+
+    posts = filter_posts(
+        posts,
+        since=query["since"],
+        until=query["until"],
+        tag=query["tag"],
+    )
+    page, next_cursor = get_posts_page(
+        posts, query["after"], query["limit"], fields=TIMELINE_FIELDS
+    )
+
+    response = Response(
+        {
+            "type": "Success",
+            "errors": [],
+            "data": [_post_with_author(request, post) for post in page],
+            "_links": _page_links(request, next_cursor),
+        },
+        status=status.HTTP_200_OK,
+    )
+    response["ETag"] = etag
+    return response
+
+
+@api_view(["GET"])
+def search_view(request):
+    """
+    Search the posts of every public file, best matches first.
+
+    `q` holds the words to search for (all required, the last one also as
+    a prefix). `limit` and `offset` paginate, up to SEARCH_MAX_RESULTS.
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return _invalid_parameter("q parameter is required")
+
+    try:
+        limit = int(request.GET.get("limit", settings.POSTS_PAGE_SIZE))
+        offset = int(request.GET.get("offset", 0))
+    except ValueError:
+        return _invalid_parameter("limit and offset must be integers")
+    if not 1 <= limit <= settings.POSTS_MAX_PAGE_SIZE:
+        return _invalid_parameter(f"limit must be between 1 and {settings.POSTS_MAX_PAGE_SIZE}")
+    if not 0 <= offset <= settings.SEARCH_MAX_RESULTS - limit:
+        return _invalid_parameter(
+            f"offset must be between 0 and {settings.SEARCH_MAX_RESULTS - limit}"
+        )
+
+    # Results change with the same events as the timeline
+    query_hash = compute_content_hash(request.GET.urlencode().encode("utf-8"))[:16]
+    etag = f'"{get_timeline_version()}-{get_scheme(request)}-search-{query_hash}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+        return response
+
+    results, has_more = search_posts(query, offset, limit)
+
+    links = {
+        "self": {"href": request.get_full_path(), "method": "GET"},
+    }
+    if has_more and offset + 2 * limit <= settings.SEARCH_MAX_RESULTS:
+        params = request.GET.copy()
+        params["offset"] = offset + limit
+        links["next"] = {"href": f"{request.path}?{params.urlencode()}", "method": "GET"}
+
+    response = Response(
+        {
+            "type": "Success",
+            "errors": [],
+            "data": [
+                {**_post_with_author(request, post), "snippet": post["snippet"]}
+                for post in results
+            ],
+            "_links": links,
+        },
+        status=status.HTTP_200_OK,
+    )
+    response["ETag"] = etag
+    return response
+
+
+def _posts_query(request):
+    """
+    Validate the pagination and filter parameters of a post listing.
+
+    Returns:
+        dict with 'limit', 'after', 'since', 'until' and 'tag', or an error
+        response
+    """
+    try:
+        limit = int(request.GET.get("limit", settings.POSTS_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.POSTS_MAX_PAGE_SIZE:
+        return _invalid_parameter(f"limit must be between 1 and {settings.POSTS_MAX_PAGE_SIZE}")
+
+    after = None
+    cursor = request.GET.get("cursor")
+    if cursor:
+        after = decode_post_cursor(cursor)
+        if after is None:
+            return _invalid_parameter("Invalid cursor")
+
+    query = {"limit": limit, "after": after, "tag": request.GET.get("tag") or None}
+    for name in ("since", "until"):
+        value = request.GET.get(name)
+        query[name] = parse_timestamp(value) if value else None
+        if value and query[name] is None:
+            return _invalid_parameter(f"Invalid {name} parameter. Use an RFC 3339 timestamp")
+    return query
+
+
+def _post_with_author(request, post: dict) -> dict:
+    """JSON representation of a post loaded with TIMELINE_FIELDS."""
+    nickname = post["hosted_file__nickname"]
+    return {
+        "nick": nickname,
+        "url": build_public_url(nickname, request),
+        **serialize_post(post),
+    }
+
+
+def _page_links(request, next_cursor: str) -> dict:
+    """Links of a page: itself and, if there are more, the next page."""
+    links = {
+        "self": {"href": request.get_full_path(), "method": "GET"},
+    }
+    if next_cursor:
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        links["next"] = {"href": f"{request.path}?{params.urlencode()}", "method": "GET"}
+    return links
+
+
+def _invalid_parameter(message: str):
+    """Error response for an invalid query parameter."""
+    return Response(
+        {
+            "type": "Error",
+            "errors": [message],
+            "data": {},
+        },
+        status=status.HTTP_400_BAD_REQUEST,
+    )
@@ -0,0 +1,240 @@
+"""
+Outbound webhooks: change log entries POSTed to subscriber URLs (/webhooks).
+
+A subscriber (e.g. an Org Social Relay next to the host) registers a URL
+and a batching window. Every committed change schedules one delivery per
+webhook after its window (tasks.schedule_webhook_deliveries), so the
+changes made during the window are sent together. Deliveries run on the
+Huey queue (tasks.deliver_webhook):
+
+- a webhook has at most one delivery in flight, and at most
+  WEBHOOK_MAX_CONCURRENCY run at once across all webhooks, so slow
+  receivers cannot take every worker
+- a failed batch is retried with exponential backoff, up to
+  WEBHOOK_MAX_ATTEMPTS times; then it is dead-lettered and delivery moves
+  on to the next changes
+- the delivery state of each webhook (the last change delivered, failed
+  attempts, dead letters) and the locks are kept in Redis; if the state is
+  lost, delivery resumes from the latest change
+
+Each request body is signed with the webhook secret (HMAC-SHA256, in the
+X-Org-Social-Signature header).
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .changes import get_changes, get_last_seq, serialize_change
+from .models import Webhook
+
+logger = logging.getLogger(__name__)
+
+WEBHOOKS_KEY = "hosting:webhooks"
+STATE_KEY_PREFIX = "hosting:webhook-state:"
+SCHEDULED_KEY_PREFIX = "hosting:webhook-scheduled:"
+LOCK_KEY_PREFIX = "hosting:webhook-lock:"
+SLOT_KEY_PREFIX = "hosting:webhook-slot:"
+
+# Seconds before retrying a delivery that found its webhook or every slot busy
+BUSY_DELAY = 1
+
+
+def create_webhook(url: str, window: int) -> Webhook:
+    """
+    Register a webhook. It receives the changes made from now on.
+
+    Args:
+        url: URL the changes are POSTed to
+        window: Seconds changes are batched for
+
+    Returns:
+        The webhook, with its generated secret
+    """
+    webhook = Webhook.objects.create(url=url, secret=secrets.token_hex(32), window=window)
+    set_state(webhook.id, {**_initial_state(), "cursor": get_last_seq()})
+    cache.delete(WEBHOOKS_KEY)
+    return webhook
+
+
+def delete_webhook(webhook: Webhook):
+    """Unregister a webhook and drop its delivery state."""
+    webhook_id = webhook.id
+    webhook.delete()
+    cache.delete(WEBHOOKS_KEY)
+    cache.delete(STATE_KEY_PREFIX + str(webhook_id))
+
+
+def get_webhooks() -> list:
+    """
+    Return the registered webhooks.
+
+    Returns:
+        List of dicts with 'id' and 'window'
+    """
+    webhooks = cache.get(WEBHOOKS_KEY)
+    if webhooks is None:
+        webhooks = list(Webhook.objects.order_by("id").values("id", "window"))
+        cache.set(WEBHOOKS_KEY, webhooks, None)
+    return webhooks
+
+
+def _initial_state() -> dict:
+    return {"cursor": 0, "attempts": 0, "retry_at": None, "dead_letters": []}
+
+
+def get_state(webhook_id: int) -> dict:
+    """
+    Return the delivery state of a webhook.
+
+    Returns:
+        dict with 'cursor' (last change delivered), 'attempts' (failed
+        deliveries of the next batch), 'retry_at' (epoch seconds, or None)
+        and 'dead_letters'
+    """
+    key = STATE_KEY_PREFIX + str(webhook_id)
+    state = cache.get(key)
+    if state is None:
+        # Lost (eviction, Redis restarted without persistence): resume from the
+        # latest change rather than resending the whole log
+        logger.warning(f"Delivery state of webhook {webhook_id} was lost; resuming from now")
+        cache.add(key, {**_initial_state(), "cursor": get_last_seq()}, None)
+        state = cache.get(key)
+    return state
+
+
+def set_state(webhook_id: int, state: dict):
+    """Store the delivery state of a webhook."""
+    cache.set(STATE_KEY_PREFIX + str(webhook_id), state, None)
+
+
+def backoff_delay(attempts: int) -> int:
+    """Seconds to wait after a batch failed attempts times in a row."""
+    return min(settings.WEBHOOK_BACKOFF_BASE * 2 ** (attempts - 1), settings.WEBHOOK_BACKOFF_MAX)
+
+
+def sign(secret: str, body: bytes) -> str:
+    """Signature of a request body, as sent in X-Org-Social-Signature."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def deliver(webhook_id: int):
+    """
+    Deliver the next batch of changes to a webhook.
+
+    Returns:
+        Seconds after which to deliver again, or None if nothing is pending
+    """
+    # Changes committed from now on schedule another delivery
+    cache.delete(SCHEDULED_KEY_PREFIX + str(webhook_id))
+
+    webhook = Webhook.objects.filter(id=webhook_id).first()
+    if webhook is None:
+        return None
+
+    lock_key = LOCK_KEY_PREFIX + str(webhook_id)
+    if not cache.add(lock_key, 1, settings.WEBHOOK_TIMEOUT * 2):
+        return BUSY_DELAY
+
+    try:
+        state = get_state(webhook_id)
+        if state["retry_at"] and state["retry_at"] > time.time():
+            # The retry is already scheduled
+            return None
+
+        changes = get_changes(state["cursor"], settings.WEBHOOK_BATCH_SIZE)
+        if not changes:
+            return None
+
+        slot_key = _acquire_slot()
+        if slot_key is None:
+            return BUSY_DELAY
+        try:
+            error = _post_changes(webhook, changes)
+        finally:
+            cache.delete(slot_key)
+
+        first_seq, last_seq = changes[0]["seq"], changes[-1]["seq"]
+        if error is None:
+            state.update(cursor=last_seq, attempts=0, retry_at=None)
+            set_state(webhook_id, state)
+            return 0 if len(changes) == settings.WEBHOOK_BATCH_SIZE else None
+
+        state["attempts"] += 1
+        if state["attempts"] < settings.WEBHOOK_MAX_ATTEMPTS:
+            delay = backoff_delay(state["attempts"])
+            state["retry_at"] = time.time() + delay
+            set_state(webhook_id, state)
+            logger.warning(
+                f"Webhook {webhook_id} delivery failed ({error}), "
+                f"attempt {state['attempts']}; retrying in {delay}s"
+            )
+            return delay
+
+        # Give up on the batch; the changes can still be read from /changes
+        dead_letter = {
+            "first-seq": first_seq,
+            "last-seq": last_seq,
+            "attempts": state["attempts"],
+            "error": error,
+            "failed-at": timezone.now().isoformat(),
+        }
+        state["dead_letters"] = (state["dead_letters"] + [dead_letter])[
+            -settings.WEBHOOK_DEAD_LETTERS :
+        ]
+        state.update(cursor=last_seq, attempts=0, retry_at=None)
+        set_state(webhook_id, state)
+        logger.error(
+            f"Webhook {webhook_id} dead-lettered changes {first_seq}-{last_seq}: {error}"
+        )
+        return 0
+    finally:
+        cache.delete(lock_key)
+
+
+def _acquire_slot():
+    """Take one of the WEBHOOK_MAX_CONCURRENCY delivery slots, or return None."""
+    for number in range(settings.WEBHOOK_MAX_CONCURRENCY):
+        slot_key = f"{SLOT_KEY_PREFIX}{number}"
+        # Expires on its own if the worker dies mid-delivery
+        if cache.add(slot_key, 1, settings.WEBHOOK_TIMEOUT * 2):
+            return slot_key
+    return None
+
+
+def _post_changes(webhook: Webhook, changes: list):
+    """
+    POST a batch of changes to a webhook.
+
+    Returns:
+        None on a 2xx response, otherwise a description of the error
+    """
+    body = json.dumps(
+        {"type": "Changes", "data": [serialize_change(change) for change in changes]}
+    ).encode("utf-8")
+    try:
+        response = requests.post(
+            webhook.url,
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "User-Agent": "org-social-host",
+                "X-Org-Social-Webhook": str(webhook.id),
+                "X-Org-Social-Signature": sign(webhook.secret, body),
+            },
+            timeout=settings.WEBHOOK_TIMEOUT,
+            allow_redirects=False,
+        )
+    except requests.RequestException as e:
+        return str(e) or e.__class__.__name__
+    if not 200 <= response.status_code < 300:
+        return f"HTTP {response.status_code}"
+    return None
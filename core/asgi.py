@@ -3,6 +3,10 @@ ASGI config for Org Social Host project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+It serves the long-lived /events streams (the events service in
+compose.yaml, run with uvicorn); idle streams wait on the event loop
+instead of holding a thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
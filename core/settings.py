@@ -3,6 +3,8 @@ Django settings for Org Social Host project.
 """
 
 import os
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,6 +33,82 @@ MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE", "5242880"))  # 5MB default
 FILE_TTL_DAYS = int(os.environ.get("FILE_TTL_DAYS", "30"))  # 30 days default
 ENABLE_CLEANUP = os.environ.get("ENABLE_CLEANUP", "true").lower() == "true"
 STORAGE_PATH = os.environ.get("STORAGE_PATH", str(BASE_DIR / "storage"))
+# Internal nginx location serving STORAGE_PATH; when set, file bodies are
+# handed to nginx with X-Accel-Redirect instead of being sent by Django
+STORAGE_ACCEL_REDIRECT = os.environ.get("STORAGE_ACCEL_REDIRECT", "")
+CLEANUP_BATCH_SIZE = int(os.environ.get("CLEANUP_BATCH_SIZE", "500"))
+CLEANUP_CHECKPOINT_TIMEOUT = int(os.environ.get("CLEANUP_CHECKPOINT_TIMEOUT", "86400"))  # 1 day
+
+# Served file cache (in-process LRU in front of Redis)
+FILE_CACHE_TIMEOUT = int(os.environ.get("FILE_CACHE_TIMEOUT", "3600"))  # 1 hour in Redis
+FILE_CACHE_LOCAL_MAX_BYTES = int(
+    os.environ.get("FILE_CACHE_LOCAL_MAX_BYTES", "67108864")
+)  # 64MB per process
+FILE_CACHE_LOCAL_TIMEOUT = int(os.environ.get("FILE_CACHE_LOCAL_TIMEOUT", "60"))  # 1 minute
+
+# Verified vfile tokens cached in process (token, timestamp and signature -> account)
+VFILE_AUTH_CACHE_SIZE = int(os.environ.get("VFILE_AUTH_CACHE_SIZE", "10000"))  # entries
+VFILE_AUTH_CACHE_TIMEOUT = int(os.environ.get("VFILE_AUTH_CACHE_TIMEOUT", "30"))  # seconds
+
+# Derived artifacts pipeline (Huey): a pending job per nickname is reused
+# by later uploads for at most this long
+ARTIFACTS_PIPELINE_DEDUPE_TIMEOUT = int(
+    os.environ.get("ARTIFACTS_PIPELINE_DEDUPE_TIMEOUT", "300")
+)  # 5 minutes
+
+# Buffered last_access tracking (flushed every minute by Huey)
+ACCESS_FLUSH_BATCH_SIZE = int(os.environ.get("ACCESS_FLUSH_BATCH_SIZE", "500"))
+
+# Public routes listing
+PUBLIC_ROUTES_PAGE_SIZE = int(os.environ.get("PUBLIC_ROUTES_PAGE_SIZE", "100"))
+PUBLIC_ROUTES_MAX_PAGE_SIZE = int(os.environ.get("PUBLIC_ROUTES_MAX_PAGE_SIZE", "1000"))
+PUBLIC_ROUTES_SNAPSHOT_TIMEOUT = int(
+    os.environ.get("PUBLIC_ROUTES_SNAPSHOT_TIMEOUT", "3600")
+)  # 1 hour
+
+# Batched reads (/bulk-fetch)
+BULK_FETCH_MAX_FILES = int(os.environ.get("BULK_FETCH_MAX_FILES", "500"))  # Per request
+BULK_FETCH_BATCH_SIZE = int(os.environ.get("BULK_FETCH_BATCH_SIZE", "50"))  # Contents loaded at once
+
+# Change notifications (/events, Server-Sent Events served by the ASGI app)
+EVENTS_MAX_NICKNAMES = int(os.environ.get("EVENTS_MAX_NICKNAMES", "500"))  # Per stream
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "100"))  # Pending events per stream
+EVENTS_KEEPALIVE = int(os.environ.get("EVENTS_KEEPALIVE", "15"))  # Seconds between keepalives
+EVENTS_RETRY_MS = int(os.environ.get("EVENTS_RETRY_MS", "5000"))  # Client reconnection delay
+
+# Change log (/changes); superseded entries are compacted after the retention
+CHANGES_PAGE_SIZE = int(os.environ.get("CHANGES_PAGE_SIZE", "100"))
+CHANGES_MAX_PAGE_SIZE = int(os.environ.get("CHANGES_MAX_PAGE_SIZE", "1000"))
+CHANGES_RETENTION_DAYS = int(os.environ.get("CHANGES_RETENTION_DAYS", "30"))
+CHANGES_COMPACT_BATCH_SIZE = int(os.environ.get("CHANGES_COMPACT_BATCH_SIZE", "10000"))
+
+# Outbound webhooks (/webhooks); disabled unless WEBHOOK_TOKEN is set
+WEBHOOK_TOKEN = os.environ.get("WEBHOOK_TOKEN", "")  # Required to manage webhooks
+WEBHOOK_WINDOW = int(os.environ.get("WEBHOOK_WINDOW", "5"))  # Default batching window (seconds)
+WEBHOOK_MAX_WINDOW = int(os.environ.get("WEBHOOK_MAX_WINDOW", "3600"))
+WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", "500"))  # Changes per request
+WEBHOOK_TIMEOUT = int(os.environ.get("WEBHOOK_TIMEOUT", "10"))  # Seconds per request
+WEBHOOK_MAX_CONCURRENCY = int(os.environ.get("WEBHOOK_MAX_CONCURRENCY", "2"))  # Requests in flight
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "8"))  # Before dead-lettering
+WEBHOOK_BACKOFF_BASE = int(os.environ.get("WEBHOOK_BACKOFF_BASE", "10"))  # First retry delay, doubled
+WEBHOOK_BACKOFF_MAX = int(os.environ.get("WEBHOOK_BACKOFF_MAX", "3600"))  # Longest retry delay
+WEBHOOK_DEAD_LETTERS = int(os.environ.get("WEBHOOK_DEAD_LETTERS", "100"))  # Kept per webhook
+
+# JSON post listings (/<nickname>/posts)
+POSTS_PAGE_SIZE = int(os.environ.get("POSTS_PAGE_SIZE", "20"))
+POSTS_MAX_PAGE_SIZE = int(os.environ.get("POSTS_MAX_PAGE_SIZE", "100"))
+
+# Follow graph listings (/<nickname>/followers, /<nickname>/following)
+FOLLOWS_PAGE_SIZE = int(os.environ.get("FOLLOWS_PAGE_SIZE", "100"))
+FOLLOWS_MAX_PAGE_SIZE = int(os.environ.get("FOLLOWS_MAX_PAGE_SIZE", "1000"))
+
+# Full-text search (/search); the backend defaults to the database's own
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "")
+SEARCH_SNIPPET_WORDS = int(os.environ.get("SEARCH_SNIPPET_WORDS", "16"))
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "1000"))  # Deepest offset
+
+# Running the test suite (uses in-memory backends so Redis is not required)
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
 
 # Application definition
 INSTALLED_APPS = [
@@ -171,9 +249,18 @@ CACHES = {
     }
 }
 
+if TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+    STORAGE_PATH = os.path.join(tempfile.gettempdir(), "org-social-host-test-storage")
+
 # Huey configuration (task queue)
 HUEY = {
-    "huey_class": "huey.RedisHuey",
+    # Priority queue: derived artifacts run before cache warming
+    "huey_class": "huey.PriorityRedisHuey",
     "name": "org-social-host",
     "immediate": False,
     "connection": {
@@ -187,6 +274,10 @@ HUEY = {
     },
 }
 
+if TESTING:
+    # Run tasks synchronously, without Redis
+    HUEY["immediate"] = True
+
 # Logging configuration
 LOGGING = {
     "version": 1,
@@ -206,5 +297,11 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,
         },
+        # Logs every task execution
+        "huey": {
+            "handlers": ["console"],
+            "level": "WARNING" if TESTING else "INFO",
+            "propagate": False,
+        },
     },
 }
@@ -11,6 +11,18 @@ mkdir -p /app/storage
 echo "🔄 Running database migrations..."
 python manage.py migrate
 
+# Mirror hosted files into storage for nginx
+echo "🗂️  Rebuilding storage mirror..."
+python manage.py rebuild_storage
+
+# Index posts of files uploaded before the post index existed
+echo "🗂️  Queueing the post index of unindexed files..."
+python manage.py index_posts
+
+# Queue compressed variants of files written before they existed
+echo "🗜️  Queueing missing compressed variants..."
+python manage.py build_artifacts
+
 # Check for any issues
 echo "🔍 Checking Django configuration..."
 python manage.py check